@@ -0,0 +1,54 @@
+"""create ingest jobs table
+
+Revision ID: 3b8e51c0d2a7
+Revises: 904a4f629019
+Create Date: 2026-10-18 14:05:12.481203
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '3b8e51c0d2a7'
+down_revision: Union[str, Sequence[str], None] = '904a4f629019'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table(
+        'ingest_jobs',
+        sa.Column('id', sa.BigInteger, sa.Identity(), primary_key=True),
+        sa.Column('longitude', sa.Numeric(precision=7, scale=4), nullable=False),
+        sa.Column('latitude', sa.Numeric(precision=7, scale=4), nullable=False),
+        sa.Column('date_from', sa.Date, nullable=False),
+        sa.Column('date_to', sa.Date, nullable=False),
+        sa.Column('status', sa.String(10), nullable=False, server_default='pending'),
+        sa.Column('attempts', sa.Integer, nullable=False, server_default='0'),
+        sa.Column('run_after', sa.DateTime(timezone=True), nullable=False, server_default=sa.func.now()),
+        sa.Column('leased_until', sa.DateTime(timezone=True), nullable=True),
+        sa.Column('worker', sa.String(100), nullable=True),
+        sa.Column('last_error', sa.Text, nullable=True),
+        sa.Column('created_at', sa.DateTime(timezone=True), nullable=False, server_default=sa.func.now()),
+        sa.Column('updated_at', sa.DateTime(timezone=True), nullable=False, server_default=sa.func.now()),
+    )
+    # Claim candidates: pending jobs that are due and running jobs with an expired lease
+    op.create_index(
+        'idx_ingest_jobs_pending', 'ingest_jobs', ['run_after'],
+        postgresql_where=sa.text("status = 'pending'"))
+    op.create_index(
+        'idx_ingest_jobs_running', 'ingest_jobs', ['leased_until'],
+        postgresql_where=sa.text("status = 'running'"))
+    # The same work item is queued at most once until it is done or dead
+    op.create_index(
+        'uq_ingest_jobs_active', 'ingest_jobs', ['longitude', 'latitude', 'date_from', 'date_to'],
+        unique=True, postgresql_where=sa.text("status IN ('pending', 'running')"))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_table('ingest_jobs', if_exists=True)
@@ -0,0 +1,110 @@
+"""partition location_data by month
+
+Revision ID: 7c2d9e4f1a36
+Revises: 3b8e51c0d2a7
+Create Date: 2026-10-18 14:12:40.902114
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects.postgresql import JSONB
+
+
+# revision identifiers, used by Alembic.
+revision: str = '7c2d9e4f1a36'
+down_revision: Union[str, Sequence[str], None] = '3b8e51c0d2a7'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# Months created ahead of the current one by the migration
+MONTHS_AHEAD = 3
+
+# Creates the missing monthly partitions location_data_pYYYY_MM covering [date_from, date_to].
+# A partition is created as a standalone table and attached, which only takes a
+# SHARE UPDATE EXCLUSIVE lock on location_data, so concurrent inserts are not blocked
+CREATE_PARTITIONS_FUNCTION = """
+CREATE OR REPLACE FUNCTION create_location_data_partitions(date_from date, date_to date)
+RETURNS integer LANGUAGE plpgsql AS $$
+DECLARE
+    month_start date := date_trunc('month', date_from)::date;
+    month_end date;
+    partition_name text;
+    created integer := 0;
+BEGIN
+    PERFORM pg_advisory_xact_lock(hashtext('create_location_data_partitions'));
+    WHILE month_start <= date_to LOOP
+        month_end := (month_start + interval '1 month')::date;
+        partition_name := format('location_data_p%s', to_char(month_start, 'YYYY_MM'));
+        IF to_regclass(partition_name) IS NULL THEN
+            EXECUTE format(
+                'CREATE TABLE %I (LIKE location_data INCLUDING DEFAULTS, '
+                'CONSTRAINT %I CHECK (date >= %L AND date < %L))',
+                partition_name, partition_name || '_range', month_start, month_end);
+            EXECUTE format(
+                'ALTER TABLE location_data ATTACH PARTITION %I FOR VALUES FROM (%L) TO (%L)',
+                partition_name, month_start, month_end);
+            EXECUTE format('ALTER TABLE %I DROP CONSTRAINT %I', partition_name, partition_name || '_range');
+            created := created + 1;
+        END IF;
+        month_start := month_end;
+    END LOOP;
+    RETURN created;
+END
+$$
+"""
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.rename_table('location_data', 'location_data_unpartitioned')
+    op.execute("ALTER TABLE location_data_unpartitioned RENAME CONSTRAINT pk_location_data TO pk_location_data_unpartitioned")
+    op.drop_index('idx_location_data_date', table_name='location_data_unpartitioned')
+
+    op.create_table(
+        'location_data',
+        sa.Column('longitude', sa.Numeric(precision=7, scale=4), nullable=False),
+        sa.Column('latitude', sa.Numeric(precision=7, scale=4), nullable=False),
+        sa.Column('date', sa.Date, nullable=False),
+        sa.Column('timezone', sa.String(50), nullable=True),
+        sa.Column('data', JSONB, nullable=True),
+        sa.PrimaryKeyConstraint('longitude', 'latitude', 'date', name='pk_location_data'),
+        postgresql_partition_by='RANGE (date)',
+    )
+    # Partitioned index, every partition gets its own BRIN index on date
+    op.create_index('idx_location_data_date', 'location_data', ['date'], postgresql_using='brin')
+
+    op.execute(CREATE_PARTITIONS_FUNCTION)
+    op.execute(f"""
+        SELECT create_location_data_partitions(
+            LEAST(MIN(date), CURRENT_DATE),
+            GREATEST(MAX(date), CURRENT_DATE + interval '{MONTHS_AHEAD} months')::date
+        )
+        FROM location_data_unpartitioned
+    """)
+    op.execute("INSERT INTO location_data SELECT * FROM location_data_unpartitioned")
+    op.drop_table('location_data_unpartitioned')
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.rename_table('location_data', 'location_data_partitioned')
+    op.execute("ALTER TABLE location_data_partitioned RENAME CONSTRAINT pk_location_data TO pk_location_data_partitioned")
+    op.drop_index('idx_location_data_date', table_name='location_data_partitioned')
+
+    op.create_table(
+        'location_data',
+        sa.Column('longitude', sa.Numeric(precision=7, scale=4), nullable=False),
+        sa.Column('latitude', sa.Numeric(precision=7, scale=4), nullable=False),
+        sa.Column('date', sa.Date, nullable=False),
+        sa.Column('timezone', sa.String(50), nullable=True),
+        sa.Column('data', JSONB, nullable=True),
+    )
+    op.execute("INSERT INTO location_data SELECT * FROM location_data_partitioned")
+    op.create_primary_key("pk_location_data", "location_data", ["longitude", "latitude", "date"])
+    op.create_index('idx_location_data_date', 'location_data', ['date'])
+
+    # drops the partitions too
+    op.drop_table('location_data_partitioned')
+    op.execute("DROP FUNCTION IF EXISTS create_location_data_partitions(date, date)")
@@ -0,0 +1,66 @@
+"""create weekly and monthly rollup tables
+
+Revision ID: a41f6b9e8c05
+Revises: 7c2d9e4f1a36
+Create Date: 2026-10-18 14:31:07.215930
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'a41f6b9e8c05'
+down_revision: Union[str, Sequence[str], None] = '7c2d9e4f1a36'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+ROLLUP_TABLES = ['location_data_weekly', 'location_data_monthly']
+
+MEAN_PARAMS = [
+    'temperature_2m',
+    'relative_humidity_2m',
+    'dew_point_2m',
+    'apparent_temperature',
+    'temperature_80m',
+    'temperature_120m',
+    'wind_speed_10m',
+    'wind_speed_80m',
+    'visibility',
+]
+TOTAL_PARAMS = ['rain', 'showers', 'snowfall']
+
+
+def _rollup_columns():
+    columns = [
+        sa.Column('longitude', sa.Numeric(precision=7, scale=4), nullable=False),
+        sa.Column('latitude', sa.Numeric(precision=7, scale=4), nullable=False),
+        sa.Column('period_start', sa.Date, nullable=False),
+        sa.Column('days', sa.Integer, nullable=False),
+    ]
+    for period in ['24h', 'daylight']:
+        columns += [sa.Column(f'avg_{param}_{period}', sa.Float, nullable=True) for param in MEAN_PARAMS]
+        columns += [sa.Column(f'total_{param}_{period}', sa.BigInteger, nullable=True) for param in TOTAL_PARAMS]
+    columns += [
+        sa.Column('avg_daylight_hours', sa.Float, nullable=True),
+        sa.Column('total_daylight_hours', sa.Float, nullable=True),
+    ]
+    return columns
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    for table in ROLLUP_TABLES:
+        op.create_table(
+            table,
+            *_rollup_columns(),
+            sa.PrimaryKeyConstraint('longitude', 'latitude', 'period_start', name=f'pk_{table}'),
+        )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    for table in ROLLUP_TABLES:
+        op.drop_table(table, if_exists=True)
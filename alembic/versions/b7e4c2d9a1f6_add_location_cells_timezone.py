@@ -0,0 +1,31 @@
+"""add location_cells timezone
+
+Revision ID: b7e4c2d9a1f6
+Revises: f3a9d6b1c204
+Create Date: 2026-10-18 18:05:42.716203
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b7e4c2d9a1f6'
+down_revision: Union[str, Sequence[str], None] = 'f3a9d6b1c204'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Cells learned before stay NULL, they are not coalesced until the next fetch of their location fills them
+    op.add_column('location_cells', sa.Column('timezone', sa.String(50), nullable=True))
+    op.add_column('location_cells', sa.Column('utc_offset', sa.Integer, nullable=True))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_column('location_cells', 'utc_offset')
+    op.drop_column('location_cells', 'timezone')
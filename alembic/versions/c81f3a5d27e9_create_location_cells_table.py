@@ -0,0 +1,37 @@
+"""create location cells table
+
+Revision ID: c81f3a5d27e9
+Revises: e5b27c90d413
+Create Date: 2026-10-18 15:41:27.530914
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c81f3a5d27e9'
+down_revision: Union[str, Sequence[str], None] = 'e5b27c90d413'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table(
+        'location_cells',
+        sa.Column('longitude', sa.Numeric(precision=7, scale=4), nullable=False),
+        sa.Column('latitude', sa.Numeric(precision=7, scale=4), nullable=False),
+        sa.Column('cell_longitude', sa.Float, nullable=False),
+        sa.Column('cell_latitude', sa.Float, nullable=False),
+        sa.Column('elevation', sa.Float, nullable=False),
+        sa.Column('updated_at', sa.DateTime(timezone=True), nullable=False, server_default=sa.func.now()),
+        sa.PrimaryKeyConstraint('longitude', 'latitude', name='pk_location_cells'),
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_table('location_cells', if_exists=True)
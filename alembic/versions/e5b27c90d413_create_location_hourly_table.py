@@ -0,0 +1,70 @@
+"""create location_hourly fact table
+
+Revision ID: e5b27c90d413
+Revises: a41f6b9e8c05
+Create Date: 2026-10-18 15:02:44.107318
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e5b27c90d413'
+down_revision: Union[str, Sequence[str], None] = 'a41f6b9e8c05'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# HourlyParams at the time of the migration
+SERIES_PARAMS = [
+    'temperature_2m',
+    'relative_humidity_2m',
+    'dew_point_2m',
+    'apparent_temperature',
+    'temperature_80m',
+    'temperature_120m',
+    'wind_speed_10m',
+    'wind_speed_80m',
+    'wind_direction_10m',
+    'wind_direction_80m',
+    'visibility',
+    'evapotranspiration',
+    'weather_code',
+    'soil_temperature_0cm',
+    'soil_temperature_6cm',
+    'rain',
+    'showers',
+    'snowfall',
+]
+INT_PARAMS = ['weather_code']
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table(
+        'location_hourly',
+        sa.Column('longitude', sa.Numeric(precision=7, scale=4), nullable=False),
+        sa.Column('latitude', sa.Numeric(precision=7, scale=4), nullable=False),
+        sa.Column('date', sa.Date, nullable=False),
+        sa.Column('timezone', sa.String(50), nullable=True),
+        sa.Column('utc_offset', sa.Integer, nullable=False),
+        sa.Column('interval_seconds', sa.Integer, nullable=False),
+        sa.Column('day_start', sa.BigInteger, nullable=False),
+        sa.Column('sunrise', sa.BigInteger, nullable=False),
+        sa.Column('sunset', sa.BigInteger, nullable=False),
+        sa.Column('daylight_duration', sa.REAL, nullable=False),
+        *[
+            sa.Column(
+                param, postgresql.ARRAY(sa.SmallInteger if param in INT_PARAMS else sa.REAL), nullable=False)
+            for param in SERIES_PARAMS
+        ],
+        sa.PrimaryKeyConstraint('longitude', 'latitude', 'date', name='pk_location_hourly'),
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_table('location_hourly', if_exists=True)
@@ -0,0 +1,31 @@
+"""add location_data series column
+
+Revision ID: f3a9d6b1c204
+Revises: c81f3a5d27e9
+Create Date: 2026-10-18 16:20:05.318442
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'f3a9d6b1c204'
+down_revision: Union[str, Sequence[str], None] = 'c81f3a5d27e9'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Nullable without a default, added to every partition without rewriting them.
+    # Stored rows keep their series in data until `python -m app.payload_codec repack`
+    op.add_column('location_data', sa.Column('series', sa.LargeBinary, nullable=True))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    # Packed rows lose their series, rewrite them first with `PAYLOAD_CODEC=json python -m app.hourly_facts reprocess`
+    op.drop_column('location_data', 'series')
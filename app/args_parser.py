@@ -1,7 +1,11 @@
 import argparse
-from datetime import datetime, timedelta
+import importlib.util
+import re
+from datetime import date, datetime, timedelta
 from decimal import Decimal
 
+from app.config import ARCHIVE_MIN_DATE, RESPONSE_ARCHIVE_PATH
+
 def _validate_decimal(value):
     """Validate that the value is a decimal string with precision 4."""
     try:
@@ -20,6 +24,25 @@ def _validate_date(value):
             f"'{value}' is not a valid date in format YYYY-MM-DD"
         )
     
+def _read_coordinates_file(path):
+    """Read `longitude,latitude` pairs from a file, one pair per line."""
+    locations = []
+    with open(path) as coordinates_file:
+        for line_number, line in enumerate(coordinates_file, start=1):
+            line = line.split('#', 1)[0].strip()
+            if not line:
+                continue
+            try:
+                longitude, latitude = re.split(r'[,;\s]+', line)
+            except ValueError:
+                raise argparse.ArgumentTypeError(
+                    f"{path}:{line_number}: expected 'longitude,latitude'"
+                )
+            locations.append(
+                (_validate_decimal(longitude), _validate_decimal(latitude))
+            )
+    return locations
+
 def parse_args():
     today_date = datetime.now().date() - timedelta(days=1)
     parser = argparse.ArgumentParser(
@@ -31,18 +54,69 @@ def parse_args():
         "-lon",
         "--longitude",
         type=_validate_decimal,
-        required=True,
-        help="Longitude as decimal string with precision 4 (e.g., '12.3456')"
+        action="append",
+        default=[],
+        help="Longitude as decimal string with precision 4 (e.g., '12.3456'). "
+             "Can be repeated together with -lat to process several locations"
     )
     
     parser.add_argument(
         "-lat",
         "--latitude",
         type=_validate_decimal,
-        required=True,
-        help="Latitude as decimal string with precision 4 (e.g., '-78.9012')"
+        action="append",
+        default=[],
+        help="Latitude as decimal string with precision 4 (e.g., '-78.9012'). "
+             "Can be repeated together with -lon to process several locations"
     )
     
+    parser.add_argument(
+        "-cf",
+        "--coordinates_file",
+        help="File with 'longitude,latitude' pairs, one location per line"
+    )
+
+    parser.add_argument(
+        "-bs",
+        "--batch_size",
+        type=int,
+        help="Number of locations packed into one API request and one DB write (defaults to 50)",
+        default=50
+    )
+
+    parser.add_argument(
+        "-w",
+        "--workers",
+        type=int,
+        help="Maximum number of API requests running in parallel (defaults to 4)",
+        default=4
+    )
+
+    parser.add_argument(
+        "-tw",
+        "--transform_workers",
+        type=int,
+        help="Processes transforming the fetched data in parallel, locations and long ranges are "
+             "sharded across them (by default data is transformed in the main process)",
+        default=0
+    )
+
+    parser.add_argument(
+        "-dw",
+        "--db_workers",
+        type=int,
+        help="Batches saved to the database in parallel while the next ones are fetched and transformed "
+             "(defaults to 2)",
+        default=2
+    )
+
+    parser.add_argument(
+        "--timeout",
+        type=float,
+        help="Timeout in seconds for a single API request (defaults to 30)",
+        default=30
+    )
+
     parser.add_argument(
         "-df",
         "--date_from",
@@ -59,6 +133,46 @@ def parse_args():
         default=today_date
     )
 
+    parser.add_argument(
+        "-cd",
+        "--chunk_days",
+        type=int,
+        help="Process long date ranges in chunks of this many days to keep memory usage flat "
+             "(by default the whole range is processed at once)"
+    )
+
+    parser.add_argument(
+        "-ck",
+        "--checkpoint",
+        help="Record the exported days in this file and skip the days it already lists, so an interrupted "
+             "run started again with the same file resumes where it stopped (see app/checkpoint.py)"
+    )
+
+    parser.add_argument(
+        "--refetch",
+        action="store_true",
+        help="Fetch the whole date range, including days already stored in DB"
+    )
+
+    parser.add_argument(
+        "--no_db", "--no-db",
+        action="store_true",
+        help="Don't read or write the database, data is only fetched (or taken from the day cache) and exported"
+    )
+
+    parser.add_argument(
+        "--replay",
+        action="store_true",
+        help="Process the responses archived for the locations overlapping the date range (see "
+             "app/response_archive.py) instead of fetching, rows already stored in DB are replaced"
+    )
+
+    parser.add_argument(
+        "--enqueue",
+        action="store_true",
+        help="Queue the locations and date range (in chunks of --chunk_days) for worker.py instead of processing them"
+    )
+
     parser.add_argument(
         "--csv",
         action="store_true",
@@ -72,6 +186,51 @@ def parse_args():
         help="Output result as json"
     )
 
+    parser.add_argument(
+        "--parquet",
+        action="store_true",
+        help="Output result as parquet partitioned by month (requires pyarrow)"
+    )
+
+    parser.add_argument(
+        "--arrow",
+        action="store_true",
+        help="Output result as Arrow IPC file (requires pyarrow)"
+    )
+
+    parser.add_argument(
+        "--layout",
+        choices=["run", "per_day"],
+        help="Write csv/json as one file per run (csv, ndjson) or one file per location and day "
+             "(defaults to run)",
+        default="run"
+    )
+
+    parser.add_argument(
+        "--metrics",
+        help="Write per-stage timings and counters to this file"
+    )
+
+    parser.add_argument(
+        "--metrics_format",
+        choices=["json", "prometheus"],
+        help="Format of the --metrics file (defaults to json)",
+        default="json"
+    )
+
+    parser.add_argument(
+        "-v", "--verbose",
+        action="store_true",
+        help="Print coordinates, elevation and timezone of every API response"
+    )
+
+    parser.add_argument(
+        "--profile",
+        nargs="?",
+        const="transform.prof",
+        help="Dump cProfile stats of the transform stage to this file (defaults to transform.prof)"
+    )
+
     args = parser.parse_args()
 
     if (args.date_to < args.date_from):
@@ -79,4 +238,75 @@ def parse_args():
             f"'{args.date_from}' must be less or equal than '{args.date_to}'"
         )
     
+    # Archived responses are replayed as they are, only fetched days need the archive to cover them
+    if ARCHIVE_MIN_DATE and not args.replay and args.date_from < date.fromisoformat(ARCHIVE_MIN_DATE):
+        raise argparse.ArgumentTypeError(
+            f"'{args.date_from}' is before ARCHIVE_MIN_DATE '{ARCHIVE_MIN_DATE}', the archive API has no data for it"
+        )
+
+    if len(args.longitude) != len(args.latitude):
+        raise argparse.ArgumentTypeError(
+            "Every -lon must have a matching -lat"
+        )
+
+    args.locations = list(zip(args.longitude, args.latitude))
+    if args.coordinates_file:
+        args.locations.extend(_read_coordinates_file(args.coordinates_file))
+
+    if not args.locations:
+        raise argparse.ArgumentTypeError(
+            "At least one location is required: use -lon/-lat or --coordinates_file"
+        )
+
+    if args.batch_size < 1:
+        raise argparse.ArgumentTypeError(
+            f"'{args.batch_size}' batch size must be positive"
+        )
+
+    if args.chunk_days is not None and args.chunk_days < 1:
+        raise argparse.ArgumentTypeError(
+            f"'{args.chunk_days}' chunk days must be positive"
+        )
+
+    if args.no_db and args.enqueue:
+        raise argparse.ArgumentTypeError(
+            "--enqueue needs the database and can't be used with --no-db"
+        )
+
+    if args.replay and args.enqueue:
+        raise argparse.ArgumentTypeError(
+            "--replay and --enqueue can't be used together"
+        )
+
+    if args.replay and not RESPONSE_ARCHIVE_PATH:
+        raise argparse.ArgumentTypeError(
+            "--replay reads the response archive, set RESPONSE_ARCHIVE_PATH to the directory it was written to"
+        )
+
+    if args.checkpoint and (args.replay or args.enqueue):
+        raise argparse.ArgumentTypeError(
+            "--checkpoint can't be used with --replay or --enqueue"
+        )
+
+    # Checked without importing it, so a missing pyarrow fails here and not after the first batch
+    if (args.parquet or args.arrow) and importlib.util.find_spec('pyarrow') is None:
+        raise argparse.ArgumentTypeError(
+            "--parquet and --arrow require pyarrow, install it with `pip install -r requirements.txt`"
+        )
+
+    if args.transform_workers < 0:
+        raise argparse.ArgumentTypeError(
+            f"'{args.transform_workers}' number of transform workers must not be negative"
+        )
+
+    if args.workers < 1:
+        raise argparse.ArgumentTypeError(
+            f"'{args.workers}' number of workers must be positive"
+        )
+
+    if args.db_workers < 1:
+        raise argparse.ArgumentTypeError(
+            f"'{args.db_workers}' number of DB workers must be positive"
+        )
+
     return args
\ No newline at end of file
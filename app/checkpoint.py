@@ -0,0 +1,59 @@
+"""Progress file of long runs, main.py -ck PATH.
+
+Every exported batch appends a `longitude latitude first_date last_date` line per location and
+run of consecutive days. A run interrupted and started again with the same file plans only the
+days not listed yet, also with --no-db and --refetch where the database can't tell what is done.
+Lines are flushed to disk before the next batch, a line cut by a crash is ignored.
+"""
+import os
+from collections import defaultdict
+from datetime import date, timedelta
+
+import numpy as np
+
+
+def _day_runs(dates: list[str]) -> list[tuple[str, str]]:
+    """(first, last) of every run of consecutive ISO dates in sorted dates."""
+    days = np.array(dates, dtype='datetime64[D]')
+    breaks = np.flatnonzero(np.diff(days) != np.timedelta64(1, 'D')) + 1
+    starts = np.concatenate([[0], breaks])
+    ends = np.concatenate([breaks, [len(days)]]) - 1
+    return [(dates[start], dates[end]) for start, end in zip(starts.tolist(), ends.tolist())]
+
+
+def mark_frames(path: str, frames):
+    """Append the days of exported (df_data, longitude, latitude) frames."""
+    lines = [
+        f"{longitude} {latitude} {first} {last}\n"
+        for df_data, longitude, latitude in frames if df_data['date']
+        for first, last in _day_runs(df_data['date'])
+    ]
+    with open(path, 'a') as checkpoint_file:
+        checkpoint_file.writelines(lines)
+        checkpoint_file.flush()
+        os.fsync(checkpoint_file.fileno())
+
+
+def load_checkpoint(path: str, locations, date_from: date, date_to: date) -> dict:
+    """Dates listed in the file for every (longitude, latitude) in locations within [date_from, date_to],
+    in the format of app.db_client.get_stored_dates."""
+    done = defaultdict(set)
+    if not os.path.exists(path):
+        return done
+
+    keys = {(str(longitude), str(latitude)): (longitude, latitude) for longitude, latitude in locations}
+    with open(path) as checkpoint_file:
+        for line in checkpoint_file:
+            fields = line.split()
+            if len(fields) != 4 or not line.endswith('\n') or (fields[0], fields[1]) not in keys:
+                continue
+            try:
+                first, last = date.fromisoformat(fields[2]), date.fromisoformat(fields[3])
+            except ValueError:
+                continue
+            day, last = max(first, date_from), min(last, date_to)
+            location_dates = done[keys[(fields[0], fields[1])]]
+            while day <= last:
+                location_dates.add(day)
+                day += timedelta(days=1)
+    return done
@@ -10,5 +10,51 @@ DB_PORT = os.getenv('POSTGRES_PORT', '5432')
 DB_NAME = os.getenv('POSTGRES_DB')
 DB_USER = os.getenv('POSTGRES_USER')
 DB_PASSWORD = os.getenv('POSTGRES_PASSWORD')
+# Connections kept open by the engine, main.py raises it to its fetch and save threads (-w + -dw)
+DB_POOL_SIZE = int(os.getenv('DB_POOL_SIZE', 4))
+# Connections opened above DB_POOL_SIZE under load and closed when returned
+DB_POOL_OVERFLOW = int(os.getenv('DB_POOL_OVERFLOW', 4))
+
+# Open-Meteo endpoints: days within FORECAST_PAST_DAYS before today and later ones are requested from the forecast
+# API, older days from the archive. The historical forecast API serves every variable main.py requests, the ERA5
+# archive (https://archive-api.open-meteo.com/v1/archive) lacks visibility, showers and the 80/120 m temperatures
+FORECAST_API_URL = os.getenv('FORECAST_API_URL', 'https://api.open-meteo.com/v1/forecast')
+ARCHIVE_API_URL = os.getenv('ARCHIVE_API_URL', 'https://historical-forecast-api.open-meteo.com/v1/forecast')
+FORECAST_PAST_DAYS = int(os.getenv('FORECAST_PAST_DAYS', 92))
+# First day ARCHIVE_API_URL has data for, main.py refuses earlier -df. The historical forecast API keeps forecasts
+# since 2022, earlier days come back as NaN. Empty when the archive covers every date
+ARCHIVE_MIN_DATE = os.getenv('ARCHIVE_MIN_DATE', '2022-01-01')
+# Longest range of one API request, longer ranges are requested in parts at once and stitched back together
+API_CHUNK_DAYS = int(os.getenv('API_CHUNK_DAYS', 366))
+
+# Numpy dtype of converted hourly values, e.g. float32. Defaults to the dtype returned by the API
+UNITS_DTYPE = os.getenv('UNITS_DTYPE') or None
+
+# Layout of the daily stats in location_data: packed (series in a bytea column) or json, see app/payload_codec.py
+PAYLOAD_CODEC = os.getenv('PAYLOAD_CODEC', 'packed')
+
+# Day-granular cache of fetched hourly/daily data
+DAY_CACHE_PATH = os.getenv('DAY_CACHE_PATH', '.day_cache.sqlite')
+DAY_CACHE_MAX_BYTES = int(os.getenv('DAY_CACHE_MAX_BYTES', 512 * 1024 * 1024))
+# Seconds before recent and forecast days are fetched again, past days never expire
+DAY_CACHE_RECENT_TTL = int(os.getenv('DAY_CACHE_RECENT_TTL', 3600))
+
+# Append-only archive of raw API responses, replayed with main.py --replay. Archiving is off unless a path is set
+RESPONSE_ARCHIVE_PATH = os.getenv('RESPONSE_ARCHIVE_PATH', '')
+# Size after which responses go to a new segment file
+RESPONSE_ARCHIVE_SEGMENT_BYTES = int(os.getenv('RESPONSE_ARCHIVE_SEGMENT_BYTES', 256 * 1024 * 1024))
+# Oldest segments are deleted once the archive is larger
+RESPONSE_ARCHIVE_MAX_BYTES = int(os.getenv('RESPONSE_ARCHIVE_MAX_BYTES', 4 * 1024 * 1024 * 1024))
+
+# Read-side query service
+QUERY_SERVICE_HOST = os.getenv('QUERY_SERVICE_HOST', '127.0.0.1')
+QUERY_SERVICE_PORT = int(os.getenv('QUERY_SERVICE_PORT', 8000))
+QUERY_CACHE_MAX_BYTES = int(os.getenv('QUERY_CACHE_MAX_BYTES', 64 * 1024 * 1024))
+
+# Ingestion job queue, see app/job_queue.py
+JOB_LEASE_SECONDS = int(os.getenv('JOB_LEASE_SECONDS', 600))
+JOB_MAX_ATTEMPTS = int(os.getenv('JOB_MAX_ATTEMPTS', 5))
+# Seconds before the first retry of a failed job, doubled on every next attempt
+JOB_RETRY_DELAY = int(os.getenv('JOB_RETRY_DELAY', 60))
 
 db_connection_string = f"postgresql+psycopg2://{DB_USER}:{DB_PASSWORD}@{DB_HOST}:{DB_PORT}/{DB_NAME}"
\ No newline at end of file
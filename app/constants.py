@@ -1,5 +1,13 @@
+from decimal import Decimal
 from enum import StrEnum, auto
 
+# Scale of the longitude and latitude columns, locations equal at this scale are one location
+COORDINATE_QUANTUM = Decimal('0.0001')
+
+
+def quantize_coordinate(coordinate) -> Decimal:
+  return Decimal(coordinate).quantize(COORDINATE_QUANTUM)
+
 
 class HourlyParams(StrEnum):
   temperature_2m = auto()
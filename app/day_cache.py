@@ -0,0 +1,171 @@
+import sqlite3
+import threading
+import time
+from datetime import date, datetime, timedelta, UTC
+
+import numpy as np
+import pandas as pd
+
+from app import metrics
+from app.config import DAY_CACHE_PATH, DAY_CACHE_MAX_BYTES, DAY_CACHE_RECENT_TTL
+from app.frame_codec import dtype_to_text, text_to_dtype, to_dataframe, to_structured
+from app.open_meteo_data_transform import day_bounds, local_dates, series_interval
+
+# Days newer than this (and forecast days) can still change and expire after DAY_CACHE_RECENT_TTL
+RECENT_DAYS = 3
+
+# Days are cached per grid cell the API reported (see app/grid_cells.py): sites sharing a cell
+# store its data once, sites maps every requested location to the cell of its last response
+CREATE_TABLES_SQL = """
+    CREATE TABLE IF NOT EXISTS cell_days (
+        cell TEXT NOT NULL,
+        date TEXT NOT NULL,
+        timezone TEXT NOT NULL,
+        utc_offset INTEGER NOT NULL,
+        daily BLOB NOT NULL,
+        hourly BLOB NOT NULL,
+        daily_dtype TEXT NOT NULL,
+        hourly_dtype TEXT NOT NULL,
+        size INTEGER NOT NULL,
+        expires_at REAL,
+        accessed_at REAL NOT NULL,
+        PRIMARY KEY (cell, date)
+    );
+    CREATE INDEX IF NOT EXISTS idx_cell_days_accessed_at ON cell_days (accessed_at);
+    CREATE TABLE IF NOT EXISTS sites (
+        longitude TEXT NOT NULL,
+        latitude TEXT NOT NULL,
+        cell TEXT NOT NULL,
+        PRIMARY KEY (longitude, latitude)
+    );
+"""
+# PRAGMA user_version of the layout above. Version 0 files kept days per site in a days table
+CACHE_VERSION = 1
+SITE_DAYS_SQL = """
+    FROM cell_days JOIN sites USING (cell)
+    WHERE sites.longitude = ? AND sites.latitude = ? AND cell_days.date BETWEEN ? AND ?
+"""
+
+_connection = None
+# The connection is shared by the threads of the ingest pipeline (see app/pipeline.py)
+_lock = threading.Lock()
+
+
+def _connect() -> sqlite3.Connection:
+    global _connection
+    if _connection is None:
+        _connection = sqlite3.connect(DAY_CACHE_PATH, check_same_thread=False)
+        _connection.executescript(CREATE_TABLES_SQL)
+        if _connection.execute("PRAGMA user_version").fetchone()[0] < CACHE_VERSION:
+            # Cached days of older layouts are dropped once, they are fetched again
+            _connection.executescript(f"DROP TABLE IF EXISTS days; PRAGMA user_version = {CACHE_VERSION};")
+    return _connection
+
+
+def _cell_key(cell, timezone_name: str) -> str:
+    """Key of the (cell_longitude, cell_latitude, elevation) reported by the API, local days follow the timezone."""
+    cell_longitude, cell_latitude, elevation = cell
+    return f"{cell_longitude} {cell_latitude} {elevation} {timezone_name}"
+
+
+def _expires_at(day: date, now: float) -> float | None:
+    if day >= datetime.now(UTC).date() - timedelta(days=RECENT_DAYS):
+        return now + DAY_CACHE_RECENT_TTL
+    return None
+
+
+def store_days(
+    sites, cell, daily_dataframe: pd.DataFrame, hourly_dataframe: pd.DataFrame,
+    timezone_name: str, utc_offset_seconds: int
+):
+    """Split frames returned by combine_dataframes into days and cache every day once for the
+    (longitude, latitude) sites that got them from the (cell_longitude, cell_latitude, elevation) cell."""
+    with metrics.stage('cache_store'), _lock:
+        _store_days(
+            sites, _cell_key(cell, timezone_name), daily_dataframe, hourly_dataframe,
+            timezone_name, utc_offset_seconds)
+
+
+def _store_days(
+    sites, cell: str, daily_dataframe: pd.DataFrame, hourly_dataframe: pd.DataFrame,
+    timezone_name: str, utc_offset_seconds: int
+):
+    daily = to_structured(daily_dataframe)
+    hourly = to_structured(hourly_dataframe)
+    first_rows, end_rows, _ = day_bounds(hourly['date'], daily['date'], series_interval(hourly['date']))
+    days = local_dates(daily['date'], utc_offset_seconds).tolist()
+
+    daily_dtype, hourly_dtype = dtype_to_text(daily.dtype), dtype_to_text(hourly.dtype)
+
+    now = time.time()
+    rows = []
+    for index, day in enumerate(days):
+        daily_blob = daily[index:index + 1].tobytes()
+        hourly_blob = hourly[first_rows[index]:end_rows[index]].tobytes()
+        rows.append((
+            cell, day.isoformat(), timezone_name, utc_offset_seconds,
+            daily_blob, hourly_blob, daily_dtype, hourly_dtype,
+            len(daily_blob) + len(hourly_blob), _expires_at(day, now), now,
+        ))
+
+    connection = _connect()
+    with connection:
+        connection.executemany(
+            "INSERT OR REPLACE INTO cell_days VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)", rows)
+        connection.executemany(
+            "INSERT OR REPLACE INTO sites VALUES (?, ?, ?)",
+            [(str(longitude), str(latitude), cell) for longitude, latitude in sites]
+        )
+        _evict(connection)
+
+
+def _evict(connection: sqlite3.Connection):
+    """Drop least recently used days until the cache fits DAY_CACHE_MAX_BYTES."""
+    total_size = connection.execute("SELECT COALESCE(SUM(size), 0) FROM cell_days").fetchone()[0]
+    if total_size <= DAY_CACHE_MAX_BYTES:
+        return
+
+    evicted = []
+    for rowid, size in connection.execute("SELECT rowid, size FROM cell_days ORDER BY accessed_at"):
+        evicted.append((rowid,))
+        total_size -= size
+        if total_size <= DAY_CACHE_MAX_BYTES:
+            break
+    connection.executemany("DELETE FROM cell_days WHERE rowid = ?", evicted)
+
+
+def load_days(longitude, latitude, date_from: date, date_to: date):
+    """Cached days of a location within [date_from, date_to].
+
+    Returns the set of cached dates and (daily_dataframe, hourly_dataframe, timezone_name,
+    utc_offset_seconds) built from them in the combine_dataframes layout, or None if nothing is cached.
+    """
+    with metrics.stage('cache_load'), _lock:
+        return _load_days(longitude, latitude, date_from, date_to)
+
+
+def _load_days(longitude, latitude, date_from: date, date_to: date):
+    now = time.time()
+    connection = _connect()
+    with connection:
+        connection.execute("DELETE FROM cell_days WHERE expires_at < ?", (now,))
+        rows = connection.execute(
+            "SELECT cell_days.rowid, date, timezone, utc_offset, daily, hourly, daily_dtype, hourly_dtype"
+            + SITE_DAYS_SQL + "ORDER BY date",
+            (str(longitude), str(latitude), date_from.isoformat(), date_to.isoformat())
+        ).fetchall()
+        connection.executemany(
+            "UPDATE cell_days SET accessed_at = ? WHERE rowid = ?", [(now, row[0]) for row in rows])
+
+    if not rows:
+        return set(), None
+
+    dates = {date.fromisoformat(row[1]) for row in rows}
+    _, _, timezone_name, utc_offset_seconds, _, _, _, _ = rows[-1]
+    daily_dataframe = to_dataframe(np.concatenate([
+        np.frombuffer(row[4], dtype=text_to_dtype(row[6])) for row in rows
+    ]))
+    hourly_dataframe = to_dataframe(np.concatenate([
+        np.frombuffer(row[5], dtype=text_to_dtype(row[7])) for row in rows
+    ]))
+    return dates, (daily_dataframe, hourly_dataframe, timezone_name, utc_offset_seconds)
@@ -1,25 +1,207 @@
-from sqlalchemy import create_engine
-from sqlalchemy.orm import Session
-from sqlalchemy.dialects.postgresql import insert
+import io
+import time
+from collections import defaultdict
+from itertools import islice
 
+from sqlalchemy import create_engine, select, tuple_
+
+from app import metrics
 from app.db_models import LocationData
-from app.config import db_connection_string
-
-engine = create_engine(db_connection_string, echo=False)
-
-
-def save_records_data(records):
-    with Session(engine) as session:
-        session.begin()
-        try:
-            session.execute(
-                insert(LocationData)
-                .values(records)
-                # TOFIX: figure out how to handle correctly
-                .on_conflict_do_nothing(constraint='pk_location_data')
-            )
-        except:
-            session.rollback()
-            raise
-        else:
-            session.commit()
+from app.config import DB_POOL_OVERFLOW, DB_POOL_SIZE, db_connection_string
+from app.hourly_facts import save_facts
+from app.rollups import update_rollups
+
+_engine = None
+# Connections the threads of the process hold at once, see reserve_connections
+_reserved_connections = 0
+
+
+def get_engine():
+    """Engine of the weather-stats database, created on first use.
+
+    Its connections are pooled and reused by every query and save of the process, staging tables of
+    save_records_data are created once per connection.
+    """
+    global _engine
+    if _engine is None:
+        _engine = create_engine(
+            db_connection_string, echo=False,
+            pool_size=max(DB_POOL_SIZE, _reserved_connections), max_overflow=DB_POOL_OVERFLOW,
+            # Connections idle while the API is slow can be closed by the server in between
+            pool_pre_ping=True,
+        )
+    return _engine
+
+
+def reserve_connections(count: int):
+    """Keep at least count connections in the pool, for count threads using the database at once.
+
+    Must be called before the engine is created: threads waiting for a connection of a full pool
+    fail with a TimeoutError after 30 seconds.
+    """
+    global _reserved_connections
+    if _engine is not None:
+        raise RuntimeError("reserve_connections must be called before the engine is created")
+    _reserved_connections = count
+
+
+# Rows sent with one COPY and committed in one transaction
+COPY_CHUNK_SIZE = 10000
+
+STAGING_TABLE = f"{LocationData.__tablename__}_staging"
+COLUMNS = "longitude, latitude, date, timezone, data, series"
+
+# Session-local staging table, emptied by every commit
+CREATE_STAGING_SQL = f"""
+    CREATE TEMP TABLE IF NOT EXISTS {STAGING_TABLE}
+    (LIKE {LocationData.__tablename__} INCLUDING DEFAULTS)
+    ON COMMIT DELETE ROWS
+"""
+COPY_SQL = f"COPY {STAGING_TABLE} ({COLUMNS}) FROM STDIN"
+MERGE_SQL = f"""
+    INSERT INTO {LocationData.__tablename__} ({COLUMNS})
+    SELECT {COLUMNS} FROM {STAGING_TABLE}
+    ON CONFLICT ON CONSTRAINT pk_location_data DO NOTHING
+    RETURNING longitude, latitude, date
+"""
+# Recomputed stats replace the stored ones, only rows whose data changed are returned
+REPLACE_SQL = f"""
+    INSERT INTO {LocationData.__tablename__} ({COLUMNS})
+    SELECT {COLUMNS} FROM {STAGING_TABLE}
+    ON CONFLICT ON CONSTRAINT pk_location_data DO UPDATE
+        SET timezone = excluded.timezone, data = excluded.data, series = excluded.series
+        WHERE ({LocationData.__tablename__}.data, {LocationData.__tablename__}.series)
+            IS DISTINCT FROM (excluded.data, excluded.series)
+    RETURNING longitude, latitude, date
+"""
+
+# Monthly partitions of location_data are created on demand, see app/partitions.py
+CREATE_PARTITIONS_SQL = "SELECT create_location_data_partitions(%s, %s)"
+
+# Readers caching location_data (see app/query_service.py) listen on this channel,
+# the payload is "longitude,latitude" of a location that got new rows
+INGEST_CHANNEL = 'location_data_ingested'
+NOTIFY_SQL = "SELECT pg_notify(%s, %s)"
+
+
+def get_stored_dates(locations, date_from, date_to) -> dict:
+    """Dates already stored for every (longitude, latitude) in locations within [date_from, date_to].
+
+    One query served by pk_location_data, locations are matched at the column scale.
+    """
+    keys = {
+        (quantize_coordinate(longitude), quantize_coordinate(latitude)): (longitude, latitude)
+        for longitude, latitude in locations
+    }
+    query = (
+        select(LocationData.longitude, LocationData.latitude, LocationData.date)
+        .where(tuple_(LocationData.longitude, LocationData.latitude).in_(list(keys)))
+        .where(LocationData.date.between(date_from, date_to))
+    )
+
+    stored = defaultdict(set)
+    with get_engine().connect() as connection:
+        for longitude, latitude, day in connection.execute(query):
+            stored[keys[(longitude, latitude)]].add(day)
+    return stored
+
+
+# Backslash first, so escapes of the other characters are kept
+COPY_TEXT_ESCAPES = [('\\', '\\\\'), ('\t', '\\t'), ('\n', '\\n'), ('\r', '\\r')]
+
+
+def _copy_text(value) -> str:
+    """Field of the COPY text format, \\N is NULL."""
+    if value is None:
+        return '\\N'
+    value = str(value)
+    for character, escape in COPY_TEXT_ESCAPES:
+        if character in value:
+            value = value.replace(character, escape)
+    return value
+
+
+def _copy_bytes(value) -> str:
+    """bytea field of the COPY text format, hex with the backslash escaped."""
+    if value is None:
+        return '\\N'
+    return f"\\\\x{value.hex()}"
+
+
+def _records_to_copy(records) -> io.StringIO:
+    """Records as COPY text rows, the JSON text of 'data' is written as is apart from escapes.
+
+    Unlike csv the text format needs no quoting, so the JSON is not scanned for '"' and ','.
+    'series' holds the packed series of app/payload_codec.py or None.
+    """
+    buffer = io.StringIO()
+    buffer.writelines(
+        f"{record['longitude']}\t{record['latitude']}\t{record['date']}\t"
+        f"{_copy_text(record['timezone'])}\t{_copy_text(record['data'])}\t{_copy_bytes(record.get('series'))}\n"
+        for record in records
+    )
+    buffer.seek(0)
+    return buffer
+
+
+# Months known to have a location_data partition in this process
+_partition_months = set()
+
+
+def ensure_partitions(connection, records):
+    """Create missing monthly partitions for the dates of records, committed before rows are copied."""
+    months = {str(record['date'])[:7] for record in records} - _partition_months
+    if not months:
+        return
+    with connection.cursor() as cursor:
+        cursor.execute(CREATE_PARTITIONS_SQL, (f"{min(months)}-01", f"{max(months)}-01"))
+    connection.commit()
+    _partition_months.update(months)
+
+
+def save_records_data(records, chunk_size: int = COPY_CHUNK_SIZE, replace: bool = False) -> int:
+    """Bulk load records into location_data, returns the number of inserted rows.
+
+    Every chunk is copied into a staging table and merged on pk_location_data in its own
+    transaction together with the hourly facts of the records (see app/hourly_facts.py) and the
+    weekly and monthly rollups of the inserted days. Rows that already exist are skipped, or
+    updated with replace when their data differs.
+    """
+    started_at = time.perf_counter()
+    total, inserted = 0, 0
+    records = iter(records)
+
+    connection = get_engine().raw_connection()
+    try:
+        while chunk := list(islice(records, chunk_size)):
+            ensure_partitions(connection, chunk)
+            with connection.cursor() as cursor:
+                cursor.execute(CREATE_STAGING_SQL)
+                cursor.copy_expert(COPY_SQL, _records_to_copy(chunk))
+                cursor.execute(REPLACE_SQL if replace else MERGE_SQL)
+                inserted_rows = cursor.fetchall()
+                save_facts(cursor, [record['facts'] for record in chunk if record.get('facts')])
+                inserted += len(inserted_rows)
+                update_rollups(cursor, inserted_rows)
+                # Delivered on commit, so readers never see a notification before the rows
+                cursor.executemany(NOTIFY_SQL, [
+                    (INGEST_CHANNEL, f"{longitude},{latitude}")
+                    for longitude, latitude in {row[:2] for row in inserted_rows}
+                ])
+            connection.commit()
+            total += len(chunk)
+    except:
+        connection.rollback()
+        raise
+    finally:
+        connection.close()
+
+    metrics.increment('rows_inserted', inserted)
+    metrics.increment('rows_skipped', total - inserted)
+
+    elapsed = time.perf_counter() - started_at
+    print(
+        f"Saved {inserted} of {total} rows in {elapsed:.2f} s "
+        f"({total / elapsed if elapsed else 0:.0f} rows/s)"
+    )
+    return inserted
@@ -1,6 +1,9 @@
 from sqlalchemy.orm import mapped_column, DeclarativeBase
-from sqlalchemy import String, Numeric, Date
-from sqlalchemy.dialects.postgresql import JSONB
+from sqlalchemy import (
+    BigInteger, DateTime, Float, Identity, Index, Integer, LargeBinary, REAL, SmallInteger, String, Numeric, Date,
+    Text, func
+)
+from sqlalchemy.dialects.postgresql import ARRAY, JSONB
 
 
 class Base(DeclarativeBase):
@@ -9,12 +12,156 @@ class Base(DeclarativeBase):
 
 class LocationData(Base):
     __tablename__ = "location_data"
+    # Monthly partitions location_data_pYYYY_MM are managed by app/partitions.py
+    __table_args__ = (
+        Index('idx_location_data_date', 'date', postgresql_using='brin'),
+        {'postgresql_partition_by': 'RANGE (date)'},
+    )
 
     longitude = mapped_column(Numeric(7, 4), nullable=False, primary_key=True)
     latitude = mapped_column(Numeric(7, 4), nullable=False, primary_key=True)
     date = mapped_column(Date, nullable=False, primary_key=True)
     timezone = mapped_column(String(50), nullable=True)
     data = mapped_column(JSONB, nullable=True)
+    # Hourly series packed by app/payload_codec.py, NULL when they are in data
+    series = mapped_column(LargeBinary, nullable=True)
 
     def __repr__(self):
         return f"<LocationData(id={self.id}, lat={self.latitude}, lon={self.longitude}, date={self.date})>"
+
+
+
+class LocationHourly(Base):
+    """combine_dataframes output of a location-day, location_data is recomputed from it by app/hourly_facts.py.
+
+    Series columns hold the values of the day in time order, the i-th one is at
+    day_start + i * interval_seconds (unix seconds). Values are in the units of transform_units.
+    """
+    __tablename__ = "location_hourly"
+
+    longitude = mapped_column(Numeric(7, 4), nullable=False, primary_key=True)
+    latitude = mapped_column(Numeric(7, 4), nullable=False, primary_key=True)
+    date = mapped_column(Date, nullable=False, primary_key=True)
+    timezone = mapped_column(String(50), nullable=True)
+    utc_offset = mapped_column(Integer, nullable=False)
+    interval_seconds = mapped_column(Integer, nullable=False)
+    day_start = mapped_column(BigInteger, nullable=False)
+    sunrise = mapped_column(BigInteger, nullable=False)
+    sunset = mapped_column(BigInteger, nullable=False)
+    daylight_duration = mapped_column(REAL, nullable=False)
+    temperature_2m = mapped_column(ARRAY(REAL), nullable=False)
+    relative_humidity_2m = mapped_column(ARRAY(REAL), nullable=False)
+    dew_point_2m = mapped_column(ARRAY(REAL), nullable=False)
+    apparent_temperature = mapped_column(ARRAY(REAL), nullable=False)
+    temperature_80m = mapped_column(ARRAY(REAL), nullable=False)
+    temperature_120m = mapped_column(ARRAY(REAL), nullable=False)
+    wind_speed_10m = mapped_column(ARRAY(REAL), nullable=False)
+    wind_speed_80m = mapped_column(ARRAY(REAL), nullable=False)
+    wind_direction_10m = mapped_column(ARRAY(REAL), nullable=False)
+    wind_direction_80m = mapped_column(ARRAY(REAL), nullable=False)
+    visibility = mapped_column(ARRAY(REAL), nullable=False)
+    evapotranspiration = mapped_column(ARRAY(REAL), nullable=False)
+    weather_code = mapped_column(ARRAY(SmallInteger), nullable=False)
+    soil_temperature_0cm = mapped_column(ARRAY(REAL), nullable=False)
+    soil_temperature_6cm = mapped_column(ARRAY(REAL), nullable=False)
+    rain = mapped_column(ARRAY(REAL), nullable=False)
+    showers = mapped_column(ARRAY(REAL), nullable=False)
+    snowfall = mapped_column(ARRAY(REAL), nullable=False)
+
+    def __repr__(self):
+        return f"<LocationHourly(lat={self.latitude}, lon={self.longitude}, date={self.date})>"
+
+
+class RollupMixin:
+    """Aggregates of the daily location_data stats over a period starting at period_start.
+
+    avg_* fields are averages of the daily averages, total_* fields are sums of the daily totals.
+    """
+    longitude = mapped_column(Numeric(7, 4), nullable=False, primary_key=True)
+    latitude = mapped_column(Numeric(7, 4), nullable=False, primary_key=True)
+    period_start = mapped_column(Date, nullable=False, primary_key=True)
+    # Number of stored days in the period
+    days = mapped_column(Integer, nullable=False)
+    avg_temperature_2m_24h = mapped_column(Float, nullable=True)
+    avg_relative_humidity_2m_24h = mapped_column(Float, nullable=True)
+    avg_dew_point_2m_24h = mapped_column(Float, nullable=True)
+    avg_apparent_temperature_24h = mapped_column(Float, nullable=True)
+    avg_temperature_80m_24h = mapped_column(Float, nullable=True)
+    avg_temperature_120m_24h = mapped_column(Float, nullable=True)
+    avg_wind_speed_10m_24h = mapped_column(Float, nullable=True)
+    avg_wind_speed_80m_24h = mapped_column(Float, nullable=True)
+    avg_visibility_24h = mapped_column(Float, nullable=True)
+    total_rain_24h = mapped_column(BigInteger, nullable=True)
+    total_showers_24h = mapped_column(BigInteger, nullable=True)
+    total_snowfall_24h = mapped_column(BigInteger, nullable=True)
+    avg_temperature_2m_daylight = mapped_column(Float, nullable=True)
+    avg_relative_humidity_2m_daylight = mapped_column(Float, nullable=True)
+    avg_dew_point_2m_daylight = mapped_column(Float, nullable=True)
+    avg_apparent_temperature_daylight = mapped_column(Float, nullable=True)
+    avg_temperature_80m_daylight = mapped_column(Float, nullable=True)
+    avg_temperature_120m_daylight = mapped_column(Float, nullable=True)
+    avg_wind_speed_10m_daylight = mapped_column(Float, nullable=True)
+    avg_wind_speed_80m_daylight = mapped_column(Float, nullable=True)
+    avg_visibility_daylight = mapped_column(Float, nullable=True)
+    total_rain_daylight = mapped_column(BigInteger, nullable=True)
+    total_showers_daylight = mapped_column(BigInteger, nullable=True)
+    total_snowfall_daylight = mapped_column(BigInteger, nullable=True)
+    avg_daylight_hours = mapped_column(Float, nullable=True)
+    total_daylight_hours = mapped_column(Float, nullable=True)
+
+    def __repr__(self):
+        return f"<{type(self).__name__}(lat={self.latitude}, lon={self.longitude}, period_start={self.period_start})>"
+
+
+class LocationDataWeekly(RollupMixin, Base):
+    __tablename__ = "location_data_weekly"
+
+
+class LocationDataMonthly(RollupMixin, Base):
+    __tablename__ = "location_data_monthly"
+
+
+class IngestJob(Base):
+    __tablename__ = "ingest_jobs"
+
+    id = mapped_column(BigInteger, Identity(), primary_key=True)
+    longitude = mapped_column(Numeric(7, 4), nullable=False)
+    latitude = mapped_column(Numeric(7, 4), nullable=False)
+    date_from = mapped_column(Date, nullable=False)
+    date_to = mapped_column(Date, nullable=False)
+    # pending -> running -> done, or back to pending for a retry, or dead after the last attempt
+    status = mapped_column(String(10), nullable=False, server_default='pending')
+    attempts = mapped_column(Integer, nullable=False, server_default='0')
+    run_after = mapped_column(DateTime(timezone=True), nullable=False, server_default=func.now())
+    leased_until = mapped_column(DateTime(timezone=True), nullable=True)
+    worker = mapped_column(String(100), nullable=True)
+    last_error = mapped_column(Text, nullable=True)
+    created_at = mapped_column(DateTime(timezone=True), nullable=False, server_default=func.now())
+    updated_at = mapped_column(DateTime(timezone=True), nullable=False, server_default=func.now())
+
+    def __repr__(self):
+        return f"<IngestJob(id={self.id}, lat={self.latitude}, lon={self.longitude}, " \
+               f"date_from={self.date_from}, date_to={self.date_to}, status={self.status})>"
+
+
+class LocationCell(Base):
+    """Grid cell the API snapped a requested location to, learned from its responses by app/grid_cells.py.
+
+    Locations with the same cell, elevation, timezone and UTC offset get identical data, only one of them is fetched.
+    """
+    __tablename__ = "location_cells"
+
+    longitude = mapped_column(Numeric(7, 4), nullable=False, primary_key=True)
+    latitude = mapped_column(Numeric(7, 4), nullable=False, primary_key=True)
+    # Coordinates and elevation reported by the API, exact float32 values
+    cell_longitude = mapped_column(Float, nullable=False)
+    cell_latitude = mapped_column(Float, nullable=False)
+    elevation = mapped_column(Float, nullable=False)
+    # Timezone the API resolved for the location (timezone=auto) and its offset, NULL for cells learned before
+    timezone = mapped_column(String(50), nullable=True)
+    utc_offset = mapped_column(Integer, nullable=True)
+    updated_at = mapped_column(DateTime(timezone=True), nullable=False, server_default=func.now())
+
+    def __repr__(self):
+        return f"<LocationCell(lat={self.latitude}, lon={self.longitude}, " \
+               f"cell_lat={self.cell_latitude}, cell_lon={self.cell_longitude})>"
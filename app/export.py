@@ -0,0 +1,179 @@
+import csv
+import json
+import os
+from datetime import datetime
+
+from pandas import DataFrame
+
+OUTPUT_DIR = 'output'
+
+LAYOUT_RUN = 'run'
+LAYOUT_PER_DAY = 'per_day'
+
+
+class PerDayWriter:
+    """One {longitude}_{latitude}_{date}.csv|json file per location and day."""
+
+    def __init__(self, extension):
+        self.extension = extension
+
+    def write(self, df_data, longitude, latitude):
+        result_df = DataFrame(data=df_data)
+        for idx in range(len(result_df)):
+            day_df = result_df.iloc[idx]
+            with open(f"{OUTPUT_DIR}/{longitude}_{latitude}_{day_df.date}.{self.extension}", "w") as day_file:
+                day_file.write(day_df.to_json() if self.extension == 'json' else day_df.to_csv())
+
+    def close(self):
+        pass
+
+
+def _nan_to_none(value):
+    """None in place of NaN (e.g. daylight averages of polar-night days), JSON has no literal for it."""
+    if isinstance(value, float):
+        return None if value != value else value
+    if isinstance(value, list) and any(item != item for item in value):
+        return [None if item != item else item for item in value]
+    return value
+
+
+def _rows(df_data, longitude, latitude):
+    """Rows of df_data as dicts, prefixed with the location, NaN values are None."""
+    keys = list(df_data)
+    for values in zip(*df_data.values()):
+        yield {
+            'longitude': float(longitude),
+            'latitude': float(latitude),
+            **dict(zip(keys, map(_nan_to_none, values)))
+        }
+
+
+class CsvWriter:
+    """All rows of a run in one CSV file, hourly series are written as JSON arrays."""
+
+    def __init__(self, path):
+        self.file = open(path, 'w', newline='')
+        self.writer = None
+
+    def write(self, df_data, longitude, latitude):
+        for row in _rows(df_data, longitude, latitude):
+            if self.writer is None:
+                self.writer = csv.DictWriter(self.file, fieldnames=list(row))
+                self.writer.writeheader()
+            self.writer.writerow({
+                key: json.dumps(value, allow_nan=False) if isinstance(value, list) else value
+                for key, value in row.items()
+            })
+
+    def close(self):
+        self.file.close()
+
+
+class NdjsonWriter:
+    """All rows of a run in one newline-delimited JSON file."""
+
+    def __init__(self, path):
+        self.file = open(path, 'w')
+
+    def write(self, df_data, longitude, latitude):
+        self.file.writelines(
+            json.dumps(row, allow_nan=False) + '\n' for row in _rows(df_data, longitude, latitude)
+        )
+
+    def close(self):
+        self.file.close()
+
+
+def _to_table(df_data, longitude, latitude, schema=None):
+    import pyarrow as pa
+
+    columns = {
+        'longitude': [float(longitude)] * len(df_data['date']),
+        'latitude': [float(latitude)] * len(df_data['date']),
+        **df_data
+    }
+    table = pa.table(columns)
+    if schema is None:
+        return table.set_column(
+            table.schema.get_field_index('date'), 'date', table['date'].cast(pa.date32()))
+    return table.cast(schema)
+
+
+class ArrowWriter:
+    """All rows of a run in one Arrow IPC file, a record batch per write."""
+
+    def __init__(self, path):
+        import pyarrow  # noqa: F401, fail early when pyarrow is not installed
+
+        self.path = path
+        self.schema = None
+        self.writer = None
+
+    def write(self, df_data, longitude, latitude):
+        import pyarrow as pa
+
+        table = _to_table(df_data, longitude, latitude, self.schema)
+        if self.writer is None:
+            self.schema = table.schema
+            self.writer = pa.ipc.new_file(self.path, self.schema)
+        self.writer.write_table(table)
+
+    def close(self):
+        if self.writer is not None:
+            self.writer.close()
+
+
+class ParquetWriter:
+    """Rows of a run partitioned by month: {directory}/month=YYYY-MM/{name}.parquet."""
+
+    def __init__(self, directory, name):
+        import pyarrow.parquet  # noqa: F401, fail early when pyarrow is not installed
+
+        self.directory = directory
+        self.name = name
+        self.schema = None
+        self.writers = {}
+
+    def write(self, df_data, longitude, latitude):
+        import pyarrow as pa
+        import pyarrow.compute as pc
+        import pyarrow.parquet as pq
+
+        table = _to_table(df_data, longitude, latitude, self.schema)
+        self.schema = table.schema
+
+        months = pa.array([date[:7] for date in df_data['date']])
+        for month in pc.unique(months).to_pylist():
+            if month not in self.writers:
+                partition = os.path.join(self.directory, f"month={month}")
+                os.makedirs(partition, exist_ok=True)
+                self.writers[month] = pq.ParquetWriter(
+                    os.path.join(partition, f"{self.name}.parquet"), self.schema)
+            self.writers[month].write_table(table.filter(pc.equal(months, month)))
+
+    def close(self):
+        for writer in self.writers.values():
+            writer.close()
+
+
+def open_writers(csv=False, json=False, parquet=False, arrow=False, layout=LAYOUT_RUN):
+    """Writers for the requested formats, every writer has write(df_data, longitude, latitude) and close()."""
+    os.makedirs(OUTPUT_DIR, exist_ok=True)
+    run_name = datetime.now().strftime('weather_%Y%m%dT%H%M%S')
+
+    writers = []
+    if layout == LAYOUT_PER_DAY:
+        if json:
+            writers.append(PerDayWriter('json'))
+        if csv:
+            writers.append(PerDayWriter('csv'))
+    else:
+        if json:
+            writers.append(NdjsonWriter(f"{OUTPUT_DIR}/{run_name}.ndjson"))
+        if csv:
+            writers.append(CsvWriter(f"{OUTPUT_DIR}/{run_name}.csv"))
+    if parquet:
+        writers.append(ParquetWriter(f"{OUTPUT_DIR}/parquet", run_name))
+    if arrow:
+        writers.append(ArrowWriter(f"{OUTPUT_DIR}/{run_name}.arrow"))
+    return writers
@@ -0,0 +1,38 @@
+"""Frames in the combine_dataframes layout as structured arrays and back.
+
+Dates become unix seconds, so a frame is one flat buffer: the day cache stores the raw bytes of
+days (app/day_cache.py) and the transform pool shares hourly frames through shared memory
+(app/parallel_transform.py). The dtype travels as its descriptor string.
+"""
+from ast import literal_eval
+from functools import lru_cache
+
+import numpy as np
+import pandas as pd
+
+from app.open_meteo_data_transform import to_unix_seconds
+
+
+def dtype_to_text(dtype: np.dtype) -> str:
+    return repr(np.lib.format.dtype_to_descr(dtype))
+
+
+# Parsed once per distinct descriptor
+@lru_cache
+def text_to_dtype(text: str) -> np.dtype:
+    return np.lib.format.descr_to_dtype(literal_eval(text))
+
+
+def to_structured(dataframe: pd.DataFrame) -> np.ndarray:
+    """DataFrame with a `date` column as a structured array, dates as unix seconds."""
+    columns = [column for column in dataframe.columns if column != 'date']
+    return np.rec.fromarrays(
+        [to_unix_seconds(dataframe['date'])] + [dataframe[column].to_numpy() for column in columns],
+        names=['date'] + columns
+    )
+
+
+def to_dataframe(records: np.ndarray) -> pd.DataFrame:
+    dataframe = pd.DataFrame({name: records[name] for name in records.dtype.names})
+    dataframe['date'] = pd.to_datetime(dataframe['date'], unit='s', utc=True)
+    return dataframe
@@ -0,0 +1,109 @@
+"""Coalescing of requests for locations in the same grid cell of the weather model.
+
+The API snaps every requested coordinate to a model grid cell and reports the cell coordinates and
+the elevation its values were corrected for. With timezone=auto the local days are cut in the
+timezone of the requested point, which can differ within a cell near a timezone border. Locations
+with the same cell, elevation, timezone and UTC offset get identical data, so only one of them has
+to be fetched. Cells are learned from the responses and
+kept in location_cells: later runs request one location per cell and range and fan the data out
+to the others. Locations without a known cell are requested as they are.
+"""
+from sqlalchemy import func, select, tuple_
+from sqlalchemy.dialects.postgresql import insert
+
+from app import metrics
+from app.constants import quantize_coordinate
+from app.db_client import get_engine
+from app.db_models import LocationCell
+
+
+def _key(longitude, latitude):
+    return quantize_coordinate(longitude), quantize_coordinate(latitude)
+
+
+def load_cells(locations) -> dict:
+    """(longitude, latitude) -> (cell_longitude, cell_latitude, elevation, timezone, utc_offset) of the
+    locations with a known cell."""
+    keys = {_key(longitude, latitude): (longitude, latitude) for longitude, latitude in locations}
+    query = (
+        select(
+            LocationCell.longitude, LocationCell.latitude,
+            LocationCell.cell_longitude, LocationCell.cell_latitude, LocationCell.elevation,
+            LocationCell.timezone, LocationCell.utc_offset
+        )
+        .where(tuple_(LocationCell.longitude, LocationCell.latitude).in_(list(keys)))
+        # Cells learned without a timezone are requested again and updated by save_cells
+        .where(LocationCell.timezone.is_not(None))
+    )
+    with get_engine().connect() as connection:
+        return {
+            keys[(longitude, latitude)]: tuple(cell)
+            for longitude, latitude, *cell in connection.execute(query)
+        }
+
+
+def learn_cells(params, responses) -> dict:
+    """Cells of the requested locations reported by their responses, in the load_cells format."""
+    return {
+        (longitude, latitude): (
+            response.Longitude(), response.Latitude(), response.Elevation(),
+            response.Timezone().decode('utf-8'), response.UtcOffsetSeconds()
+        )
+        for longitude, latitude, response in zip(params['longitude'], params['latitude'], responses)
+    }
+
+
+def save_cells(cells: dict):
+    """Insert or update the cells of locations, a location moves when the API changes its grid."""
+    if not cells:
+        return
+    # Locations equal at the column scale are one row
+    rows = {
+        _key(longitude, latitude): {
+            'longitude': quantize_coordinate(longitude),
+            'latitude': quantize_coordinate(latitude),
+            'cell_longitude': cell_longitude,
+            'cell_latitude': cell_latitude,
+            'elevation': elevation,
+            'timezone': timezone,
+            'utc_offset': utc_offset,
+        }
+        for (longitude, latitude), (cell_longitude, cell_latitude, elevation, timezone, utc_offset) in cells.items()
+    }
+    statement = insert(LocationCell).values(list(rows.values()))
+    columns = ['cell_longitude', 'cell_latitude', 'elevation', 'timezone', 'utc_offset']
+    changed = tuple_(*(LocationCell.__table__.c[column] for column in columns)).is_distinct_from(
+        tuple_(*(statement.excluded[column] for column in columns)))
+    statement = statement.on_conflict_do_update(
+        constraint='pk_location_cells',
+        set_={
+            **{column: statement.excluded[column] for column in columns},
+            'updated_at': func.now(),
+        },
+        where=changed,
+    )
+    with get_engine().begin() as connection:
+        connection.execute(statement)
+
+
+def coalesce(locations, cells: dict):
+    """Split locations into the ones to request and the ones sharing their data.
+
+    Returns (representatives, fan_out), fan_out maps a representative to all locations of its cell,
+    the representative first. Locations without a cell in cells are representatives of themselves.
+    """
+    representatives = []
+    sites_of_cell = {}
+    fan_out = {}
+    for location in locations:
+        cell = cells.get(location)
+        if cell is None:
+            representatives.append(location)
+        elif cell not in sites_of_cell:
+            representatives.append(location)
+            sites_of_cell[cell] = fan_out[location] = [location]
+        else:
+            sites_of_cell[cell].append(location)
+
+    metrics.increment('locations_coalesced', len(locations) - len(representatives))
+    return representatives, {location: sites for location, sites in fan_out.items() if len(sites) > 1}
@@ -0,0 +1,272 @@
+"""Hourly fact table location_hourly and recomputation of location_data from it.
+
+save_records_data stores the combine_dataframes output of every ingested location-day next to its
+stats, one row per day with an array per hourly parameter. After a fix in the transform the stats
+are recomputed without the API:
+
+    python -m app.hourly_facts reprocess [-df DATE_FROM] [-dt DATE_TO] [-bs BATCH_DAYS] [-tw WORKERS]
+
+Rows are written with binary COPY and read back with array_send, so the arrays are never formatted
+or parsed as text.
+"""
+import argparse
+import io
+import struct
+from datetime import date
+from decimal import Decimal
+from itertools import groupby
+
+import numpy as np
+import pandas as pd
+
+from app.args_parser import _validate_date
+from app.constants import HourlyParams
+from app.db_models import LocationHourly
+from app.open_meteo_data_transform import day_bounds, local_dates, series_interval, to_unix_seconds
+
+FACTS_TABLE = LocationHourly.__tablename__
+STAGING_TABLE = f"{FACTS_TABLE}_staging"
+COLUMNS = ', '.join(column.name for column in LocationHourly.__table__.columns)
+SERIES_PARAMS = HourlyParams.to_list()
+INT_PARAMS = ['weather_code']
+
+# Location-days read from the server-side cursor and recomputed at once
+REPROCESS_BATCH_DAYS = 20000
+
+# Session-local staging table, emptied by every commit
+CREATE_STAGING_SQL = f"""
+    CREATE TEMP TABLE IF NOT EXISTS {STAGING_TABLE}
+    (LIKE {FACTS_TABLE} INCLUDING DEFAULTS)
+    ON COMMIT DELETE ROWS
+"""
+COPY_SQL = f"COPY {STAGING_TABLE} ({COLUMNS}) FROM STDIN WITH (FORMAT binary)"
+MERGE_SQL = f"""
+    INSERT INTO {FACTS_TABLE} ({COLUMNS})
+    SELECT {COLUMNS} FROM {STAGING_TABLE}
+    ON CONFLICT ON CONSTRAINT pk_location_hourly DO NOTHING
+"""
+READ_SQL = f"""
+    SELECT longitude, latitude, timezone, utc_offset, interval_seconds, day_start, sunrise, sunset,
+        daylight_duration, {', '.join(f'array_send({param})' for param in SERIES_PARAMS)}
+    FROM {FACTS_TABLE}
+    WHERE (%(date_from)s::date IS NULL OR date >= %(date_from)s) AND (%(date_to)s::date IS NULL OR date <= %(date_to)s)
+    ORDER BY longitude, latitude, date
+"""
+
+# Binary COPY format, see the COPY documentation and the *_send functions of PostgreSQL
+COPY_HEADER = b'PGCOPY\n\xff\r\n\x00' + struct.pack('!ii', 0, 0)
+COPY_TRAILER = struct.pack('!h', -1)
+POSTGRES_EPOCH_DAYS = (date(2000, 1, 1) - date(1970, 1, 1)).days
+NUMERIC_BASE = 10000
+NUMERIC_SCALE = 4
+NUMERIC_NEGATIVE = 0x4000
+# One-dimensional array without NULLs: ndim, has_nulls, element OID, length, lower bound
+ARRAY_HEADER = struct.Struct('!iiiii')
+FLOAT4_OID, INT2_OID = 700, 21
+# Array elements are (length, value) pairs
+FLOAT4_ELEMENT = np.dtype([('length', '>i4'), ('value', '>f4')])
+INT2_ELEMENT = np.dtype([('length', '>i4'), ('value', '>i2')])
+
+
+def _field(data: bytes) -> bytes:
+    return struct.pack('!i', len(data)) + data
+
+
+def _numeric(value) -> bytes:
+    """numeric(7, 4) in the numeric_send format, base 10000 digits."""
+    scaled = int(Decimal(value).quantize(Decimal(1).scaleb(-NUMERIC_SCALE)).scaleb(NUMERIC_SCALE))
+    integer, fraction = divmod(abs(scaled), NUMERIC_BASE)
+    digits = []
+    while integer:
+        integer, digit = divmod(integer, NUMERIC_BASE)
+        digits.insert(0, digit)
+    weight = len(digits) - 1
+    digits.append(fraction)
+    return struct.pack(
+        f'!hhhh{len(digits)}h', len(digits), weight, NUMERIC_NEGATIVE if scaled < 0 else 0, NUMERIC_SCALE, *digits)
+
+
+def _array_fields(values: np.ndarray, first_rows: np.ndarray, end_rows: np.ndarray, oid, element) -> list[bytes]:
+    """Binary COPY field of the values[first_row:end_row] array of every day."""
+    elements = np.empty(len(values), dtype=element)
+    elements['length'] = element['value'].itemsize
+    elements['value'] = values
+    data = elements.tobytes()
+    return [
+        _field(ARRAY_HEADER.pack(1, 0, oid, end - start, 1) + data[start * element.itemsize:end * element.itemsize])
+        for start, end in zip(first_rows.tolist(), end_rows.tolist())
+    ]
+
+
+def fact_rows(
+    longitude, latitude, daily_dataframe: pd.DataFrame, hourly_dataframe: pd.DataFrame,
+    timezone_name: str, utc_offset_seconds: int
+) -> list[bytes]:
+    """Binary COPY tuples of location_hourly, one per day of combine_dataframes output."""
+    timestamps = to_unix_seconds(hourly_dataframe['date'])
+    day_starts = to_unix_seconds(daily_dataframe['date'])
+    interval_seconds = series_interval(timestamps)
+    first_rows, end_rows, _ = day_bounds(timestamps, day_starts, interval_seconds)
+
+    location = struct.pack('!h', len(LocationHourly.__table__.columns)) + b''.join([
+        _field(_numeric(longitude)),
+        _field(_numeric(latitude)),
+    ])
+    timezone = _field(timezone_name.encode()) if timezone_name is not None else struct.pack('!i', -1)
+    offsets = timezone + _field(struct.pack('!i', utc_offset_seconds)) + _field(struct.pack('!i', interval_seconds))
+    days = zip(
+        (local_dates(day_starts, utc_offset_seconds).astype(np.int64) - POSTGRES_EPOCH_DAYS).tolist(),
+        day_starts.tolist(),
+        daily_dataframe['sunrise'].to_numpy(dtype=np.int64).tolist(),
+        daily_dataframe['sunset'].to_numpy(dtype=np.int64).tolist(),
+        daily_dataframe['daylight_duration'].to_numpy(dtype=np.float32).tolist(),
+    )
+    series = [
+        _array_fields(
+            hourly_dataframe[param].to_numpy(), first_rows, end_rows,
+            *((INT2_OID, INT2_ELEMENT) if param in INT_PARAMS else (FLOAT4_OID, FLOAT4_ELEMENT))
+        )
+        for param in SERIES_PARAMS
+    ]
+
+    return [
+        b''.join([
+            location,
+            struct.pack('!ii', 4, day),
+            offsets,
+            struct.pack('!iq iq iq if', 8, day_start, 8, sunrise, 8, sunset, 4, daylight_duration),
+            *arrays,
+        ])
+        for (day, day_start, sunrise, sunset, daylight_duration), *arrays in zip(days, *series)
+    ]
+
+
+def save_facts(cursor, rows: list[bytes]):
+    """Copy fact_rows into location_hourly within the cursor transaction, stored days are kept."""
+    if not rows:
+        return
+    cursor.execute(CREATE_STAGING_SQL)
+    cursor.copy_expert(COPY_SQL, io.BytesIO(b''.join([COPY_HEADER, *rows, COPY_TRAILER])))
+    cursor.execute(MERGE_SQL)
+
+
+def _array_values(arrays, element) -> np.ndarray:
+    """Values of array_send results, one-dimensional arrays without NULLs."""
+    data = b''.join(array[ARRAY_HEADER.size:] for array in arrays)
+    return np.frombuffer(data, dtype=element)['value']
+
+
+def to_frames(rows):
+    """(longitude, latitude, daily_dataframe, hourly_dataframe, timezone_name, utc_offset_seconds)
+    in the combine_dataframes layout from READ_SQL rows, one per location and interval."""
+    frames = []
+    for (longitude, latitude, interval_seconds), location_rows in groupby(
+        rows, key=lambda row: (row[0], row[1], row[4])
+    ):
+        location_rows = list(location_rows)
+        columns = list(zip(*location_rows))
+        day_starts = np.array(columns[5], dtype=np.int64)
+        lengths = np.array(
+            [(len(array) - ARRAY_HEADER.size) // FLOAT4_ELEMENT.itemsize for array in columns[9]], dtype=np.int64)
+        day_offsets = np.repeat(np.cumsum(lengths) - lengths, lengths)
+        timestamps = np.repeat(day_starts, lengths) + (np.arange(lengths.sum()) - day_offsets) * interval_seconds
+
+        hourly_dataframe = pd.DataFrame({
+            'date': pd.to_datetime(timestamps, unit='s', utc=True),
+            **{
+                param: _array_values(
+                    columns[9 + index], INT2_ELEMENT if param in INT_PARAMS else FLOAT4_ELEMENT
+                ).astype(np.int64 if param in INT_PARAMS else np.float32)
+                for index, param in enumerate(SERIES_PARAMS)
+            }
+        })
+        daily_dataframe = pd.DataFrame({
+            'date': pd.to_datetime(day_starts, unit='s', utc=True),
+            'sunrise': np.array(columns[6], dtype=np.int64),
+            'sunset': np.array(columns[7], dtype=np.int64),
+            'daylight_duration': np.array(columns[8], dtype=np.float32),
+        })
+        _, _, timezone_name, utc_offset_seconds, *_ = location_rows[-1]
+        frames.append((longitude, latitude, daily_dataframe, hourly_dataframe, timezone_name, utc_offset_seconds))
+    return frames
+
+
+def reprocess(date_from: date | None = None, date_to: date | None = None,
+              batch_days: int = REPROCESS_BATCH_DAYS) -> int:
+    """Recompute location_data of the location-days stored in location_hourly within [date_from, date_to].
+
+    Returns the number of location_data rows written, days with unchanged stats are not rewritten.
+    Days stored in another payload layout than PAYLOAD_CODEC are rewritten in it.
+    """
+    # db_client imports this module
+    from app.db_client import get_engine, save_records_data
+    from app.parallel_transform import transform_many
+    from app.payload_codec import encode
+
+    connection = get_engine().raw_connection()
+    days, written = 0, 0
+    try:
+        # A named cursor is a server-side one, only batch_days rows are held in memory
+        with connection.cursor(name=f"{FACTS_TABLE}_reprocess") as cursor:
+            cursor.itersize = batch_days
+            cursor.execute(READ_SQL, {'date_from': date_from, 'date_to': date_to})
+            while rows := cursor.fetchmany(batch_days):
+                frames = to_frames(rows)
+                results = transform_many([
+                    (daily_dataframe, hourly_dataframe, utc_offset_seconds)
+                    for _, _, daily_dataframe, hourly_dataframe, _, utc_offset_seconds in frames
+                ])
+                records = [
+                    {
+                        'longitude': longitude,
+                        'latitude': latitude,
+                        'date': day,
+                        'timezone': timezone_name,
+                        'data': data,
+                        'series': series,
+                    }
+                    for (longitude, latitude, _, _, timezone_name, _), stats in zip(frames, results)
+                    for day, data, series in zip(stats.date_strings(), *encode(stats))
+                ]
+                written += save_records_data(records, replace=True)
+                days += len(rows)
+                print(f"Reprocessed {days} location-days")
+    finally:
+        connection.close()
+    return written
+
+
+def main():
+    from app.parallel_transform import shutdown_pool, start_pool
+
+    parser = argparse.ArgumentParser(description="Hourly facts of location_data")
+    commands = parser.add_subparsers(dest="command", required=True)
+    reprocess_parser = commands.add_parser(
+        "reprocess", help="Recompute the daily stats in location_data from location_hourly")
+    reprocess_parser.add_argument(
+        "-df", "--date_from", type=_validate_date,
+        help="Start date in YYYY-MM-DD format (defaults to the first stored day)"
+    )
+    reprocess_parser.add_argument(
+        "-dt", "--date_to", type=_validate_date,
+        help="End date in YYYY-MM-DD format (defaults to the last stored day)"
+    )
+    reprocess_parser.add_argument(
+        "-bs", "--batch_days", type=int, default=REPROCESS_BATCH_DAYS,
+        help=f"Location-days recomputed and written at once (defaults to {REPROCESS_BATCH_DAYS})"
+    )
+    reprocess_parser.add_argument(
+        "-tw", "--transform_workers", type=int, default=0,
+        help="Processes transforming the batches in parallel (by default in the main process)"
+    )
+    args = parser.parse_args()
+
+    start_pool(args.transform_workers)
+    try:
+        print(f"Written {reprocess(args.date_from, args.date_to, args.batch_days)} rows")
+    finally:
+        shutdown_pool()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,134 @@
+"""Transform stages shared by main.py and worker.py: request params, decoded responses to DB
+records and export frames.
+
+Heavy modules (pandas, the Open-Meteo client, the transform pool) are imported by the functions
+that use them, so importing this module keeps `main.py -h` fast.
+"""
+from app import metrics
+from app.constants import HourlyParams
+
+
+def make_params(locations, date_from, date_to):
+    return {
+        "latitude": [latitude for _, latitude in locations],
+        "longitude": [longitude for longitude, _ in locations],
+        "start_date": date_from,
+        "end_date": date_to,
+        "daily": ["sunrise", "sunset", "daylight_duration"],
+        "hourly": HourlyParams.to_list(),
+        "timezone": "auto",
+        "timeformat": "unixtime",
+        "wind_speed_unit": "kn",
+        "temperature_unit": "fahrenheit",
+        "precipitation_unit": "inch"
+    }
+
+
+def compose_records(stats, longitude, latitude, timezone_name, facts=None):
+    """Export columns and DB records of the DailyStats of a location, data of a record is its JSON text
+    and series its packed hourly series (see app/payload_codec.py).
+
+    facts are the location_hourly rows of the same days (see app/hourly_facts.py), saved with the records.
+    """
+    from app.payload_codec import encode
+
+    df_data = stats.to_columns()
+    result_records = [
+        {
+            'longitude': longitude,
+            'latitude': latitude,
+            'date': date,
+            'timezone': timezone_name,
+            'data': data,
+            'series': series,
+        }
+        for date, data, series in zip(df_data['date'], *encode(stats))
+    ]
+    if facts is not None:
+        for record, fact in zip(result_records, facts):
+            record['facts'] = fact
+    return df_data, result_records
+
+
+def process_frames(batch, with_facts=True, fan_out=None):
+    """Transform (longitude, latitude, daily_dataframe, hourly_dataframe, timezone_name,
+    utc_offset_seconds) of a batch, returns records and frames of all locations.
+
+    with_facts adds the location_hourly rows of every day to the records. fan_out maps a location
+    of the batch to all locations sharing its data (see app/grid_cells.py), each of them gets the
+    stats transformed once.
+    """
+    from app.hourly_facts import fact_rows
+    from app.parallel_transform import transform_many
+
+    fan_out = fan_out or {}
+    sites = [fan_out.get((longitude, latitude), [(longitude, latitude)]) for longitude, latitude, *_ in batch]
+
+    facts = [[None] * len(location_sites) for location_sites in sites]
+    if with_facts:
+        # before the transform, which indexes the dataframes by date
+        with metrics.stage('facts'):
+            facts = [
+                [fact_rows(longitude, latitude, *frames[2:]) for longitude, latitude in location_sites]
+                for frames, location_sites in zip(batch, sites)
+            ]
+
+    with metrics.stage('transform'), metrics.profiled():
+        result_lists = transform_many([
+            (daily_dataframe, hourly_dataframe, utc_offset_seconds)
+            for _, _, daily_dataframe, hourly_dataframe, _, utc_offset_seconds in batch
+        ])
+
+    batch_records = []
+    batch_frames = []
+    for (_, _, _, _, timezone_name, _), result_list, location_sites, location_facts in zip(
+        batch, result_lists, sites, facts
+    ):
+        for (longitude, latitude), site_facts in zip(location_sites, location_facts):
+            metrics.increment('rows_transformed', len(result_list))
+            df_data, result_records = compose_records(
+                result_list, longitude, latitude, timezone_name, site_facts)
+            batch_records.extend(result_records)
+            batch_frames.append((df_data, longitude, latitude))
+
+    return batch_records, batch_frames
+
+
+def process_parts(parts, with_facts=True, fan_out=None):
+    """Records and frames of (params, responses) parts of the same locations over consecutive ranges
+    (see app.request.fetch_range), the parts of every location are stitched into one range."""
+    from app.day_cache import store_days
+    from app.request import combine_dataframes, stitch_frames, trim_frames
+
+    fan_out = fan_out or {}
+    batch = []
+    first_params = parts[0][0]
+    # Responses come back in the order of requested coordinates. Rows are keyed
+    # by the requested location, so sites sharing a grid cell don't collide.
+    locations = zip(first_params['longitude'], first_params['latitude'])
+    for index, (longitude, latitude) in enumerate(locations):
+        frames = []
+        for params, responses in parts:
+            with metrics.stage('decode'):
+                daily_dataframe, hourly_dataframe, timezone_name, _, _ = combine_dataframes(responses[index], params)
+            frames.append((daily_dataframe, hourly_dataframe, timezone_name, responses[index].UtcOffsetSeconds()))
+        daily_dataframe, hourly_dataframe, timezone_name, utc_offset_seconds = stitch_frames(frames)
+        # Replayed responses may cover more days than were asked for
+        daily_dataframe, hourly_dataframe = trim_frames(
+            daily_dataframe, hourly_dataframe, utc_offset_seconds,
+            first_params['start_date'], parts[-1][0]['end_date'])
+        # Cached once for the grid cell the API reported, every site of the fan-out reads the same days
+        response = parts[0][1][index]
+        store_days(
+            fan_out.get((longitude, latitude), [(longitude, latitude)]),
+            (response.Longitude(), response.Latitude(), response.Elevation()),
+            daily_dataframe, hourly_dataframe, timezone_name, utc_offset_seconds)
+        batch.append((
+            longitude, latitude, daily_dataframe, hourly_dataframe,
+            timezone_name, utc_offset_seconds))
+
+    return process_frames(batch, with_facts, fan_out)
+
+
+def process_responses(params, responses, with_facts=True, fan_out=None):
+    return process_parts([(params, responses)], with_facts, fan_out)
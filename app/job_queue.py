@@ -0,0 +1,108 @@
+"""Queue of ingestion work items (location and date range) in the ingest_jobs table.
+
+Workers claim due jobs with FOR UPDATE SKIP LOCKED, so any number of worker processes on any
+number of nodes can share one queue without handing the same job to two of them. A claimed job
+is leased: if its worker dies, the job is claimed again after the lease expires. Failed jobs are
+retried with exponential backoff and marked dead after the last attempt.
+"""
+from sqlalchemy import text
+from sqlalchemy.dialects.postgresql import insert
+
+from app.config import JOB_LEASE_SECONDS, JOB_MAX_ATTEMPTS, JOB_RETRY_DELAY
+from app.db_client import get_engine
+from app.db_models import IngestJob
+from app.planner import split_range
+
+PENDING = 'pending'
+RUNNING = 'running'
+DONE = 'done'
+DEAD = 'dead'
+
+# Jobs whose lease expired on the last attempt are not retried again
+BURY_EXPIRED_SQL = text(f"""
+    UPDATE {IngestJob.__tablename__}
+    SET status = '{DEAD}', leased_until = NULL, last_error = 'lease expired', updated_at = now()
+    WHERE status = '{RUNNING}' AND leased_until < now() AND attempts >= :max_attempts
+""")
+CLAIM_SQL = text(f"""
+    UPDATE {IngestJob.__tablename__}
+    SET status = '{RUNNING}', attempts = attempts + 1, worker = :worker,
+        leased_until = now() + make_interval(secs => :lease_seconds), updated_at = now()
+    WHERE id IN (
+        SELECT id FROM {IngestJob.__tablename__}
+        WHERE (status = '{PENDING}' AND run_after <= now())
+           OR (status = '{RUNNING}' AND leased_until < now())
+        ORDER BY run_after, date_from, date_to
+        LIMIT :limit
+        FOR UPDATE SKIP LOCKED
+    )
+    RETURNING id, longitude, latitude, date_from, date_to, attempts
+""")
+EXTEND_SQL = text(f"""
+    UPDATE {IngestJob.__tablename__}
+    SET leased_until = now() + make_interval(secs => :lease_seconds), updated_at = now()
+    WHERE id = ANY(:ids) AND worker = :worker AND status = '{RUNNING}'
+""")
+COMPLETE_SQL = text(f"""
+    UPDATE {IngestJob.__tablename__}
+    SET status = '{DONE}', leased_until = NULL, last_error = NULL, updated_at = now()
+    WHERE id = ANY(:ids) AND worker = :worker AND status = '{RUNNING}'
+""")
+FAIL_SQL = text(f"""
+    UPDATE {IngestJob.__tablename__}
+    SET status = CASE WHEN attempts >= :max_attempts THEN '{DEAD}' ELSE '{PENDING}' END,
+        run_after = now() + make_interval(secs => :retry_delay * 2 ^ (attempts - 1)),
+        leased_until = NULL, last_error = :error, updated_at = now()
+    WHERE id = ANY(:ids) AND worker = :worker AND status = '{RUNNING}'
+""")
+
+
+def enqueue_jobs(locations, date_from, date_to, chunk_days=None) -> int:
+    """Queue a job per location and chunk of days, returns the number of new jobs.
+
+    Work items that are already pending or running are not queued twice.
+    """
+    rows = [
+        {'longitude': longitude, 'latitude': latitude, 'date_from': chunk_from, 'date_to': chunk_to}
+        for chunk_from, chunk_to in split_range(date_from, date_to, chunk_days)
+        for longitude, latitude in locations
+    ]
+    if not rows:
+        return 0
+
+    query = insert(IngestJob).values(rows).on_conflict_do_nothing(
+        index_elements=['longitude', 'latitude', 'date_from', 'date_to'],
+        index_where=IngestJob.status.in_([PENDING, RUNNING]),
+    )
+    with get_engine().begin() as connection:
+        return connection.execute(query).rowcount
+
+
+def claim_jobs(worker: str, limit: int, lease_seconds: int = JOB_LEASE_SECONDS,
+               max_attempts: int = JOB_MAX_ATTEMPTS) -> list:
+    """Lease up to limit due jobs to worker."""
+    with get_engine().begin() as connection:
+        connection.execute(BURY_EXPIRED_SQL, {'max_attempts': max_attempts})
+        return connection.execute(
+            CLAIM_SQL, {'worker': worker, 'limit': limit, 'lease_seconds': lease_seconds}
+        ).all()
+
+
+def extend_leases(worker: str, ids, lease_seconds: int = JOB_LEASE_SECONDS):
+    with get_engine().begin() as connection:
+        connection.execute(EXTEND_SQL, {'worker': worker, 'ids': list(ids), 'lease_seconds': lease_seconds})
+
+
+def complete_jobs(worker: str, ids):
+    with get_engine().begin() as connection:
+        connection.execute(COMPLETE_SQL, {'worker': worker, 'ids': list(ids)})
+
+
+def fail_jobs(worker: str, ids, error: str, max_attempts: int = JOB_MAX_ATTEMPTS,
+              retry_delay: int = JOB_RETRY_DELAY):
+    """Put jobs back with a backoff of retry_delay * 2^(attempts - 1) seconds, or mark them dead."""
+    with get_engine().begin() as connection:
+        connection.execute(FAIL_SQL, {
+            'worker': worker, 'ids': list(ids), 'error': error,
+            'max_attempts': max_attempts, 'retry_delay': retry_delay,
+        })
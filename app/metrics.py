@@ -0,0 +1,93 @@
+import cProfile
+import json
+import os
+import threading
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+
+METRICS_PREFIX = 'weather_stats'
+
+_lock = threading.Lock()
+_stages = defaultdict(lambda: {'calls': 0, 'wall_seconds': 0.0, 'cpu_seconds': 0.0})
+_counters = defaultdict(int)
+_profiler = None
+
+
+@contextmanager
+def stage(name):
+    """Record wall and CPU time of a pipeline stage, CPU time is counted for the current thread."""
+    wall_started_at, cpu_started_at = time.perf_counter(), time.thread_time()
+    try:
+        yield
+    finally:
+        wall_seconds = time.perf_counter() - wall_started_at
+        cpu_seconds = time.thread_time() - cpu_started_at
+        with _lock:
+            _stages[name]['calls'] += 1
+            _stages[name]['wall_seconds'] += wall_seconds
+            _stages[name]['cpu_seconds'] += cpu_seconds
+
+
+def increment(name, value=1):
+    with _lock:
+        _counters[name] += value
+
+
+def enable_profiling():
+    global _profiler
+    _profiler = cProfile.Profile()
+
+
+@contextmanager
+def profiled():
+    """Collect cProfile stats of the block when profiling is enabled."""
+    if _profiler is None:
+        yield
+        return
+
+    _profiler.enable()
+    try:
+        yield
+    finally:
+        _profiler.disable()
+
+
+def dump_profile(path):
+    if _profiler is not None:
+        _profiler.dump_stats(path)
+        print(f"Profile saved to {path}")
+
+
+def snapshot() -> dict:
+    with _lock:
+        return {
+            'stages': {name: dict(values) for name, values in _stages.items()},
+            'counters': dict(_counters),
+        }
+
+
+def to_prometheus(metrics: dict) -> str:
+    lines = []
+    for field in ['calls', 'wall_seconds', 'cpu_seconds']:
+        metric = f"{METRICS_PREFIX}_stage_{field}_total" if field == 'calls' else f"{METRICS_PREFIX}_stage_{field}"
+        lines.append(f"# TYPE {metric} counter")
+        for name, values in metrics['stages'].items():
+            lines.append(f'{metric}{{stage="{name}"}} {values[field]}')
+    for name, value in metrics['counters'].items():
+        metric = f"{METRICS_PREFIX}_{name}_total"
+        lines.append(f"# TYPE {metric} counter")
+        lines.append(f"{metric} {value}")
+    return '\n'.join(lines) + '\n'
+
+
+def write_metrics(path, metrics_format='json'):
+    """Write collected metrics as JSON or Prometheus text, atomically for textfile collectors."""
+    metrics = snapshot()
+    content = to_prometheus(metrics) if metrics_format == 'prometheus' else json.dumps(metrics, indent=2)
+
+    temporary_path = f"{path}.tmp"
+    with open(temporary_path, 'w') as metrics_file:
+        metrics_file.write(content)
+    os.replace(temporary_path, path)
+    print(f"Metrics saved to {path}")
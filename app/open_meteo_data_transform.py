@@ -1,11 +1,8 @@
-from datetime import datetime, timedelta, UTC
+import json
 from collections import namedtuple
-from app.db_models import LocationData
-from app.db_client import engine
 
+import numpy as np
 from pandas import DataFrame, read_json
-from sqlalchemy.orm import Session
-from sqlalchemy.dialects.postgresql import insert
 
 WeatherStatsNamedTuple = namedtuple(
     'WeatherStatsNamedTuple',
@@ -90,99 +87,318 @@ WeatherStatsNamedTuple = namedtuple(
 )
 
 
-def _day_data_to_record(day_df: DataFrame, day_record: dict):
-    if len(day_df) != 24:
-        raise Exception('Wrong number of rows')
+DAY_SECONDS = 24 * 60 * 60
+# Local days are an hour shorter or longer on DST transitions
+MAX_DAY_SHIFT = 60 * 60
 
-    day_df['timestamp'] = [int(pd_timestamp.timestamp())
-                           for pd_timestamp in day_df.index]
-    sunrise, sunset = day_record.sunrise, day_record.sunset
+# Hourly parameters averaged into avg_{param}_24h and avg_{param}_daylight
+MEAN_PARAMS = [
+    'temperature_2m',
+    'relative_humidity_2m',
+    'dew_point_2m',
+    'apparent_temperature',
+    'temperature_80m',
+    'temperature_120m',
+    'wind_speed_10m',
+    'wind_speed_80m',
+    'visibility',
+]
 
-    daylight_df = day_df[lambda df: (
-        df.timestamp >= sunrise) & (df.timestamp < sunset)]
+# Hourly parameters summed into total_{param}_24h and total_{param}_daylight
+TOTAL_PARAMS = ['rain', 'showers', 'snowfall']
 
-    def round_list(df_series, decimal_points): return [
-        int(round(v, decimal_points)) for v in df_series
-    ]
+# Hourly series stored per day, field name -> hourly parameter
+INT_SERIES = {
+    'temperature_2m_celsius': 'temperature_2m',
+    'apparent_temperature_celsius': 'apparent_temperature',
+    'temperature_80m_celsius': 'temperature_80m',
+    'temperature_120m_celsius': 'temperature_120m',
+    'soil_temperature_0cm_celsius': 'soil_temperature_0cm',
+    'soil_temperature_6cm_celsius': 'soil_temperature_6cm',
+    'rain_mm': 'rain',
+    'showers_mm': 'showers',
+    'snowfall_mm': 'snowfall',
+}
+MPS_SERIES = {
+    'wind_speed_10m_m_per_s': 'wind_speed_10m',
+    'wind_speed_80m_m_per_s': 'wind_speed_80m',
+}
+# Wind speeds are converted to km/h by transform_units, 1 m/s is 3.6 km/h
+KMH_IN_MPS = 3.6
 
-    def get_mean(df, valuesKey): return float(round(df[valuesKey].mean(), 2))
-    def kmh_to_mps(df, valuesKey): return [
-        float(round(v / 1000 / 60, 2)) for v in df[valuesKey]
-    ]
+SERIES_FIELDS = [*MPS_SERIES, *INT_SERIES]
+
+# JSON document of a day with the key order and separators of json.dumps(data._asdict())
+_DAY_JSON_TEMPLATE = '{' + ', '.join(
+    f'"{field}": [%s]' if field in SERIES_FIELDS else f'"{field}": %s'
+    for field in WeatherStatsNamedTuple._fields
+) + '}'
+# The same document without the series fields
+_SCALARS_JSON_TEMPLATE = '{' + ', '.join(
+    f'"{field}": %s' for field in WeatherStatsNamedTuple._fields if field not in SERIES_FIELDS
+) + '}'
+
+
+def _json_fragments(column: np.ndarray) -> list[str]:
+    """JSON text of every row of a column, encoded with one json.dumps call.
+
+    Numbers and ISO timestamps contain no ', ', so the encoded list is split back into rows.
+    Rows of 2-D columns are returned without the brackets.
+    """
+    if len(column) == 0:
+        return []
+    text = json.dumps(column.tolist())
+    if column.ndim == 1:
+        return text[1:-1].split(', ')
+    return text[2:-2].split('], [')
+
+
+class DailyStats:
+    """Stats of consecutive days of one location, see WeatherStatsNamedTuple for the fields.
+
+    Every field is one array: scalar fields have a value per day, series fields have the values of
+    all days one after another, day i owns values offsets[i]:offsets[i + 1] (24 hourly values, 96
+    15-minutely ones, 23 or 25 hourly ones on DST transitions). Rows are built only on access,
+    result[i] is {'date': 'YYYY-MM-DD', 'data': WeatherStatsNamedTuple}.
+    """
+    __slots__ = ('dates', 'offsets', 'columns')
+
+    def __init__(self, dates: np.ndarray, offsets: np.ndarray, columns: dict[str, np.ndarray]):
+        self.dates = dates
+        self.offsets = offsets
+        self.columns = columns
+
+    @classmethod
+    def concatenate(cls, parts: list['DailyStats']) -> 'DailyStats':
+        starts = np.cumsum([0] + [part.offsets[-1] for part in parts[:-1]])
+        return cls(
+            np.concatenate([part.dates for part in parts]),
+            np.concatenate(
+                [part.offsets[:-1] + start for part, start in zip(parts, starts)]
+                + [parts[-1].offsets[-1:] + starts[-1]]
+            ),
+            {
+                field: np.concatenate([part.columns[field] for part in parts])
+                for field in WeatherStatsNamedTuple._fields
+            }
+        )
+
+    def __len__(self):
+        return len(self.dates)
+
+    def __getitem__(self, index) -> dict:
+        if not -len(self) <= index < len(self):
+            raise IndexError('day index out of range')
+        index %= len(self)
+        values = slice(self.offsets[index], self.offsets[index + 1])
+        return {
+            'date': str(self.dates[index]),
+            'data': WeatherStatsNamedTuple._make(
+                self.columns[field][values if field in SERIES_FIELDS else index].tolist()
+                for field in WeatherStatsNamedTuple._fields
+            )
+        }
+
+    def __eq__(self, other):
+        if not isinstance(other, DailyStats):
+            return NotImplemented
+        return (
+            np.array_equal(self.dates, other.dates) and np.array_equal(self.offsets, other.offsets)
+            and all(
+                np.array_equal(
+                    self.columns[field], other.columns[field], equal_nan=self.columns[field].dtype.kind == 'f')
+                for field in WeatherStatsNamedTuple._fields
+            )
+        )
+
+    def _series(self, field: str, encode, day_length: int | None) -> list:
+        """encode(values) split into days, days of the same length are encoded as one block."""
+        column = self.columns[field]
+        if day_length is not None:
+            return encode(column.reshape(len(self), day_length))
+        values = encode(column)
+        return [values[start:end] for start, end in zip(self.offsets[:-1].tolist(), self.offsets[1:].tolist())]
+
+    def date_strings(self) -> list[str]:
+        return np.datetime_as_string(self.dates).tolist()
+
+    def to_columns(self) -> dict[str, list]:
+        """{'date': [...], field: [...]} with a value (or a list of series values) per day."""
+        day_length = _values_per_day(self.offsets)
+        return {
+            'date': self.date_strings(),
+            **{
+                field: self._series(field, np.ndarray.tolist, day_length) if field in SERIES_FIELDS
+                else self.columns[field].tolist()
+                for field in WeatherStatsNamedTuple._fields
+            }
+        }
+
+    def to_json(self, series: bool = True) -> list[str]:
+        """JSON document of every day, the same text json.dumps(row['data']._asdict()) gives.
+
+        Without series the series fields are left out, see app/payload_codec.py.
+        """
+        day_length = _values_per_day(self.offsets)
+        fragments = []
+        for field in WeatherStatsNamedTuple._fields:
+            if field not in SERIES_FIELDS:
+                fragments.append(_json_fragments(self.columns[field]))
+            elif not series:
+                continue
+            elif day_length is not None:
+                fragments.append(self._series(field, _json_fragments, day_length))
+            else:
+                fragments.append([', '.join(day) for day in self._series(field, _json_fragments, day_length)])
+        template = _DAY_JSON_TEMPLATE if series else _SCALARS_JSON_TEMPLATE
+        return [template % day for day in zip(*fragments)]
+
+
+def to_unix_seconds(index) -> np.ndarray:
+    return index.values.astype('datetime64[s]').astype(np.int64)
+
+
+def local_dates(day_starts: np.ndarray, utc_offset_seconds: int) -> np.ndarray:
+    """Local dates of daily timestamps.
+
+    Daily timestamps are local midnights in UTC, the nearest midnight after applying the offset
+    is the local date (the offset can be an hour off on DST-transition days).
+    """
+    return ((day_starts + utc_offset_seconds + DAY_SECONDS // 2) // DAY_SECONDS).astype('datetime64[D]')
 
-    row = WeatherStatsNamedTuple(
-        avg_temperature_2m_24h=get_mean(day_df, 'temperature_2m'),
-        avg_relative_humidity_2m_24h=get_mean(day_df, 'relative_humidity_2m'),
-        avg_dew_point_2m_24h=get_mean(day_df, 'dew_point_2m'),
-        avg_apparent_temperature_24h=get_mean(day_df, 'apparent_temperature'),
-        avg_temperature_80m_24h=get_mean(day_df, 'temperature_80m'),
-        avg_temperature_120m_24h=get_mean(day_df, 'temperature_120m'),
-        avg_wind_speed_10m_24h=get_mean(day_df, 'wind_speed_10m'),
-        avg_wind_speed_80m_24h=get_mean(day_df, 'wind_speed_80m'),
-        avg_visibility_24h=get_mean(day_df, 'visibility'),
-        total_rain_24h=int(day_df.rain.sum()),
-        total_showers_24h=int(day_df.showers.sum()),
-        total_snowfall_24h=int(day_df.snowfall.sum()),
-        avg_temperature_2m_daylight=get_mean(daylight_df, 'temperature_2m'),
-        avg_relative_humidity_2m_daylight=get_mean(
-            daylight_df, 'relative_humidity_2m'),
-        avg_dew_point_2m_daylight=get_mean(daylight_df, 'dew_point_2m'),
-        avg_apparent_temperature_daylight=get_mean(
-            daylight_df, 'apparent_temperature'),
-        avg_temperature_80m_daylight=get_mean(daylight_df, 'temperature_80m'),
-        avg_temperature_120m_daylight=get_mean(
-            daylight_df, 'temperature_120m'),
-        avg_wind_speed_10m_daylight=get_mean(daylight_df, 'wind_speed_10m'),
-        avg_wind_speed_80m_daylight=get_mean(daylight_df, 'wind_speed_80m'),
-        avg_visibility_daylight=get_mean(daylight_df, 'visibility'),
-        total_rain_daylight=int(daylight_df.rain.sum()),
-        total_showers_daylight=int(daylight_df.showers.sum()),
-        total_snowfall_daylight=int(daylight_df.snowfall.sum()),
-        wind_speed_10m_m_per_s=kmh_to_mps(day_df, 'wind_speed_10m'),
-        wind_speed_80m_m_per_s=kmh_to_mps(day_df, 'wind_speed_10m'),
-        temperature_2m_celsius=round_list(day_df.temperature_2m, 2),
-        apparent_temperature_celsius=round_list(
-            day_df.apparent_temperature, 2),
-        temperature_80m_celsius=round_list(day_df.temperature_80m, 2),
-        temperature_120m_celsius=round_list(day_df.temperature_120m, 2),
-        soil_temperature_0cm_celsius=round_list(
-            day_df.soil_temperature_0cm, 2),
-        soil_temperature_6cm_celsius=round_list(
-            day_df.soil_temperature_6cm, 2),
-        rain_mm=round_list(day_df.rain, 2),
-        showers_mm=round_list(day_df.showers, 2),
-        snowfall_mm=round_list(day_df.snowfall, 2),
-        daylight_hours=round(day_record.daylight_duration / 3600, 2),
-        sunrise_iso=datetime.fromtimestamp(
-            sunrise, UTC).strftime('%Y-%m-%dT%H:%M:%SZ'),
-        sunset_iso=datetime.fromtimestamp(
-            sunset, UTC).strftime('%Y-%m-%dT%H:%M:%SZ')
-    )
-
-    return row
-
-
-def transform_dataframes(daily_dataframe: DataFrame, hourly_dataframe: DataFrame) -> DataFrame:
+
+def series_interval(timestamps: np.ndarray) -> int:
+    """Seconds between rows of a series (hourly.Interval() of the response), a day for a single row."""
+    if len(timestamps) < 2:
+        return DAY_SECONDS
+    return int(np.min(np.diff(timestamps)))
+
+
+def day_bounds(timestamps: np.ndarray, day_starts: np.ndarray, interval_seconds: int):
+    """First row, end row and end timestamp of every day in a sorted series, found by timestamps.
+
+    A day ends where the next one starts. The last day, or the last one before a gap in days, ends
+    after its last row, which is DAY_SECONDS after its start give or take a DST shift.
+    """
+    first_rows = np.searchsorted(timestamps, day_starts)
+    next_starts = np.append(day_starts[1:], day_starts[-1:] + 2 * DAY_SECONDS)
+    nominal_ends = day_starts + DAY_SECONDS
+    follows = np.abs(next_starts - nominal_ends) <= MAX_DAY_SHIFT
+    end_rows = np.searchsorted(
+        timestamps, np.where(follows, next_starts, np.minimum(next_starts, nominal_ends + MAX_DAY_SHIFT)))
+    last_rows_end = timestamps[np.maximum(end_rows - 1, 0)] + interval_seconds if len(timestamps) else day_starts
+    ends = np.where(follows, next_starts, np.where(end_rows > first_rows, last_rows_end, day_starts))
+    return first_rows, end_rows, ends
+
+
+def _to_iso(timestamps: np.ndarray) -> np.ndarray:
+    return np.char.add(
+        np.datetime_as_string(timestamps.astype('datetime64[s]'), unit='s'), 'Z')
+
+
+def _values_per_day(offsets: np.ndarray) -> int | None:
+    """Length of the series of every day if all days have the same one."""
+    lengths = np.diff(offsets)
+    if len(lengths) and np.all(lengths == lengths[0]):
+        return int(lengths[0])
+    return None
+
+
+def _day_sums(values: np.ndarray, offsets: np.ndarray, day_length: int | None, dtype) -> np.ndarray:
+    """Sum of the values of every day, day i owns values offsets[i]:offsets[i + 1]."""
+    if len(values) == 0:
+        return np.zeros(len(offsets) - 1, dtype=dtype)
+    if day_length is not None:
+        # Days of the same length are summed as rows, in the order numpy sums a block
+        return values.reshape(-1, day_length).sum(axis=1, dtype=dtype)
+    return np.add.reduceat(values, offsets[:-1], dtype=dtype)
+
+
+def _masked_mean(values: np.ndarray, mask: np.ndarray, offsets: np.ndarray, day_length: int | None) -> np.ndarray:
+    """Mean of every day over masked values, skipping NaN like pandas does."""
+    dtype = values.dtype if values.dtype.kind == 'f' else np.dtype(np.float64)
+    values = values.astype(dtype, copy=False)
+    valid = mask & ~np.isnan(values)
+    total = _day_sums(np.where(valid, values, 0), offsets, day_length, dtype)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        return total / _day_sums(valid, offsets, day_length, np.int64).astype(dtype)
+
+
+def _masked_sum(values: np.ndarray, mask: np.ndarray, offsets: np.ndarray, day_length: int | None) -> np.ndarray:
+    if values.dtype.kind == 'f':
+        mask = mask & ~np.isnan(values)
+    return _day_sums(np.where(mask, values, 0), offsets, day_length, values.dtype).astype(np.int64)
+
+
+def _round_to_int(block: np.ndarray) -> np.ndarray:
+    rounded = np.round(block.astype(np.float64), 2)
+    if np.isnan(rounded).any():
+        raise ValueError('cannot convert float NaN to integer')
+    return rounded.astype(np.int64)
+
+
+def _kmh_to_mps(block: np.ndarray) -> np.ndarray:
+    return np.round(block.astype(np.float64) / KMH_IN_MPS, 2)
+
+
+def transform_dataframes(
+    daily_dataframe: DataFrame, hourly_dataframe: DataFrame, utc_offset_seconds: int = 0
+) -> DailyStats:
     """Transform dataframes that was red from json files"""
 
     daily_dataframe.set_index('date', inplace=True)
     hourly_dataframe.set_index('date', inplace=True)
-    day_seconds = timedelta(days=1)
 
-    result = []
-    for day in daily_dataframe.itertuples():
-        day_start, day_end = day.Index, day.Index + day_seconds
-        day_df = hourly_dataframe[(hourly_dataframe.index >= day_start) & (
-            hourly_dataframe.index < day_end)]
-        result.append({
-            'date': day_start.strftime('%Y-%m-%d'),
-            'data': _day_data_to_record(day_df, day)
-        })
+    hourly_timestamps = to_unix_seconds(hourly_dataframe.index)
+    day_starts = to_unix_seconds(daily_dataframe.index)
+
+    # Days are segmented by timestamps, so any interval of the series and DST days of 23 or 25 hours work
+    interval_seconds = series_interval(hourly_timestamps)
+    first_rows, end_rows, day_ends = day_bounds(hourly_timestamps, day_starts, interval_seconds)
+    lengths = end_rows - first_rows
+    if (
+        np.any(lengths * interval_seconds != day_ends - day_starts)
+        or np.any(np.abs(day_ends - day_starts - DAY_SECONDS) > MAX_DAY_SHIFT)
+    ):
+        raise Exception('Wrong number of rows')
+    offsets = np.concatenate([[0], np.cumsum(lengths)])
+    day_length = _values_per_day(offsets)
+    days = np.repeat(np.arange(len(day_starts)), lengths)
+    rows = np.arange(offsets[-1]) + (first_rows - offsets[:-1])[days]
+
+    # Daylight rows have sunrise <= timestamp < sunset
+    sunrise = daily_dataframe['sunrise'].to_numpy(dtype=np.int64)
+    sunset = daily_dataframe['sunset'].to_numpy(dtype=np.int64)
+    timestamps = hourly_timestamps[rows]
+    daylight = (timestamps >= sunrise[days]) & (timestamps < sunset[days])
+    whole_day = np.ones_like(daylight)
+
+    def series(key): return hourly_dataframe[key].to_numpy()[rows]
+
+    columns = {}
+    for key in MEAN_PARAMS:
+        values = series(key)
+        columns[f'avg_{key}_24h'] = np.round(_masked_mean(values, whole_day, offsets, day_length), 2)
+        columns[f'avg_{key}_daylight'] = np.round(_masked_mean(values, daylight, offsets, day_length), 2)
+    for key in TOTAL_PARAMS:
+        values = series(key)
+        columns[f'total_{key}_24h'] = _masked_sum(values, whole_day, offsets, day_length)
+        columns[f'total_{key}_daylight'] = _masked_sum(values, daylight, offsets, day_length)
+    for field, key in MPS_SERIES.items():
+        columns[field] = _kmh_to_mps(series(key))
+    for field, key in INT_SERIES.items():
+        columns[field] = _round_to_int(series(key))
 
-    return result
+    daylight_duration = daily_dataframe['daylight_duration'].to_numpy(dtype=np.float64)
+    columns['daylight_hours'] = np.round(daylight_duration / 3600, 2)
+    columns['sunset_iso'] = _to_iso(sunset)
+    columns['sunrise_iso'] = _to_iso(sunrise)
+
+    return DailyStats(local_dates(day_starts, utc_offset_seconds), offsets, columns)
 
 
 if __name__ == '__main__':
+    # Dataframes written by `python -m app.request`, main.py stores the days through app/ingest.py
     try:
         daily_dataframe = read_json('daily_data.json')
         hourly_dataframe = read_json('hourly_data.json')
@@ -190,51 +406,9 @@ if __name__ == '__main__':
         print('Couldnt read data files')
         raise e
 
-    timezone = 'Asia/Novosibirsk'
-    result_list: list[dict[str, WeatherStatsNamedTuple]] = transform_dataframes(
-        daily_dataframe, hourly_dataframe)
-    
-    df_data = {
-        'date': []
-    }
-    result_records = []
+    result_df = DataFrame(data=transform_dataframes(daily_dataframe, hourly_dataframe).to_columns())
     longitude, latitude = 55.56, 83.2
-    
-    for row in result_list:
-        [date, data] = list(row.values())
-        
-        # composing DataFrame data
-        df_data['date'].append(date)
-        for index, field_key in enumerate(data._fields):
-            if not field_key in df_data:
-                df_data[field_key] = []
-            df_data[field_key].append(data[index])
-
-        # composing model objects for DB
-        record = {
-            'longitude':longitude,
-            'latitude':latitude,
-            'date':date,
-            'timezone':timezone,
-            'data':data._asdict()
-        }
-        result_records.append(record)
-    
-    with Session(engine) as session:
-        session.begin()
-        try:
-            session.execute(
-                insert(LocationData)
-                    .values(result_records)
-                    .on_conflict_do_nothing(constraint='pk_location_data') # TOFIX: figure out how to handle correctly
-            )
-        except:
-            session.rollback()
-            raise
-        else:
-            session.commit()
 
-    result_df = DataFrame(data=df_data)
     for idx in range(len(result_df)):
         day_df = result_df.iloc[idx]
         with open(f"output/{longitude}_{latitude}_{day_df.date}.json", "w") as json_file:
@@ -0,0 +1,114 @@
+"""Process pool for transform_dataframes.
+
+Hourly frames of a batch are packed as structured arrays into one shared memory block, workers
+rebuild the frames from it instead of unpickling them. Long ranges are split into shards of
+SHARD_DAYS days, so a single location with years of data also spreads over all workers.
+Results come back in the order of the frames.
+
+Without start_pool() (or with fewer than 2 workers) frames are transformed in the current process.
+"""
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing.shared_memory import SharedMemory
+
+import numpy as np
+
+from app.frame_codec import dtype_to_text, text_to_dtype, to_dataframe, to_structured
+from app.open_meteo_data_transform import DailyStats, day_bounds, series_interval, transform_dataframes
+
+# Days transformed by one task
+SHARD_DAYS = 366
+
+_executor = None
+_workers = 0
+
+# Shared memory blocks attached by a worker process, name -> SharedMemory
+_attached = {}
+
+
+def start_pool(workers: int):
+    global _executor, _workers
+    shutdown_pool()
+    if workers > 1:
+        _executor = ProcessPoolExecutor(max_workers=workers)
+        _workers = workers
+
+
+def shutdown_pool():
+    global _executor, _workers
+    if _executor is not None:
+        _executor.shutdown()
+    _executor, _workers = None, 0
+
+
+def _attach(name: str) -> SharedMemory:
+    if name not in _attached:
+        # Pool workers share the resource tracker of the parent, which unlinks the block
+        shared_memory = SharedMemory(name=name)
+        # blocks of previous batches are unlinked already
+        for previous in _attached.values():
+            previous.close()
+        _attached.clear()
+        _attached[name] = shared_memory
+    return _attached[name]
+
+
+def _transform_shard(shm_name, offset, count, dtype_text, daily_records, utc_offset_seconds):
+    hourly_records = np.frombuffer(
+        _attach(shm_name).buf, dtype=text_to_dtype(dtype_text), count=count, offset=offset)
+    hourly_dataframe = to_dataframe(hourly_records)
+    del hourly_records
+    return transform_dataframes(to_dataframe(daily_records), hourly_dataframe, utc_offset_seconds)
+
+
+def _shards(daily: np.ndarray, hourly_dates: np.ndarray):
+    """(daily rows, hourly rows) slices of at most SHARD_DAYS days, a single empty shard without days."""
+    if len(daily) == 0:
+        yield slice(0, 0), slice(0, 0)
+    first_rows, end_rows, _ = day_bounds(hourly_dates, daily['date'], series_interval(hourly_dates))
+    for start in range(0, len(daily), SHARD_DAYS):
+        end = min(start + SHARD_DAYS, len(daily))
+        yield slice(start, end), slice(first_rows[start], end_rows[end - 1])
+
+
+def transform_many(frames) -> list[DailyStats]:
+    """transform_dataframes of every (daily_dataframe, hourly_dataframe, utc_offset_seconds)."""
+    if _executor is None:
+        return [
+            transform_dataframes(daily_dataframe, hourly_dataframe, utc_offset_seconds)
+            for daily_dataframe, hourly_dataframe, utc_offset_seconds in frames
+        ]
+
+    frames = [
+        (to_structured(daily_dataframe), to_structured(hourly_dataframe), utc_offset_seconds)
+        for daily_dataframe, hourly_dataframe, utc_offset_seconds in frames
+    ]
+    if not frames:
+        return []
+    size = sum(hourly.nbytes for _, hourly, _ in frames)
+    shared_memory = SharedMemory(create=True, size=max(size, 1))
+    try:
+        tasks, owners = [], []
+        offset = 0
+        for index, (daily, hourly, utc_offset_seconds) in enumerate(frames):
+            shared = np.ndarray(hourly.shape, dtype=hourly.dtype, buffer=shared_memory.buf, offset=offset)
+            shared[:] = hourly
+            del shared
+            dtype_text = dtype_to_text(hourly.dtype)
+            for days, rows in _shards(daily, hourly['date']):
+                tasks.append((
+                    shared_memory.name, offset + rows.start * hourly.itemsize, rows.stop - rows.start,
+                    dtype_text, daily[days], utc_offset_seconds
+                ))
+                owners.append(index)
+            offset += hourly.nbytes
+
+        parts = [[] for _ in frames]
+        chunksize = max(1, len(tasks) // (_workers * 4))
+        for index, stats in zip(
+            owners, _executor.map(_transform_shard, *zip(*tasks), chunksize=chunksize)
+        ):
+            parts[index].append(stats)
+        return [DailyStats.concatenate(shards) for shards in parts]
+    finally:
+        shared_memory.close()
+        shared_memory.unlink()
@@ -0,0 +1,100 @@
+"""Maintenance of the monthly location_data partitions.
+
+    python -m app.partitions create [--months_ahead N]
+    python -m app.partitions detach --before YYYY-MM-DD [--drop]
+
+Partitions are also created on demand by save_records_data. Detaching uses
+DETACH PARTITION CONCURRENTLY, so readers and writers of location_data are not blocked.
+"""
+import argparse
+from datetime import date
+
+from sqlalchemy import text
+
+from app.args_parser import _validate_date
+from app.db_client import get_engine
+from app.db_models import LocationData
+
+PARTITION_PREFIX = f"{LocationData.__tablename__}_p"
+
+CREATE_AHEAD_SQL = text(
+    "SELECT create_location_data_partitions(CURRENT_DATE, (CURRENT_DATE + make_interval(months => :months))::date)"
+)
+LIST_PARTITIONS_SQL = text(f"""
+    SELECT child.relname FROM pg_inherits
+    JOIN pg_class parent ON parent.oid = pg_inherits.inhparent
+    JOIN pg_class child ON child.oid = pg_inherits.inhrelid
+    WHERE parent.relname = '{LocationData.__tablename__}'
+    ORDER BY child.relname
+""")
+
+
+def partition_month(name: str) -> date:
+    """First day of the month of a location_data_pYYYY_MM partition."""
+    year, month = name.removeprefix(PARTITION_PREFIX).split('_')
+    return date(int(year), int(month), 1)
+
+
+def create_partitions(months_ahead: int) -> int:
+    with get_engine().begin() as connection:
+        return connection.execute(CREATE_AHEAD_SQL, {'months': months_ahead}).scalar()
+
+
+def list_partitions() -> list[str]:
+    with get_engine().connect() as connection:
+        return connection.execute(LIST_PARTITIONS_SQL).scalars().all()
+
+
+def detach_partitions(before: date, drop: bool = False) -> list[str]:
+    """Detach (and drop) partitions of months that end on or before `before`.
+
+    Kept partitions are renamed to {name}_detached, so the month can be created again.
+    """
+    detached = []
+    # DETACH ... CONCURRENTLY can't run inside a transaction block
+    with get_engine().connect().execution_options(isolation_level='AUTOCOMMIT') as connection:
+        for name in list_partitions():
+            month = partition_month(name)
+            month_end = date(month.year + month.month // 12, month.month % 12 + 1, 1)
+            if month_end > before:
+                continue
+            connection.execute(text(
+                f'ALTER TABLE {LocationData.__tablename__} DETACH PARTITION "{name}" CONCURRENTLY'))
+            if drop:
+                connection.execute(text(f'DROP TABLE "{name}"'))
+            else:
+                connection.execute(text(f'ALTER TABLE "{name}" RENAME TO "{name}_detached"'))
+            detached.append(name)
+    return detached
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Manage monthly partitions of location_data")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    create_parser = commands.add_parser("create", help="Create partitions up to N months ahead")
+    create_parser.add_argument(
+        "--months_ahead", type=int, default=3,
+        help="Months after the current one to create partitions for (defaults to 3)"
+    )
+
+    detach_parser = commands.add_parser("detach", help="Detach partitions of old months")
+    detach_parser.add_argument(
+        "--before", type=_validate_date, required=True,
+        help="Detach the months that end on or before this date, YYYY-MM-DD"
+    )
+    detach_parser.add_argument(
+        "--drop", action="store_true",
+        help="Drop the detached partitions"
+    )
+    args = parser.parse_args()
+
+    if args.command == "create":
+        print(f"Created {create_partitions(args.months_ahead)} partitions")
+    else:
+        detached = detach_partitions(args.before, args.drop)
+        print(f"{'Dropped' if args.drop else 'Detached'} {len(detached)} partitions: {', '.join(detached)}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,254 @@
+"""Encoding of the daily stats stored in location_data.
+
+PAYLOAD_CODEC picks the layout of new rows:
+
+- packed: the scalar stats are a JSON document in location_data.data, queryable as before (see
+  app/rollups.py), the hourly series are packed into the location_data.series bytea
+- json: every field is in data and series is NULL, the layout before the series column
+
+Rows of both layouts are read back with decode_rows. Rows stored before the series column are
+converted to the packed layout with:
+
+    python -m app.payload_codec repack [-df DATE_FROM] [-dt DATE_TO] [-bs BATCH_DAYS]
+
+Packed series of a day, little-endian:
+
+    version  uint8
+    length   uint16, values per day of every series (24 hourly, 96 15-minutely, 23 or 25 on DST days)
+    kinds    uint8 per field of SERIES_FIELDS, byte width of its integer deltas or 0 for float64 values
+    values   `length` values per field of SERIES_FIELDS, in the field order
+
+Series are stored as integers (wind speeds in hundredths of m/s): the first value followed by the
+differences of consecutive values, in the narrowest integer type that fits the deltas of all days
+encoded together. Values that are not integers at that scale (NaN) are stored as float64.
+"""
+import argparse
+import struct
+from collections import defaultdict
+from datetime import date
+from itertools import chain
+
+import numpy as np
+
+from app.args_parser import _validate_date
+from app.config import PAYLOAD_CODEC
+from app.open_meteo_data_transform import DailyStats, INT_SERIES, MPS_SERIES, SERIES_FIELDS
+
+VERSION = 1
+FLOAT_KIND = 0
+INT_DTYPES = {1: np.dtype('<i1'), 2: np.dtype('<i2'), 4: np.dtype('<i4'), 8: np.dtype('<i8')}
+FLOAT_DTYPE = np.dtype('<f8')
+HEADER = struct.Struct(f'<BH{len(SERIES_FIELDS)}B')
+
+# Series are stored multiplied by their scale, wind speeds are rounded to 2 decimals
+SERIES_SCALES = {**{field: 100 for field in MPS_SERIES}, **{field: 1 for field in INT_SERIES}}
+
+# Location-days converted and written at once by repack
+REPACK_BATCH_DAYS = 20000
+
+
+def _delta_kind(deltas: np.ndarray) -> int:
+    """Byte width of the narrowest integer type holding all deltas."""
+    if deltas.size == 0:
+        return 1
+    low, high = deltas.min(), deltas.max()
+    for width, dtype in INT_DTYPES.items():
+        limits = np.iinfo(dtype)
+        if limits.min <= low and high <= limits.max:
+            return width
+
+
+def _pack(blocks: dict[str, np.ndarray]) -> list[bytes]:
+    """Packed series of days of the same length, blocks are field -> (days, length) arrays."""
+    days, length = blocks[SERIES_FIELDS[0]].shape
+    kinds, arrays = [], []
+    for field in SERIES_FIELDS:
+        block, scale = blocks[field], SERIES_SCALES[field]
+        if block.dtype.kind != 'f':
+            block = block.astype(np.int64) * scale
+        else:
+            scaled = np.rint(block * scale)
+            if not np.array_equal(scaled / scale, block):
+                kinds.append(FLOAT_KIND)
+                arrays.append(block.astype(FLOAT_DTYPE))
+                continue
+            block = scaled
+        deltas = np.diff(block.astype(np.int64), axis=1, prepend=0)
+        kind = _delta_kind(deltas)
+        kinds.append(kind)
+        arrays.append(deltas.astype(INT_DTYPES[kind]))
+
+    packed = np.empty(days, dtype=[(field, array.dtype, (length,)) for field, array in zip(SERIES_FIELDS, arrays)])
+    for field, array in zip(SERIES_FIELDS, arrays):
+        packed[field] = array
+    header = HEADER.pack(VERSION, length, *kinds)
+    data, size = packed.tobytes(), packed.dtype.itemsize
+    return [header + data[start:start + size] for start in range(0, days * size, size)]
+
+
+def encode_series(columns: dict[str, np.ndarray], offsets: np.ndarray) -> list[bytes]:
+    """Packed series of every day, day i owns values offsets[i]:offsets[i + 1] of every column.
+
+    Days of the same length are packed together, usually all of them.
+    """
+    lengths = np.diff(offsets)
+    payloads = [None] * len(lengths)
+    for length in np.unique(lengths).tolist():
+        days = np.flatnonzero(lengths == length)
+        rows = offsets[days][:, None] + np.arange(length)
+        packed = _pack({field: columns[field][rows] for field in SERIES_FIELDS})
+        for day, payload in zip(days.tolist(), packed):
+            payloads[day] = payload
+    return payloads
+
+
+def decode_series(payloads) -> list[dict[str, list]]:
+    """Series fields of every packed payload, days with the same header are decoded together."""
+    groups = defaultdict(list)
+    for index, payload in enumerate(payloads):
+        groups[bytes(payload[:HEADER.size])].append(index)
+
+    decoded = [None] * len(payloads)
+    for header, indices in groups.items():
+        version, length, *kinds = HEADER.unpack(header)
+        if version != VERSION:
+            raise ValueError(f"Unknown packed series version {version}")
+        packed = np.frombuffer(
+            b''.join(bytes(payloads[index][HEADER.size:]) for index in indices),
+            dtype=[
+                (field, FLOAT_DTYPE if kind == FLOAT_KIND else INT_DTYPES[kind], (length,))
+                for field, kind in zip(SERIES_FIELDS, kinds)
+            ]
+        )
+        columns = {}
+        for field, kind in zip(SERIES_FIELDS, kinds):
+            values = packed[field]
+            if kind != FLOAT_KIND:
+                values = np.cumsum(values, axis=1, dtype=np.int64)
+                if SERIES_SCALES[field] != 1:
+                    values = values / SERIES_SCALES[field]
+            columns[field] = values.tolist()
+        for position, index in enumerate(indices):
+            decoded[index] = {field: columns[field][position] for field in SERIES_FIELDS}
+    return decoded
+
+
+def _encode_json(stats: DailyStats):
+    return stats.to_json(), [None] * len(stats)
+
+
+def _encode_packed(stats: DailyStats):
+    return stats.to_json(series=False), encode_series(stats.columns, stats.offsets)
+
+
+# Codec name -> function returning the data documents and series payloads of every day of a DailyStats
+CODECS = {
+    'json': _encode_json,
+    'packed': _encode_packed,
+}
+
+
+def encode(stats: DailyStats, codec: str = PAYLOAD_CODEC) -> tuple[list[str], list]:
+    """(data, series) column values of every day of stats."""
+    if codec not in CODECS:
+        raise ValueError(f"Unknown payload codec '{codec}', expected one of {', '.join(CODECS)}")
+    return CODECS[codec](stats)
+
+
+def decode_rows(documents, series) -> list[dict | None]:
+    """Stats of every stored day from its data and series columns, in either layout."""
+    packed = [index for index, payload in enumerate(series) if payload is not None]
+    decoded = dict(zip(packed, decode_series([series[index] for index in packed])))
+    return [
+        {**document, **decoded[index]} if index in decoded and document is not None else document
+        for index, document in enumerate(documents)
+    ]
+
+
+REPACK_READ_SQL = """
+    SELECT longitude, latitude, date, data FROM location_data
+    WHERE series IS NULL AND data ? %(first_field)s
+        AND (%(date_from)s::date IS NULL OR date >= %(date_from)s) AND (%(date_to)s::date IS NULL OR date <= %(date_to)s)
+"""
+REPACK_UPDATE_SQL = """
+    UPDATE location_data AS stored
+    SET data = stored.data - %(fields)s::text[], series = packed.series
+    FROM unnest(%(longitudes)s::numeric[], %(latitudes)s::numeric[], %(dates)s::date[], %(series)s::bytea[])
+        AS packed (longitude, latitude, date, series)
+    WHERE stored.longitude = packed.longitude AND stored.latitude = packed.latitude AND stored.date = packed.date
+"""
+
+
+def _columns_of_documents(documents):
+    """Flat series columns and day offsets of JSON documents holding the series fields."""
+    lengths = [len(document[SERIES_FIELDS[0]]) for document in documents]
+    columns = {
+        field: np.array(
+            list(chain.from_iterable(document[field] for document in documents)),
+            dtype=np.float64 if field in MPS_SERIES else np.int64
+        )
+        for field in SERIES_FIELDS
+    }
+    return columns, np.concatenate([[0], np.cumsum(lengths, dtype=np.int64)])
+
+
+def repack(date_from: date | None = None, date_to: date | None = None,
+           batch_days: int = REPACK_BATCH_DAYS) -> int:
+    """Move the series of days stored in the json layout within [date_from, date_to] to the series column.
+
+    Returns the number of converted rows.
+    """
+    from app.db_client import get_engine
+
+    reader, writer = get_engine().raw_connection(), get_engine().raw_connection()
+    converted = 0
+    try:
+        # A named cursor is a server-side one, only batch_days rows are held in memory
+        with reader.cursor(name="location_data_repack") as read_cursor:
+            read_cursor.itersize = batch_days
+            read_cursor.execute(
+                REPACK_READ_SQL, {'first_field': SERIES_FIELDS[0], 'date_from': date_from, 'date_to': date_to})
+            while rows := read_cursor.fetchmany(batch_days):
+                longitudes, latitudes, dates, documents = zip(*rows)
+                series = encode_series(*_columns_of_documents(documents))
+                with writer.cursor() as cursor:
+                    cursor.execute(REPACK_UPDATE_SQL, {
+                        'fields': SERIES_FIELDS,
+                        'longitudes': list(longitudes),
+                        'latitudes': list(latitudes),
+                        'dates': list(dates),
+                        'series': series,
+                    })
+                writer.commit()
+                converted += len(rows)
+                print(f"Repacked {converted} location-days")
+    finally:
+        reader.close()
+        writer.close()
+    return converted
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Payload layout of location_data")
+    commands = parser.add_subparsers(dest="command", required=True)
+    repack_parser = commands.add_parser(
+        "repack", help="Move the series of rows stored as one JSON document to the series column")
+    repack_parser.add_argument(
+        "-df", "--date_from", type=_validate_date,
+        help="Start date in YYYY-MM-DD format (defaults to the first stored day)"
+    )
+    repack_parser.add_argument(
+        "-dt", "--date_to", type=_validate_date,
+        help="End date in YYYY-MM-DD format (defaults to the last stored day)"
+    )
+    repack_parser.add_argument(
+        "-bs", "--batch_days", type=int, default=REPACK_BATCH_DAYS,
+        help=f"Location-days converted and written at once (defaults to {REPACK_BATCH_DAYS})"
+    )
+    args = parser.parse_args()
+
+    print(f"Repacked {repack(args.date_from, args.date_to, args.batch_days)} rows")
+
+
+if __name__ == '__main__':
+    main()
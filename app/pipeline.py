@@ -0,0 +1,112 @@
+"""Pipelined ingestion: fetch, transform, save and export of different batches overlap.
+
+Every stage is run by its own threads and passes its output to the next stage through a bounded
+queue. A stage blocks while the queue after it is full, so a slow stage holds back the ones before
+it instead of batches piling up in memory, and throughput is set by the slowest stage rather than
+by the sum of all of them.
+
+Fetch threads wait on the network, save threads on Postgres (each with a connection of the engine
+pool, see app/db_client.py) and the transform runs numpy or the transform pool, so the threads
+mostly run without the GIL.
+"""
+import queue
+import threading
+
+from app import metrics
+
+# Batches waiting between two stages
+QUEUE_SIZE = 2
+# Seconds between checks whether another stage failed while blocked on a queue
+POLL_SECONDS = 0.1
+
+# Put once per thread of a stage after its last input
+_DONE = object()
+
+
+class _Stage:
+    def __init__(self, name, function, workers):
+        self.name = name
+        self.function = function
+        self.workers = max(1, workers)
+        self.inbox = queue.Queue(QUEUE_SIZE)
+        self.running = self.workers
+        self.lock = threading.Lock()
+
+
+def run_pipeline(items, stages):
+    """Pass every item through stages, a list of (name, function, workers).
+
+    function gets the output of the previous stage and returns the input of the next one, output of
+    the last stage is dropped. Items are consumed lazily from the calling thread, which also blocks
+    while the first stage is busy. Items are processed in no particular order. The first error of
+    any stage stops the pipeline and is raised once all threads have finished.
+    """
+    stages = [_Stage(name, function, workers) for name, function, workers in stages]
+    failed = threading.Event()
+    errors = []
+
+    def put(stage, item) -> bool:
+        while not failed.is_set():
+            try:
+                stage.inbox.put(item, timeout=POLL_SECONDS)
+                return True
+            except queue.Full:
+                pass
+        return False
+
+    def get(stage):
+        while not failed.is_set():
+            try:
+                return stage.inbox.get(timeout=POLL_SECONDS)
+            except queue.Empty:
+                pass
+        return _DONE
+
+    def work(index, stage):
+        following = stages[index + 1] if index + 1 < len(stages) else None
+        try:
+            while True:
+                # Time waiting for input, the slowest stage waits the least
+                with metrics.stage(f"{stage.name}_wait"):
+                    item = get(stage)
+                if item is _DONE:
+                    break
+                result = stage.function(item)
+                if following is not None and not put(following, result):
+                    return
+        except BaseException as error:
+            errors.append(error)
+            failed.set()
+            return
+        finally:
+            with stage.lock:
+                stage.running -= 1
+                last = stage.running == 0
+        # The next stage stops after the output of every thread of this one
+        if last and following is not None:
+            for _ in range(following.workers):
+                put(following, _DONE)
+
+    threads = [
+        threading.Thread(target=work, args=(index, stage), name=f"{stage.name}-{number}", daemon=True)
+        for index, stage in enumerate(stages)
+        for number in range(stage.workers)
+    ]
+    for thread in threads:
+        thread.start()
+
+    try:
+        for item in items:
+            if not put(stages[0], item):
+                break
+        for _ in range(stages[0].workers):
+            put(stages[0], _DONE)
+    except BaseException:
+        failed.set()
+        raise
+    finally:
+        for thread in threads:
+            thread.join()
+
+    if errors:
+        raise errors[0]
@@ -0,0 +1,70 @@
+from collections import defaultdict
+from datetime import date, timedelta
+
+
+def missing_ranges(date_from: date, date_to: date, stored_dates: set[date]) -> list[tuple[date, date]]:
+    """Split [date_from, date_to] into contiguous (start, end) ranges of dates not in stored_dates."""
+    ranges = []
+    range_start = None
+    day = date_from
+    while day <= date_to:
+        if day in stored_dates:
+            if range_start is not None:
+                ranges.append((range_start, day - timedelta(days=1)))
+                range_start = None
+        elif range_start is None:
+            range_start = day
+        day += timedelta(days=1)
+
+    if range_start is not None:
+        ranges.append((range_start, date_to))
+    return ranges
+
+
+def split_range(date_from: date, date_to: date, chunk_days: int | None) -> list[tuple[date, date]]:
+    """Split [date_from, date_to] into consecutive ranges of at most chunk_days days."""
+    if not chunk_days:
+        return [(date_from, date_to)]
+
+    ranges = []
+    chunk_start = date_from
+    while chunk_start <= date_to:
+        chunk_end = min(chunk_start + timedelta(days=chunk_days - 1), date_to)
+        ranges.append((chunk_start, chunk_end))
+        chunk_start = chunk_end + timedelta(days=1)
+    return ranges
+
+
+def plan_requests(locations, date_from: date, date_to: date, stored_dates: dict) -> dict:
+    """Group locations by missing date range.
+
+    Locations that miss the same range share API calls, a location with several gaps
+    appears in several groups. Fully stored locations are left out.
+    """
+    plan = defaultdict(list)
+    for location in locations:
+        for date_range in missing_ranges(date_from, date_to, stored_dates.get(location, set())):
+            plan[date_range].append(location)
+    return dict(plan)
+
+
+def endpoint_ranges(
+    date_from: date, date_to: date, forecast_from: date, chunk_days: int | None
+) -> list[tuple[str, date, date]]:
+    """Split [date_from, date_to] into (endpoint, start, end) requests of at most chunk_days days.
+
+    Days before forecast_from go to the 'archive' endpoint, the rest to 'forecast'. A request
+    never spans both.
+    """
+    ranges = []
+    if date_from < forecast_from:
+        ranges.extend(
+            ('archive', start, end)
+            for start, end in split_range(date_from, min(date_to, forecast_from - timedelta(days=1)), chunk_days)
+        )
+    if date_to >= forecast_from:
+        ranges.extend(
+            ('forecast', start, end)
+            for start, end in split_range(max(date_from, forecast_from), date_to, chunk_days)
+        )
+    return ranges
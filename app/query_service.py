@@ -0,0 +1,219 @@
+"""Read-side HTTP service for daily stats stored in location_data.
+
+    python -m app.query_service [--host HOST] [--port PORT]
+    GET /daily?lon=83&lat=55&date_from=2025-01-01&date_to=2025-01-31
+
+Every request is one range scan on pk_location_data (longitude, latitude, date). Responses are
+columnar JSON, one array per field, and are kept in a size-bounded LRU that drops a location as
+soon as main.py ingests new rows for it (see INGEST_CHANNEL in db_client).
+"""
+import argparse
+import json
+import select
+import threading
+import time
+from collections import OrderedDict
+from datetime import date
+from decimal import Decimal, InvalidOperation
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+from sqlalchemy import select as select_query
+
+from app.config import QUERY_CACHE_MAX_BYTES, QUERY_SERVICE_HOST, QUERY_SERVICE_PORT
+from app.constants import quantize_coordinate
+from app.db_client import INGEST_CHANNEL, get_engine
+from app.db_models import LocationData
+from app.payload_codec import decode_rows
+
+# Seconds between checks of the listener connection
+LISTEN_TIMEOUT = 5
+
+
+class ResultCache:
+    """LRU of encoded responses keyed by (longitude, latitude, date_from, date_to), bounded by total bytes."""
+
+    def __init__(self, max_bytes: int = QUERY_CACHE_MAX_BYTES):
+        self.max_bytes = max_bytes
+        self.size = 0
+        self._entries = OrderedDict()
+        # location -> number of invalidations, results queried before one or before a clear are not cached
+        self._generations = {}
+        self._clears = 0
+        self._lock = threading.Lock()
+
+    def generation(self, location) -> int:
+        with self._lock:
+            return self._generation(location)
+
+    def _generation(self, location) -> int:
+        # both counts only grow, so their sum changes on every invalidation and clear
+        return self._clears + self._generations.get(location, 0)
+
+    def get(self, key) -> bytes | None:
+        with self._lock:
+            payload = self._entries.get(key)
+            if payload is not None:
+                self._entries.move_to_end(key)
+            return payload
+
+    def put(self, key, payload: bytes, generation: int):
+        with self._lock:
+            if generation != self._generation(key[:2]) or len(payload) > self.max_bytes:
+                return
+            if key in self._entries:
+                self.size -= len(self._entries.pop(key))
+            self._entries[key] = payload
+            self.size += len(payload)
+            while self.size > self.max_bytes:
+                _, evicted = self._entries.popitem(last=False)
+                self.size -= len(evicted)
+
+    def invalidate(self, location):
+        """Drop every cached range of a (longitude, latitude)."""
+        with self._lock:
+            self._generations[location] = self._generations.get(location, 0) + 1
+            for key in [key for key in self._entries if key[:2] == location]:
+                self.size -= len(self._entries.pop(key))
+
+    def clear(self):
+        """Drop every cached range, results queried before are not cached either."""
+        with self._lock:
+            self._clears += 1
+            self._entries.clear()
+            self.size = 0
+
+
+def to_columns(longitude, latitude, rows) -> dict:
+    """Rows of (date, timezone, data) as one array per field."""
+    fields = list(rows[0][2] or {}) if rows else []
+    return {
+        'longitude': float(longitude),
+        'latitude': float(latitude),
+        'timezone': rows[-1][1] if rows else None,
+        'date': [day.isoformat() for day, _, _ in rows],
+        **{
+            field: [data.get(field) if data else None for _, _, data in rows]
+            for field in fields
+        },
+    }
+
+
+def query_daily(longitude: Decimal, latitude: Decimal, date_from: date, date_to: date) -> list:
+    """Rows of (date, timezone, data) with the series of the packed layout merged into data."""
+    query = (
+        select_query(LocationData.date, LocationData.timezone, LocationData.data, LocationData.series)
+        .where(LocationData.longitude == longitude)
+        .where(LocationData.latitude == latitude)
+        .where(LocationData.date.between(date_from, date_to))
+        .order_by(LocationData.date)
+    )
+    with get_engine().connect() as connection:
+        rows = connection.execute(query).all()
+    documents = decode_rows([data for _, _, data, _ in rows], [series for _, _, _, series in rows])
+    return [(day, timezone, data) for (day, timezone, _, _), data in zip(rows, documents)]
+
+
+def daily_payload(cache: ResultCache, longitude, latitude, date_from: date, date_to: date) -> tuple[bytes, bool]:
+    """Encoded columnar response and whether it was served from the cache."""
+    location = (quantize_coordinate(longitude), quantize_coordinate(latitude))
+    key = (*location, date_from, date_to)
+    payload = cache.get(key)
+    if payload is not None:
+        return payload, True
+
+    generation = cache.generation(location)
+    rows = query_daily(*location, date_from, date_to)
+    payload = json.dumps(to_columns(*location, rows), separators=(',', ':')).encode()
+    cache.put(key, payload, generation)
+    return payload, False
+
+
+def listen_for_ingests(cache: ResultCache):
+    """Invalidate cached locations on ingest notifications, reconnects on errors."""
+    while True:
+        connection = None
+        try:
+            connection = get_engine().raw_connection()
+            driver_connection = connection.driver_connection
+            driver_connection.autocommit = True
+            with driver_connection.cursor() as cursor:
+                cursor.execute(f"LISTEN {INGEST_CHANNEL}")
+            # notifications sent while disconnected are lost
+            cache.clear()
+
+            while True:
+                if select.select([driver_connection], [], [], LISTEN_TIMEOUT) == ([], [], []):
+                    continue
+                driver_connection.poll()
+                while driver_connection.notifies:
+                    longitude, latitude = driver_connection.notifies.pop(0).payload.split(',')
+                    cache.invalidate((quantize_coordinate(longitude), quantize_coordinate(latitude)))
+        except Exception as error:
+            print(f"Ingest listener failed: {error}, reconnecting")
+            time.sleep(LISTEN_TIMEOUT)
+        finally:
+            if connection is not None:
+                connection.invalidate()
+
+
+def make_handler(cache: ResultCache):
+    class DailyHandler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            url = urlsplit(self.path)
+            if url.path != '/daily':
+                return self._send(404, {'error': 'Not found'})
+
+            query = parse_qs(url.query)
+            try:
+                longitude = quantize_coordinate(query['lon'][0])
+                latitude = quantize_coordinate(query['lat'][0])
+                date_from = date.fromisoformat(query['date_from'][0])
+                date_to = date.fromisoformat(query['date_to'][0])
+            except (KeyError, ValueError, InvalidOperation):
+                return self._send(400, {'error': 'lon, lat, date_from and date_to (YYYY-MM-DD) are required'})
+            if date_from > date_to:
+                return self._send(400, {'error': 'date_from is after date_to'})
+
+            try:
+                payload, hit = daily_payload(cache, longitude, latitude, date_from, date_to)
+            except Exception as error:
+                print(f"Query failed: {error}")
+                return self._send(500, {'error': 'Query failed'})
+            self._send(200, payload, {'X-Cache': 'hit' if hit else 'miss'})
+
+        def _send(self, status, body, headers=None):
+            if isinstance(body, dict):
+                body = json.dumps(body).encode()
+            self.send_response(status)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(body)))
+            for name, value in (headers or {}).items():
+                self.send_header(name, value)
+            self.end_headers()
+            self.wfile.write(body)
+
+    return DailyHandler
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Query service for stored daily weather stats")
+    parser.add_argument("--host", help=f"Defaults to {QUERY_SERVICE_HOST}", default=QUERY_SERVICE_HOST)
+    parser.add_argument("--port", type=int, help=f"Defaults to {QUERY_SERVICE_PORT}", default=QUERY_SERVICE_PORT)
+    args = parser.parse_args()
+
+    cache = ResultCache()
+    threading.Thread(target=listen_for_ingests, args=(cache,), daemon=True).start()
+
+    server = ThreadingHTTPServer((args.host, args.port), make_handler(cache))
+    print(f"Serving on http://{args.host}:{args.port}/daily")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == '__main__':
+    main()
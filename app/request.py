@@ -1,52 +1,184 @@
-import openmeteo_requests
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, timedelta
+
+import numpy as np
 import pandas as pd
-import requests_cache
+import requests
+from openmeteo_requests.Client import OpenMeteoRequestsError
 from retry_requests import retry
 from openmeteo_sdk.Unit import Unit as UnitType
 from openmeteo_sdk.WeatherApiResponse import WeatherApiResponse
 
+from app import metrics
+from app.config import API_CHUNK_DAYS, ARCHIVE_API_URL, FORECAST_API_URL, FORECAST_PAST_DAYS, UNITS_DTYPE
 from app.constants import HourlyParams
+from app.planner import endpoint_ranges
+from app.response_archive import archive_payload, payload_messages
 import app.open_meteo_data_transform as open_meteo_data_transform
 from app.utils import farhenheits_to_celcius, inches_to_millimeter, knots_to_kmh, feet_to_meter
 
-# Setup the Open-Meteo API client with cache and retry on error
-cache_session = requests_cache.CachedSession('.cache', expire_after=3600)
-retry_session = retry(cache_session, retries=5, backoff_factor=0.2)
+# HTTP session of the Open-Meteo API, created on first request
+_session = None
+# Print the location of every response, see enable_verbose
+_verbose = False
+
+ENDPOINT_URLS = {
+    'forecast': FORECAST_API_URL,
+    'archive': ARCHIVE_API_URL,
+}
+
+# Parts of a long range requested at once by fetch_range, on top of the fetch workers of main.py
+CHUNK_FETCH_WORKERS = 4
+
+
+def get_session() -> requests.Session:
+    """Open-Meteo API session with retry on error, responses are cached per day in app.day_cache."""
+    global _session
+    if _session is None:
+        retry_session = retry(retries=5, backoff_factor=0.2)
+        retry_session.hooks['response'].append(
+            lambda response, *args, **kwargs: metrics.increment('bytes_fetched', len(response.content))
+        )
+        # A single session is shared between threads
+        _session = retry_session
+    return _session
+
+
+def fetch_payload(url: str, params: object, timeout: float | None = None) -> bytes:
+    """Raw API payload of a request: a little-endian uint32 length before every flatbuffer.
+
+    Requested like openmeteo_requests.Client does it, the bytes are kept to be archived as sent.
+    """
+    response = get_session().get(url, params={**params, 'format': 'flatbuffers'}, timeout=timeout)
+    if response.status_code in (400, 429):
+        raise OpenMeteoRequestsError(response.json())
+    response.raise_for_status()
+    return response.content
 
-def make_request(params: object):
-    openmeteo = openmeteo_requests.Client(session=retry_session)
 
+def enable_verbose():
+    global _verbose
+    _verbose = True
+
+
+def make_request(params: object, timeout: float | None = None, endpoint: str = 'forecast') -> list[WeatherApiResponse]:
     # Make sure all required weather variables are listed here
     # The order of variables in hourly or daily is important to assign them correctly below
-    url = "https://api.open-meteo.com/v1/forecast"
-    responses = openmeteo.weather_api(url, params=params)
-
-    # Process first location. Add a for-loop for multiple locations or weather models
-    response = responses[0]
-    print(f"Coordinates {response.Latitude()}°N {response.Longitude()}°E")
-    print(f"Elevation {response.Elevation()} m asl")
-    print(f"Timezone {response.Timezone()}{response.TimezoneAbbreviation()}")
-    print(f"Timezone difference to GMT+0 {response.UtcOffsetSeconds()} s")
+    with metrics.stage('fetch'):
+        data = fetch_payload(ENDPOINT_URLS[endpoint], params, timeout)
+    archive_payload(params, data)
+
+    # One response per requested location, in the same order as the coordinates in params
+    responses = [WeatherApiResponse.GetRootAs(data, offset) for offset, _ in payload_messages(data)]
+    if _verbose:
+        for response in responses:
+            print(f"Coordinates {response.Latitude()}°N {response.Longitude()}°E")
+            print(f"Elevation {response.Elevation()} m asl")
+            print(f"Timezone {response.Timezone()}{response.TimezoneAbbreviation()}")
+            print(f"Timezone difference to GMT+0 {response.UtcOffsetSeconds()} s")
+
+    return responses
+
+
+def fetch_range(params: dict, timeout: float | None = None, today: date | None = None) -> list[tuple[dict, list]]:
+    """(params, responses) of every part of the params range, see endpoint_ranges.
+
+    Ranges longer than API_CHUNK_DAYS or crossing the forecast window are requested in parts at
+    once, the parts follow each other in date order and are joined with stitch_frames.
+    """
+    forecast_from = (today or date.today()) - timedelta(days=FORECAST_PAST_DAYS)
+    parts = [
+        (endpoint, {**params, 'start_date': start, 'end_date': end})
+        for endpoint, start, end in endpoint_ranges(
+            params['start_date'], params['end_date'], forecast_from, API_CHUNK_DAYS)
+    ]
+    if len(parts) == 1:
+        endpoint, part_params = parts[0]
+        return [(part_params, make_request(part_params, timeout, endpoint))]
+
+    metrics.increment('range_parts_fetched', len(parts))
+    with ThreadPoolExecutor(min(len(parts), CHUNK_FETCH_WORKERS)) as executor:
+        responses = executor.map(lambda part: make_request(part[1], timeout, part[0]), parts)
+        return [(part_params, part_responses) for (_, part_params), part_responses in zip(parts, responses)]
+
+
+def stitch_frames(parts):
+    """One (daily_dataframe, hourly_dataframe, timezone_name, utc_offset_seconds) of a location from
+    the same tuples of consecutive date ranges, as if the whole range was requested at once."""
+    if len(parts) == 1:
+        return parts[0]
+    daily_dataframe = pd.concat([daily for daily, _, _, _ in parts], ignore_index=True)
+    hourly_dataframe = pd.concat([hourly for _, hourly, _, _ in parts], ignore_index=True)
+    # local dates of the days are computed with the offset of the first part, like for a single request
+    _, _, timezone_name, utc_offset_seconds = parts[0]
+    return daily_dataframe, hourly_dataframe, timezone_name, utc_offset_seconds
+
+
+def trim_frames(daily_dataframe, hourly_dataframe, utc_offset_seconds: int, date_from: date, date_to: date):
+    """Daily and hourly dataframes of the local days within [date_from, date_to]."""
+    day_starts = open_meteo_data_transform.to_unix_seconds(daily_dataframe['date'])
+    dates = open_meteo_data_transform.local_dates(day_starts, utc_offset_seconds)
+    kept = np.flatnonzero((dates >= np.datetime64(date_from, 'D')) & (dates <= np.datetime64(date_to, 'D')))
+    if len(kept) == len(dates):
+        return daily_dataframe, hourly_dataframe
+
+    timestamps = open_meteo_data_transform.to_unix_seconds(hourly_dataframe['date'])
+    if len(kept):
+        first, last = kept[0], kept[-1] + 1
+        # Hours from the start of the first kept day to the start of the day after the last one
+        hourly_kept = timestamps >= day_starts[first]
+        if last < len(day_starts):
+            hourly_kept &= timestamps < day_starts[last]
+    else:
+        first = last = 0
+        hourly_kept = np.zeros(len(timestamps), dtype=bool)
+    return (
+        daily_dataframe.iloc[first:last].reset_index(drop=True),
+        hourly_dataframe[hourly_kept].reset_index(drop=True),
+    )
 
-    return response
 
-def transform_units(unit_type, values):
+def transform_units(unit_type, values: np.ndarray, dtype=UNITS_DTYPE) -> np.ndarray:
     match unit_type:
         case UnitType.fahrenheit:
-            return farhenheits_to_celcius(values)
+            return farhenheits_to_celcius(values, dtype=dtype)
         case UnitType.knots:
-            return knots_to_kmh(values)
+            return knots_to_kmh(values, dtype=dtype)
         case UnitType.feet:
-            return feet_to_meter(values)
+            return feet_to_meter(values, dtype=dtype)
         case UnitType.inch:
-            return inches_to_millimeter(values)
+            return inches_to_millimeter(values, dtype=dtype)
         case UnitType.wmo_code:
-            return [int(v) for v in values]
+            # astype would turn a missing code into INT64_MIN and store it
+            if np.isnan(values).any():
+                raise ValueError('cannot convert float NaN to integer')
+            return values.astype(np.int64)
         case _:
             return values
 
+
+def local_midnights(start: int, days: int, timezone_name: str, utc_offset_seconds: int) -> pd.DatetimeIndex:
+    """UTC timestamps of the local midnights of days from the day starting at unixtime start.
+
+    Days are not a fixed daily.Interval() apart: across a DST change a local day is 23 or 25 hours.
+    A midnight skipped by the change is moved to the first hour of the day, a repeated one is the first.
+    """
+    first = open_meteo_data_transform.local_dates(np.array([start]), utc_offset_seconds)[0]
+    dates = pd.date_range(start=pd.Timestamp(first), periods=days, freq='D')
+    try:
+        midnights = dates.tz_localize(
+            timezone_name, ambiguous=np.ones(days, dtype=bool), nonexistent='shift_forward')
+    except KeyError:
+        # Not an IANA timezone name, the offset of the response applies to every day
+        midnights = (dates - pd.Timedelta(seconds=utc_offset_seconds)).tz_localize('UTC')
+    return midnights.tz_convert('UTC')
+
+
 def combine_dataframes(response: WeatherApiResponse, params: object):
-    hourly = response.Hourly()
+    # 15-minutely series are requested with params['minutely_15'] instead of params['hourly'],
+    # transform_dataframes segments days by timestamps, so both give the same dataframe layout
+    resolution = 'minutely_15' if 'minutely_15' in params else 'hourly'
+    hourly = response.Minutely15() if resolution == 'minutely_15' else response.Hourly()
 
     if hourly != None:
         hourly_data = {"date": pd.date_range(
@@ -57,8 +189,8 @@ def combine_dataframes(response: WeatherApiResponse, params: object):
         )}
 
         # read hourly data
-        for i in range(len(params['hourly'])):
-            key = params['hourly'][i]
+        for i in range(len(params[resolution])):
+            key = params[resolution][i]
             variable = hourly.Variables(i)
             values = transform_units(
                 variable.Unit(), 
@@ -76,12 +208,9 @@ def combine_dataframes(response: WeatherApiResponse, params: object):
         daily.Variables(2).ValuesAsNumpy()
     )
 
-    daily_data = {"date": pd.date_range(
-        start=pd.to_datetime(daily.Time(), unit="s", utc=True),
-        end=pd.to_datetime(daily.TimeEnd(), unit="s", utc=True),
-        freq=pd.Timedelta(seconds=daily.Interval()),
-        inclusive="left"
-    )}
+    timezone_name = response.Timezone().decode('utf-8')
+    daily_data = {"date": local_midnights(
+        daily.Time(), len(values_lists[0]), timezone_name, response.UtcOffsetSeconds())}
 
     for i in range(len(params['daily'])):
         key = params['daily'][i]
@@ -94,7 +223,7 @@ def combine_dataframes(response: WeatherApiResponse, params: object):
 
     daily_dataframe = pd.DataFrame(data=daily_data)
     
-    return daily_dataframe, hourly_dataframe, response.Timezone().decode('utf-8'), response.Longitude(), response.Latitude()
+    return daily_dataframe, hourly_dataframe, timezone_name, response.Longitude(), response.Latitude()
 
 if __name__ == '__main__':
     params = {
@@ -110,8 +239,9 @@ if __name__ == '__main__':
         "temperature_unit": "fahrenheit",
         "precipitation_unit": "inch"
     }
-    response = make_request(params)
-    daily_dataframe, hourly_dataframe, timezone_name = combine_dataframes(response, params)
+    enable_verbose()
+    response = make_request(params)[0]
+    daily_dataframe, hourly_dataframe, timezone_name, _, _ = combine_dataframes(response, params)
     with open("hourly_data.json", "w") as json_file:
         json_file.write(hourly_dataframe.to_json())
     with open("hourly_data.txt", "w") as txt_file:
@@ -120,5 +250,6 @@ if __name__ == '__main__':
         json_file.write(daily_dataframe.to_json())
     with open("daily_data.txt", "w") as txt_file:
         txt_file.write(daily_dataframe.to_string())
-    transformed_data = open_meteo_data_transform.transform_dataframes(daily_dataframe, hourly_dataframe, timezone_name)
+    transformed_data = open_meteo_data_transform.transform_dataframes(
+        daily_dataframe, hourly_dataframe, response.UtcOffsetSeconds())
 
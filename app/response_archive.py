@@ -0,0 +1,216 @@
+"""Append-only archive of raw Open-Meteo responses, replayed without calling the API.
+
+Archiving is enabled by setting RESPONSE_ARCHIVE_PATH. Every fetched payload is appended as the
+API sent it (a little-endian uint32 length before every flatbuffer) to a segment file there.
+index.sqlite maps the requested location and date range to the flatbuffer in the segment. Replay
+memory-maps the segments and decodes the flatbuffers in place, so reprocessing doesn't copy or
+download anything:
+
+    RESPONSE_ARCHIVE_PATH=.response_archive python main.py -lon 83 -lat 55 -df 2020-01-01 -dt 2024-12-31 --replay
+
+Oldest segments are deleted with their index rows once the archive outgrows RESPONSE_ARCHIVE_MAX_BYTES.
+"""
+import mmap
+import os
+import sqlite3
+import threading
+import time
+from datetime import date, timedelta
+
+from openmeteo_sdk.WeatherApiResponse import WeatherApiResponse
+
+from app import metrics
+from app.config import RESPONSE_ARCHIVE_MAX_BYTES, RESPONSE_ARCHIVE_PATH, RESPONSE_ARCHIVE_SEGMENT_BYTES
+from app.constants import quantize_coordinate
+
+INDEX_NAME = 'index.sqlite'
+SEGMENT_SUFFIX = '.seg'
+LENGTH_BYTES = 4
+
+CREATE_TABLE_SQL = """
+    CREATE TABLE IF NOT EXISTS responses (
+        longitude TEXT NOT NULL,
+        latitude TEXT NOT NULL,
+        date_from TEXT NOT NULL,
+        date_to TEXT NOT NULL,
+        variables TEXT NOT NULL,
+        segment TEXT NOT NULL,
+        offset INTEGER NOT NULL,
+        length INTEGER NOT NULL,
+        archived_at REAL NOT NULL
+    )
+"""
+CREATE_INDEX_SQL = (
+    "CREATE INDEX IF NOT EXISTS idx_responses_location ON responses (longitude, latitude, date_from)"
+)
+CREATE_SEGMENT_INDEX_SQL = "CREATE INDEX IF NOT EXISTS idx_responses_segment ON responses (segment)"
+
+# Responses are archived from the fetch threads of the ingest pipeline, see app/pipeline.py
+_lock = threading.Lock()
+# Connection and open segment of the process that created them, a forked child starts its own
+_owner_pid = None
+_connection = None
+_segment = None
+# Segment name -> read-only mapping
+_mapped = {}
+
+
+def _reset_after_fork():
+    global _owner_pid, _connection, _segment
+    if _owner_pid != os.getpid():
+        _owner_pid, _connection, _segment = os.getpid(), None, None
+
+
+def _connect() -> sqlite3.Connection:
+    global _connection
+    _reset_after_fork()
+    if _connection is None:
+        os.makedirs(RESPONSE_ARCHIVE_PATH, exist_ok=True)
+        _connection = sqlite3.connect(
+            os.path.join(RESPONSE_ARCHIVE_PATH, INDEX_NAME), timeout=30, check_same_thread=False)
+        _connection.execute(CREATE_TABLE_SQL)
+        _connection.execute(CREATE_INDEX_SQL)
+        _connection.execute(CREATE_SEGMENT_INDEX_SQL)
+    return _connection
+
+
+def _segment_for(size: int):
+    """(name, file) of the segment the next `size` bytes are appended to."""
+    global _segment
+    _reset_after_fork()
+    if _segment is not None and _segment[1].tell() + size > RESPONSE_ARCHIVE_SEGMENT_BYTES:
+        _segment[1].close()
+        _segment = None
+    if _segment is None:
+        # Every process appends to its own segments
+        name = f"{time.time_ns()}-{os.getpid()}{SEGMENT_SUFFIX}"
+        _segment = name, open(os.path.join(RESPONSE_ARCHIVE_PATH, name), 'ab')
+    return _segment
+
+
+def _coordinate(value) -> str:
+    return str(quantize_coordinate(value))
+
+
+def variables_key(params) -> str:
+    """Requested variables in order, responses decode correctly only with the same params."""
+    resolution = 'minutely_15' if 'minutely_15' in params else 'hourly'
+    return f"{resolution}:{','.join(params[resolution])};daily:{','.join(params['daily'])}"
+
+
+def payload_messages(data) -> list[tuple[int, int]]:
+    """(offset, length) of every length-prefixed flatbuffer of an API payload."""
+    messages = []
+    position = 0
+    while position < len(data):
+        length = int.from_bytes(data[position:position + LENGTH_BYTES], byteorder='little')
+        messages.append((position + LENGTH_BYTES, length))
+        position += LENGTH_BYTES + length
+    if position != len(data):
+        raise ValueError('Payload is not a sequence of length-prefixed flatbuffers')
+    return messages
+
+
+def archive_payload(params, data: bytes):
+    """Append a payload as the API sent it, one index row per requested location."""
+    if not RESPONSE_ARCHIVE_PATH or not data:
+        return
+    messages = payload_messages(data)
+    if len(messages) != len(params['longitude']):
+        raise ValueError(f"Payload has {len(messages)} responses, {len(params['longitude'])} were requested")
+
+    archived_at = time.time()
+    with _lock:
+        connection = _connect()
+        name, segment_file = _segment_for(len(data))
+        start = segment_file.tell()
+        segment_file.write(data)
+        segment_file.flush()
+
+        with connection:
+            connection.executemany(
+                "INSERT INTO responses VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                [
+                    (
+                        _coordinate(longitude), _coordinate(latitude),
+                        str(params['start_date']), str(params['end_date']), variables_key(params),
+                        name, start + offset, length, archived_at,
+                    )
+                    for (longitude, latitude), (offset, length)
+                    in zip(zip(params['longitude'], params['latitude']), messages)
+                ]
+            )
+            _evict(connection, name)
+    metrics.increment('responses_archived', len(messages))
+
+
+def _evict(connection: sqlite3.Connection, current: str):
+    """Delete the oldest segments until the archive fits RESPONSE_ARCHIVE_MAX_BYTES.
+
+    Segment names start with their creation time. The segment being appended to is kept, so a
+    single segment larger than the limit stays until the next one is started.
+    """
+    segments = sorted(name for name in os.listdir(RESPONSE_ARCHIVE_PATH) if name.endswith(SEGMENT_SUFFIX))
+    sizes = {name: os.path.getsize(os.path.join(RESPONSE_ARCHIVE_PATH, name)) for name in segments}
+    total_size = sum(sizes.values())
+    for name in segments:
+        if total_size <= RESPONSE_ARCHIVE_MAX_BYTES:
+            break
+        if name == current:
+            continue
+        connection.execute("DELETE FROM responses WHERE segment = ?", (name,))
+        os.remove(os.path.join(RESPONSE_ARCHIVE_PATH, name))
+        _mapped.pop(name, None)
+        total_size -= sizes[name]
+        metrics.increment('archive_segments_evicted')
+
+
+def _map(segment: str, end: int) -> mmap.mmap:
+    """Read-only mapping of a segment that covers bytes up to `end`."""
+    with _lock:
+        mapped = _mapped.get(segment)
+        # Segments still appended to are mapped again when they have grown
+        if mapped is None or len(mapped) < end:
+            with open(os.path.join(RESPONSE_ARCHIVE_PATH, segment), 'rb') as segment_file:
+                mapped = mmap.mmap(segment_file.fileno(), 0, access=mmap.ACCESS_READ)
+            # Earlier mappings are released once no response decoded from them is referenced
+            _mapped[segment] = mapped
+        return mapped
+
+
+def replay(locations, date_from, date_to, params):
+    """Yield ((longitude, latitude), (first, last), response) of archived responses overlapping
+    [date_from, date_to], the response is used for the days from first to last only.
+
+    Only responses requested with the variables of params are returned. Every day of the range is
+    taken from one response: of responses archived for the same location and range the newest one
+    is used, a range overlapping earlier replayed ranges gives only the days after them.
+    """
+    for longitude, latitude in locations:
+        with _lock:
+            rows = _connect().execute(
+                """
+                SELECT date_from, date_to, segment, offset, length FROM responses
+                WHERE longitude = ? AND latitude = ? AND variables = ? AND date_from <= ? AND date_to >= ?
+                ORDER BY date_from, date_to DESC, archived_at DESC
+                """,
+                (
+                    _coordinate(longitude), _coordinate(latitude), variables_key(params),
+                    str(date_to), str(date_from),
+                )
+            ).fetchall()
+
+        replayed_to = date_from - timedelta(days=1)
+        for range_from, range_to, segment, offset, length in rows:
+            first = max(date.fromisoformat(range_from), replayed_to + timedelta(days=1))
+            last = min(date.fromisoformat(range_to), date_to)
+            if first > last:
+                continue
+            try:
+                mapped = _map(segment, offset + length)
+            except FileNotFoundError:
+                # Evicted by another process since the rows were read
+                continue
+            replayed_to = last
+            metrics.increment('responses_replayed')
+            yield (longitude, latitude), (first, last), WeatherApiResponse.GetRootAs(mapped, offset)
@@ -0,0 +1,153 @@
+"""Weekly and monthly rollups of the daily stats in location_data.
+
+save_records_data recomputes the periods touched by newly inserted days in the same transaction,
+rollups of existing data are built with:
+
+    python -m app.rollups backfill [-df DATE_FROM] [-dt DATE_TO]
+"""
+import argparse
+from datetime import date
+
+from app.args_parser import _validate_date
+from app.db_models import LocationData, LocationDataMonthly, LocationDataWeekly
+from app.open_meteo_data_transform import WeatherStatsNamedTuple
+
+# Rollup table -> date_trunc/interval unit of its periods
+ROLLUPS = {
+    LocationDataWeekly.__tablename__: 'week',
+    LocationDataMonthly.__tablename__: 'month',
+}
+
+AVG_FIELDS = [field for field in WeatherStatsNamedTuple._fields if field.startswith('avg_')]
+TOTAL_FIELDS = [field for field in WeatherStatsNamedTuple._fields if field.startswith('total_')]
+
+AGGREGATES = {
+    'days': "COUNT(*)",
+    **{field: f"ROUND(AVG((data->>'{field}')::float8)::numeric, 2)" for field in AVG_FIELDS},
+    **{field: f"SUM((data->>'{field}')::bigint)" for field in TOTAL_FIELDS},
+    'avg_daylight_hours': "ROUND(AVG((data->>'daylight_hours')::float8)::numeric, 2)",
+    'total_daylight_hours': "ROUND(SUM((data->>'daylight_hours')::float8)::numeric, 2)",
+}
+
+# Periods of newly inserted (longitude, latitude, date) rows, passed as arrays
+INSERTED_PERIODS = """
+    SELECT DISTINCT longitude, latitude, date_trunc('{unit}', date)::date AS period_start
+    FROM unnest(%(longitudes)s::numeric[], %(latitudes)s::numeric[], %(dates)s::date[])
+        AS inserted (longitude, latitude, date)
+"""
+# Periods with stored days in [date_from, date_to)
+STORED_PERIODS = f"""
+    SELECT DISTINCT longitude, latitude, date_trunc('{{unit}}', date)::date AS period_start
+    FROM {LocationData.__tablename__}
+    WHERE date >= %(date_from)s AND date < %(date_to)s
+"""
+
+# Locations of a period are spread over this many advisory locks, see LOCK_SQL
+LOCK_BUCKETS = 16
+
+# Writers touching the same period recompute it one after another: a recompute only sees the days
+# committed before it and its own, so without the lock the last upsert could drop the days of a
+# concurrent transaction. The lock is held until commit and the next writer's recompute sees them.
+# Keys are taken in sorted order, so writers never deadlock on them. Locations are hashed into
+# LOCK_BUCKETS per period to keep the locks of a transaction within max_locks_per_transaction
+LOCK_SQL = f"""
+    SELECT pg_advisory_xact_lock(hashtext('{{table}}'), lock_key)
+    FROM (
+        SELECT DISTINCT hashtext(concat_ws(' ', period_start,
+            mod(hashtext(concat_ws(' ', longitude, latitude)), {LOCK_BUCKETS}))) AS lock_key
+        FROM ({{periods}}) AS periods
+        ORDER BY lock_key
+    ) AS keys
+"""
+
+# Every touched period is recomputed from its days, so late or out-of-order days are merged correctly
+ROLLUP_SQL = f"""
+    INSERT INTO {{table}} (longitude, latitude, period_start, {', '.join(AGGREGATES)})
+    SELECT periods.longitude, periods.latitude, periods.period_start, {', '.join(AGGREGATES.values())}
+    FROM ({{periods}}) AS periods
+    JOIN {LocationData.__tablename__} AS days
+        ON days.longitude = periods.longitude AND days.latitude = periods.latitude
+        AND days.date >= periods.period_start AND days.date < periods.period_start + interval '1 {{unit}}'
+    GROUP BY periods.longitude, periods.latitude, periods.period_start
+    ON CONFLICT (longitude, latitude, period_start) DO UPDATE SET
+        {', '.join(f'{field} = excluded.{field}' for field in AGGREGATES)}
+"""
+
+
+def update_rollups(cursor, inserted_rows):
+    """Recompute the rollup periods of inserted (longitude, latitude, date) rows, within the cursor transaction."""
+    if not inserted_rows:
+        return
+    longitudes, latitudes, dates = zip(*inserted_rows)
+    params = {'longitudes': list(longitudes), 'latitudes': list(latitudes), 'dates': list(dates)}
+    for table, unit in ROLLUPS.items():
+        _recompute(cursor, table, unit, INSERTED_PERIODS.format(unit=unit), params)
+
+
+def _recompute(cursor, table, unit, periods, params):
+    """Lock and recompute the periods of a rollup table, tables are always locked in ROLLUPS order."""
+    cursor.execute(LOCK_SQL.format(table=table, periods=periods), params)
+    cursor.execute(ROLLUP_SQL.format(table=table, unit=unit, periods=periods), params)
+
+
+def _months(date_from: date, date_to: date):
+    """[start, end) of every month overlapping [date_from, date_to]."""
+    start = date_from.replace(day=1)
+    while start <= date_to:
+        end = date(start.year + start.month // 12, start.month % 12 + 1, 1)
+        yield start, end
+        start = end
+
+
+def backfill(date_from: date | None = None, date_to: date | None = None) -> int:
+    """Rebuild rollups of the stored days in [date_from, date_to], one month per transaction.
+
+    Returns the number of rollup rows written.
+    """
+    # db_client imports this module
+    from app.db_client import get_engine
+
+    connection = get_engine().raw_connection()
+    try:
+        with connection.cursor() as cursor:
+            cursor.execute(f"SELECT MIN(date), MAX(date) FROM {LocationData.__tablename__}")
+            stored_from, stored_to = cursor.fetchone()
+        if stored_from is None:
+            return 0
+
+        written = 0
+        for start, end in _months(max(date_from or stored_from, stored_from), min(date_to or stored_to, stored_to)):
+            with connection.cursor() as cursor:
+                for table, unit in ROLLUPS.items():
+                    _recompute(
+                        cursor, table, unit, STORED_PERIODS.format(unit=unit), {'date_from': start, 'date_to': end})
+                    written += cursor.rowcount
+            connection.commit()
+            print(f"Rolled up {start:%Y-%m}")
+        return written
+    except:
+        connection.rollback()
+        raise
+    finally:
+        connection.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Weekly and monthly rollups of location_data")
+    commands = parser.add_subparsers(dest="command", required=True)
+    backfill_parser = commands.add_parser("backfill", help="Rebuild rollups from the stored days")
+    backfill_parser.add_argument(
+        "-df", "--date_from", type=_validate_date,
+        help="Start date in YYYY-MM-DD format (defaults to the first stored day)"
+    )
+    backfill_parser.add_argument(
+        "-dt", "--date_to", type=_validate_date,
+        help="End date in YYYY-MM-DD format (defaults to the last stored day)"
+    )
+    args = parser.parse_args()
+
+    print(f"Written {backfill(args.date_from, args.date_to)} rollup rows")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,42 @@
+import os
+import tempfile
+import unittest
+from datetime import date
+from decimal import Decimal
+
+from app.checkpoint import load_checkpoint, mark_frames
+
+LOCATION = (Decimal('83'), Decimal('55.5'))
+OTHER_LOCATION = (Decimal('84'), Decimal('55'))
+
+
+class TestCheckpoint(unittest.TestCase):
+  def setUp(self):
+    self.directory = tempfile.TemporaryDirectory()
+    self.addCleanup(self.directory.cleanup)
+    self.path = os.path.join(self.directory.name, 'checkpoint.txt')
+
+  def test_roundtrip(self):
+    mark_frames(self.path, [
+      ({'date': ['2025-01-01', '2025-01-02', '2025-01-05']}, *LOCATION),
+      ({'date': []}, *OTHER_LOCATION),
+    ])
+    mark_frames(self.path, [({'date': ['2025-01-10']}, *LOCATION)])
+
+    done = load_checkpoint(self.path, [LOCATION, OTHER_LOCATION], date(2025, 1, 2), date(2025, 1, 31))
+    self.assertEqual(done, {LOCATION: {date(2025, 1, 2), date(2025, 1, 5), date(2025, 1, 10)}})
+
+  def test_cut_line_is_ignored(self):
+    mark_frames(self.path, [({'date': ['2025-01-01']}, *LOCATION)])
+    with open(self.path, 'a') as checkpoint_file:
+      checkpoint_file.write('83 55.5 2025-01-02 2025-01')
+
+    done = load_checkpoint(self.path, [LOCATION], date(2025, 1, 1), date(2025, 1, 31))
+    self.assertEqual(done, {LOCATION: {date(2025, 1, 1)}})
+
+  def test_missing_file(self):
+    self.assertEqual(load_checkpoint(self.path, [LOCATION], date(2025, 1, 1), date(2025, 1, 31)), {})
+
+
+if __name__ == "__main__":
+  unittest.main()
@@ -0,0 +1,73 @@
+import os
+import tempfile
+import unittest
+from collections import defaultdict
+from datetime import date
+
+from app import day_cache
+from app.testing import make_dataframes
+from main import plan_fetch, process_cached
+
+CELL = (50.0, 80.0, 120.0)
+
+
+class TestDayCache(unittest.TestCase):
+  def setUp(self):
+    self.directory = tempfile.TemporaryDirectory()
+    day_cache.DAY_CACHE_PATH = os.path.join(self.directory.name, 'cache.sqlite')
+    day_cache._connection = None
+
+  def tearDown(self):
+    day_cache._connect().close()
+    day_cache._connection = None
+    self.directory.cleanup()
+
+  def test_round_trip(self):
+    daily_dataframe, hourly_dataframe = make_dataframes(days=3)
+    day_cache.store_days([(50, 80)], CELL, daily_dataframe, hourly_dataframe, 'Asia/Novosibirsk', 7 * 3600)
+
+    cached_dates, frames = day_cache.load_days(50, 80, date(2025, 6, 19), date(2025, 6, 25))
+    self.assertEqual(cached_dates, {date(2025, 6, 19), date(2025, 6, 20)})
+
+    cached_daily, cached_hourly, timezone_name, utc_offset_seconds = frames
+    self.assertEqual(timezone_name, 'Asia/Novosibirsk')
+    self.assertEqual(utc_offset_seconds, 7 * 3600)
+    self.assertTrue(cached_daily.equals(daily_dataframe.iloc[1:].reset_index(drop=True)))
+    self.assertTrue(cached_hourly.equals(hourly_dataframe.iloc[24:].reset_index(drop=True)))
+
+  def test_sites_share_cell(self):
+    daily_dataframe, hourly_dataframe = make_dataframes(days=3)
+    day_cache.store_days(
+      [(50, 80), (50.01, 80.01)], CELL, daily_dataframe, hourly_dataframe, 'Asia/Novosibirsk', 7 * 3600)
+
+    # the days of a cell are stored once
+    self.assertEqual(day_cache._connect().execute("SELECT COUNT(*) FROM cell_days").fetchone()[0], 3)
+    cached_dates, (cached_daily, _, _, _) = day_cache.load_days(50.01, 80.01, date(2025, 6, 18), date(2025, 6, 20))
+    self.assertEqual(cached_dates, {date(2025, 6, 18), date(2025, 6, 19), date(2025, 6, 20)})
+    self.assertTrue(cached_daily.equals(daily_dataframe))
+
+    # another timezone in the same cell cuts other local days
+    day_cache.store_days([(50.02, 80.02)], CELL, daily_dataframe, hourly_dataframe, 'Asia/Barnaul', 7 * 3600)
+    self.assertEqual(day_cache._connect().execute("SELECT COUNT(*) FROM cell_days").fetchone()[0], 6)
+
+  def test_fetch_plan_follows_loaded_days(self):
+    daily_dataframe, hourly_dataframe = make_dataframes(days=3)
+    day_cache.store_days([(50, 80)], CELL, daily_dataframe, hourly_dataframe, 'Asia/Novosibirsk', 7 * 3600)
+    # a day that expires after the run started is fetched, not skipped
+    day_cache._connect().execute("DELETE FROM cell_days WHERE date = '2025-06-19'")
+
+    plan = {(date(2025, 6, 18), date(2025, 6, 21)): [(50, 80)]}
+    loaded_dates = defaultdict(set)
+    [(_, frames)] = process_cached(plan, 10, None, with_facts=False, loaded_dates=loaded_dates)
+    self.assertEqual(frames[0][0]['date'], ['2025-06-18', '2025-06-20'])
+    self.assertEqual(plan_fetch(plan, loaded_dates), {
+      (date(2025, 6, 19), date(2025, 6, 19)): [(50, 80)],
+      (date(2025, 6, 21), date(2025, 6, 21)): [(50, 80)],
+    })
+
+  def test_unknown_location(self):
+    self.assertEqual(day_cache.load_days(1, 2, date(2025, 6, 18), date(2025, 6, 20)), (set(), None))
+
+
+if __name__ == "__main__":
+  unittest.main()
@@ -0,0 +1,64 @@
+import csv
+import json
+import os
+import tempfile
+import unittest
+
+from app.export import CsvWriter, NdjsonWriter
+from app.open_meteo_data_transform import transform_dataframes
+from app.testing import make_dataframes
+
+
+def reject_constant(name):
+  raise ValueError(f"{name} is not valid JSON")
+
+
+def polar_night_columns():
+  """Export columns of a day with sunrise == sunset, it has no daylight hours to average."""
+  daily_dataframe, hourly_dataframe = make_dataframes(days=1)
+  daily_dataframe['sunset'] = daily_dataframe['sunrise']
+  return transform_dataframes(daily_dataframe, hourly_dataframe, 7 * 3600).to_columns()
+
+
+class TestExport(unittest.TestCase):
+  def setUp(self):
+    self.directory = tempfile.TemporaryDirectory()
+    self.addCleanup(self.directory.cleanup)
+
+  def test_ndjson_polar_night(self):
+    path = os.path.join(self.directory.name, 'result.ndjson')
+    writer = NdjsonWriter(path)
+    writer.write(polar_night_columns(), 83, 55)
+    writer.close()
+
+    with open(path) as ndjson_file:
+      [row] = [json.loads(line, parse_constant=reject_constant) for line in ndjson_file]
+    self.assertIsNone(row['avg_temperature_2m_daylight'])
+    self.assertEqual(row['avg_temperature_2m_24h'], 11.5)
+    self.assertEqual(row['total_rain_daylight'], 0)
+    self.assertEqual(row['temperature_2m_celsius'], list(range(24)))
+
+  def test_csv_polar_night(self):
+    path = os.path.join(self.directory.name, 'result.csv')
+    writer = CsvWriter(path)
+    writer.write(polar_night_columns(), 83, 55)
+    writer.close()
+
+    with open(path, newline='') as csv_file:
+      [row] = list(csv.DictReader(csv_file))
+    self.assertEqual(row['avg_temperature_2m_daylight'], '')
+    self.assertEqual(row['avg_temperature_2m_24h'], '11.5')
+
+  def test_nan_in_series(self):
+    path = os.path.join(self.directory.name, 'result.csv')
+    writer = CsvWriter(path)
+    writer.write({'date': ['2025-06-18'], 'visibility_m': [[1.5, float('nan'), 2.0]]}, 83, 55)
+    writer.close()
+
+    with open(path, newline='') as csv_file:
+      [row] = list(csv.DictReader(csv_file))
+    self.assertEqual(json.loads(row['visibility_m'], parse_constant=reject_constant), [1.5, None, 2.0])
+
+
+if __name__ == "__main__":
+  unittest.main()
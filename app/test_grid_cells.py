@@ -0,0 +1,61 @@
+import unittest
+from datetime import date
+from unittest.mock import patch
+
+import numpy as np
+
+from app.grid_cells import coalesce, learn_cells
+from app.testing import make_responses
+from app.ingest import make_params, process_responses
+
+
+class TestGridCells(unittest.TestCase):
+  def test_coalesce(self):
+    novosibirsk = ('Asia/Novosibirsk', 25200)
+    cells = {
+      (83.01, 55.01): (83.0, 55.0, 150.0, *novosibirsk),
+      (83.02, 55.02): (83.0, 55.0, 150.0, *novosibirsk),
+      (83.03, 55.03): (83.0, 55.0, 180.0, *novosibirsk),
+      (83.04, 55.04): (83.0, 55.0, 150.0, 'Asia/Barnaul', 25200),
+      (84.01, 55.01): (84.0, 55.0, 150.0, *novosibirsk),
+      (84.02, 55.01): (84.0, 55.0, 150.0, *novosibirsk),
+    }
+    locations = [
+      (83.01, 55.01), (84.01, 55.01), (83.02, 55.02), (90, 50), (83.03, 55.03), (84.02, 55.01), (83.04, 55.04)
+    ]
+
+    representatives, fan_out = coalesce(locations, cells)
+    # the same cell at another elevation or in another timezone gets other data
+    self.assertEqual(representatives, [(83.01, 55.01), (84.01, 55.01), (90, 50), (83.03, 55.03), (83.04, 55.04)])
+    self.assertEqual(fan_out, {
+      (83.01, 55.01): [(83.01, 55.01), (83.02, 55.02)],
+      (84.01, 55.01): [(84.01, 55.01), (84.02, 55.01)],
+    })
+
+  def test_learn_cells(self):
+    locations = [(83.01, 55.01), (84.5, 53.25)]
+    params = make_params(locations, date(2025, 6, 18), date(2025, 6, 20))
+    cells = learn_cells(params, make_responses(locations))
+    self.assertEqual(list(cells), locations)
+    self.assertEqual(cells[(84.5, 53.25)], (84.5, 53.25, 0.0, 'Asia/Novosibirsk', 25200))
+
+  @patch('app.day_cache.store_days')
+  def test_fan_out(self, store_days):
+    params = make_params([(83, 55)], date(2025, 6, 18), date(2025, 6, 20))
+    records, frames = process_responses(
+      params, make_responses([(83, 55)]), with_facts=False, fan_out={(83, 55): [(83, 55), (83.01, 55.01)]})
+
+    # the cell is cached once for every site
+    [call] = store_days.call_args_list
+    self.assertEqual(call.args[:2], ([(83, 55), (83.01, 55.01)], (83.0, 55.0, 0.0)))
+    self.assertEqual([(longitude, latitude) for _, longitude, latitude in frames], [(83, 55), (83.01, 55.01)])
+    self.assertEqual(len(records), 6)
+    self.assertEqual(
+      [record['data'] for record in records if record['longitude'] == 83],
+      [record['data'] for record in records if record['longitude'] == 83.01]
+    )
+    np.testing.assert_array_equal(frames[0][0]['date'], frames[1][0]['date'])
+
+
+if __name__ == "__main__":
+  unittest.main()
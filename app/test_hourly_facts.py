@@ -0,0 +1,63 @@
+import struct
+import unittest
+
+import numpy as np
+
+from app.hourly_facts import _numeric, fact_rows, to_frames
+from app.open_meteo_data_transform import transform_dataframes
+from app.testing import DAY_START, make_dataframes
+
+
+def read_rows(longitude, latitude, rows):
+  """Binary COPY tuples as READ_SQL returns them, arrays are sent in the same format they are copied."""
+  read = []
+  for row in rows:
+    fields, position = [], 2
+    while position < len(row):
+      (length,) = struct.unpack_from('!i', row, position)
+      fields.append(None if length < 0 else row[position + 4:position + 4 + length])
+      position += 4 + max(length, 0)
+    _, _, _, timezone, utc_offset, interval_seconds, day_start, sunrise, sunset, daylight_duration, *arrays = fields
+    read.append((
+      longitude, latitude, timezone and timezone.decode(),
+      *(struct.unpack('!i', field)[0] for field in (utc_offset, interval_seconds)),
+      *(struct.unpack('!q', field)[0] for field in (day_start, sunrise, sunset)),
+      struct.unpack('!f', daylight_duration)[0],
+      *arrays,
+    ))
+  return read
+
+
+class TestHourlyFacts(unittest.TestCase):
+  def test_numeric(self):
+    # ndigits, weight, sign, dscale and base 10000 digits of numeric_send
+    self.assertEqual(_numeric(83.1234), struct.pack('!hhhhhh', 2, 0, 0, 4, 83, 1234))
+    self.assertEqual(_numeric(-0.5), struct.pack('!hhhhh', 1, -1, 0x4000, 4, 5000))
+    self.assertEqual(_numeric(179.99999), struct.pack('!hhhhhh', 2, 0, 0, 4, 180, 0))
+
+  def test_roundtrip(self):
+    daily_dataframe, hourly_dataframe = make_dataframes(days=3, day_starts=DAY_START + np.array([0, 86400, 2 * 86400]))
+    hourly_dataframe['weather_code'] = hourly_dataframe['weather_code'].astype(np.int64)
+    rows = fact_rows(83, 55, daily_dataframe, hourly_dataframe, 'Asia/Novosibirsk', 7 * 3600)
+    self.assertEqual(len(rows), 3)
+
+    [(longitude, latitude, daily_frame, hourly_frame, timezone_name, utc_offset_seconds)] = to_frames(
+      read_rows(83, 55, rows))
+    self.assertEqual((longitude, latitude, timezone_name, utc_offset_seconds), (83, 55, 'Asia/Novosibirsk', 25200))
+    self.assertEqual(
+      transform_dataframes(daily_frame, hourly_frame, utc_offset_seconds),
+      transform_dataframes(daily_dataframe, hourly_dataframe, 7 * 3600)
+    )
+
+  def test_roundtrip_dst_day(self):
+    daily_dataframe, hourly_dataframe = make_dataframes(day_starts=DAY_START + np.array([0, 86400 + 3600]))
+    rows = fact_rows(83, 55, daily_dataframe, hourly_dataframe, None, 7 * 3600)
+
+    [(_, _, _, hourly_frame, timezone_name, _)] = to_frames(read_rows(83, 55, rows))
+    self.assertIsNone(timezone_name)
+    self.assertEqual(len(hourly_frame), 49)
+    self.assertTrue((hourly_frame['date'].to_numpy() == hourly_dataframe['date'].to_numpy()).all())
+
+
+if __name__ == "__main__":
+  unittest.main()
@@ -0,0 +1,41 @@
+import json
+import os
+import tempfile
+import unittest
+
+from app import metrics
+
+
+class TestMetrics(unittest.TestCase):
+  def setUp(self):
+    metrics._stages.clear()
+    metrics._counters.clear()
+
+  def test_stage_and_counters(self):
+    for _ in range(2):
+      with metrics.stage('transform'):
+        pass
+    metrics.increment('rows_inserted', 5)
+    metrics.increment('rows_inserted')
+
+    res = metrics.snapshot()
+    self.assertEqual(res['stages']['transform']['calls'], 2)
+    self.assertGreaterEqual(res['stages']['transform']['wall_seconds'], 0)
+    self.assertEqual(res['counters'], {'rows_inserted': 6})
+
+  def test_write_metrics(self):
+    with metrics.stage('save'):
+      metrics.increment('rows_skipped', 3)
+
+    with tempfile.TemporaryDirectory() as directory:
+      path = os.path.join(directory, 'metrics.json')
+      metrics.write_metrics(path)
+      with open(path) as metrics_file:
+        self.assertEqual(json.load(metrics_file)['counters'], {'rows_skipped': 3})
+
+      path = os.path.join(directory, 'metrics.prom')
+      metrics.write_metrics(path, 'prometheus')
+      with open(path) as metrics_file:
+        lines = metrics_file.read().splitlines()
+      self.assertIn('weather_stats_stage_calls_total{stage="save"} 1', lines)
+      self.assertIn('weather_stats_rows_skipped_total 3', lines)
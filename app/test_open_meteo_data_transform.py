@@ -0,0 +1,94 @@
+import json
+import unittest
+
+import numpy as np
+
+from app.open_meteo_data_transform import DailyStats, transform_dataframes
+from app.testing import DAY_START, make_dataframes
+
+
+class TestTransformDataframes(unittest.TestCase):
+  def test_day_stats(self):
+    daily_dataframe, hourly_dataframe = make_dataframes()
+    result = transform_dataframes(daily_dataframe, hourly_dataframe, 7 * 3600)
+
+    self.assertEqual([row['date'] for row in result], ['2025-06-18', '2025-06-19'])
+    data = result[1]['data']
+    self.assertEqual(data.avg_temperature_2m_24h, 11.5)
+    self.assertEqual(data.avg_temperature_2m_daylight, 11.5)
+    self.assertEqual(data.total_rain_24h, 276)
+    self.assertEqual(data.total_rain_daylight, 138)
+    self.assertEqual(data.temperature_2m_celsius, list(range(24)))
+    self.assertEqual(data.daylight_hours, 12.0)
+    self.assertEqual(data.sunrise_iso, '2025-06-18T23:00:00Z')
+    self.assertEqual(data.sunset_iso, '2025-06-19T11:00:00Z')
+
+  def test_polar_night(self):
+    daily_dataframe, hourly_dataframe = make_dataframes(days=1)
+    daily_dataframe['sunset'] = daily_dataframe['sunrise']
+    data = transform_dataframes(daily_dataframe, hourly_dataframe)[0]['data']
+
+    self.assertTrue(np.isnan(data.avg_temperature_2m_daylight))
+    self.assertEqual(data.total_rain_daylight, 0)
+
+  def test_wind_speed_m_per_s(self):
+    daily_dataframe, hourly_dataframe = make_dataframes(days=1)
+    hourly_dataframe['wind_speed_10m'] = np.arange(24) * 3.6
+    hourly_dataframe['wind_speed_80m'] = np.arange(24) + 10.0
+    data = transform_dataframes(daily_dataframe, hourly_dataframe, 7 * 3600)[0]['data']
+
+    # each height is converted from its own km/h series
+    self.assertEqual(data.wind_speed_10m_m_per_s, list(range(24)))
+    self.assertEqual(data.wind_speed_80m_m_per_s[:3], [2.78, 3.06, 3.33])
+    self.assertEqual(data.wind_speed_80m_m_per_s, [round(kmh / 3.6, 2) for kmh in range(10, 34)])
+
+  def test_wrong_number_of_rows(self):
+    daily_dataframe, hourly_dataframe = make_dataframes()
+    with self.assertRaises(Exception):
+      transform_dataframes(daily_dataframe, hourly_dataframe.drop(index=5))
+
+  def test_minutely_15(self):
+    result = transform_dataframes(*make_dataframes(rows_per_hour=4), 7 * 3600)
+
+    data = result[1]['data']
+    self.assertEqual(data.avg_temperature_2m_24h, 11.5)
+    self.assertEqual(data.total_rain_24h, 276 * 4)
+    self.assertEqual(data.total_rain_daylight, 138 * 4)
+    self.assertEqual(data.temperature_2m_celsius, [hour for hour in range(24) for _ in range(4)])
+
+  def test_dst_days(self):
+    # 23 hours from the first local midnight to the second one, 25 hours to the third one
+    day_starts = DAY_START + np.array([0, 23, 48]) * 3600
+    result = transform_dataframes(*make_dataframes(day_starts=day_starts), 7 * 3600)
+
+    self.assertEqual([len(row['data'].rain_mm) for row in result], [23, 25, 24])
+    self.assertEqual(result[0]['data'].total_rain_24h, sum(range(23)))
+    self.assertEqual(result[1]['data'].rain_mm, [23, *range(24)])
+    self.assertEqual(result.to_json(), [json.dumps(row['data']._asdict()) for row in result])
+
+
+class TestDailyStats(unittest.TestCase):
+  def setUp(self):
+    self.stats = transform_dataframes(*make_dataframes(days=3), 7 * 3600)
+
+  def test_to_json_matches_rows(self):
+    self.assertEqual(
+      self.stats.to_json(),
+      [json.dumps(row['data']._asdict()) for row in self.stats]
+    )
+
+  def test_to_columns(self):
+    columns = self.stats.to_columns()
+    self.assertEqual(columns['date'], ['2025-06-18', '2025-06-19', '2025-06-20'])
+    self.assertEqual(columns['total_rain_24h'], [276, 276, 276])
+    self.assertEqual(columns['rain_mm'][2], list(range(24)))
+
+  def test_concatenate(self):
+    parts = [transform_dataframes(*make_dataframes(days=1)) for _ in range(2)]
+    stats = DailyStats.concatenate(parts)
+    self.assertEqual(len(stats), 2)
+    self.assertEqual(stats[1], parts[1][0])
+
+
+if __name__ == "__main__":
+  unittest.main()
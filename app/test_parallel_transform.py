@@ -0,0 +1,40 @@
+import unittest
+
+import numpy as np
+from unittest.mock import patch
+
+from app import parallel_transform
+from app.open_meteo_data_transform import transform_dataframes
+from app.testing import DAY_START, make_dataframes
+
+
+class TestTransformMany(unittest.TestCase):
+  def tearDown(self):
+    parallel_transform.shutdown_pool()
+
+  def test_same_as_serial(self):
+    expected = [
+      transform_dataframes(*make_dataframes(days=5), 7 * 3600),
+      transform_dataframes(*make_dataframes(days=2), 0),
+    ]
+
+    parallel_transform.start_pool(2)
+    with patch.object(parallel_transform, 'SHARD_DAYS', 2):
+      res = parallel_transform.transform_many([
+        (*make_dataframes(days=5), 7 * 3600),
+        (*make_dataframes(days=2), 0),
+      ])
+    self.assertEqual(res, expected)
+
+  def test_without_pool(self):
+    res = parallel_transform.transform_many([(*make_dataframes(), 0)])
+    self.assertEqual(res, [transform_dataframes(*make_dataframes(), 0)])
+
+  def test_dst_day_at_shard_end(self):
+    day_starts = DAY_START + np.array([0, 23, 47, 71]) * 3600
+    expected = [transform_dataframes(*make_dataframes(day_starts=day_starts), 7 * 3600)]
+
+    parallel_transform.start_pool(2)
+    with patch.object(parallel_transform, 'SHARD_DAYS', 1):
+      res = parallel_transform.transform_many([(*make_dataframes(day_starts=day_starts), 7 * 3600)])
+    self.assertEqual(res, expected)
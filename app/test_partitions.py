@@ -0,0 +1,10 @@
+import unittest
+from datetime import date
+
+from app.partitions import partition_month
+
+
+class TestPartitions(unittest.TestCase):
+  def test_partition_month(self):
+    self.assertEqual(partition_month('location_data_p2025_01'), date(2025, 1, 1))
+    self.assertEqual(partition_month('location_data_p2024_12'), date(2024, 12, 1))
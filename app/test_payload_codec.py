@@ -0,0 +1,73 @@
+import json
+import math
+import unittest
+
+import numpy as np
+
+from app.open_meteo_data_transform import MPS_SERIES, SERIES_FIELDS, WeatherStatsNamedTuple, transform_dataframes
+from app.payload_codec import FLOAT_KIND, HEADER, decode_rows, decode_series, encode, encode_series
+from app.testing import DAY_START, make_dataframes
+
+
+def make_stats(day_starts=DAY_START + np.array([0, 86400 + 3600, 2 * 86400 + 3600])):
+  daily_dataframe, hourly_dataframe = make_dataframes(day_starts=day_starts)
+  hourly_dataframe['wind_speed_10m'] = np.linspace(0, 100, len(hourly_dataframe))
+  return transform_dataframes(daily_dataframe, hourly_dataframe, 7 * 3600)
+
+
+class TestPayloadCodec(unittest.TestCase):
+  def test_roundtrip(self):
+    # a 25 hour day between two 24 hour ones
+    stats = make_stats()
+    documents, series = encode(stats, 'packed')
+
+    # only the scalars stay in data
+    self.assertEqual(
+      list(json.loads(documents[0])),
+      [field for field in WeatherStatsNamedTuple._fields if field not in SERIES_FIELDS]
+    )
+    self.assertEqual(
+      decode_rows([json.loads(document) for document in documents], series),
+      [json.loads(document) for document in stats.to_json()]
+    )
+
+  def test_narrow_deltas(self):
+    [payload] = encode_series({field: np.arange(24) for field in SERIES_FIELDS}, np.array([0, 24]))
+    _, _, *kinds = HEADER.unpack(payload[:HEADER.size])
+    self.assertEqual(kinds, [1] * len(SERIES_FIELDS))
+    # wind speeds are stored in hundredths
+    self.assertEqual(decode_series([payload])[0][next(iter(MPS_SERIES))], list(map(float, range(24))))
+
+    [payload] = encode_series({field: np.arange(24) * 1000 for field in SERIES_FIELDS}, np.array([0, 24]))
+    _, _, *kinds = HEADER.unpack(payload[:HEADER.size])
+    self.assertEqual(kinds, [4] * len(MPS_SERIES) + [2] * (len(SERIES_FIELDS) - len(MPS_SERIES)))
+
+  def test_nan_is_stored_as_float(self):
+    stats = make_stats(DAY_START + np.array([0]))
+    field = next(iter(MPS_SERIES))
+    stats.columns[field][3] = np.nan
+    [document], [payload] = encode(stats, 'packed')
+
+    self.assertEqual(HEADER.unpack(payload[:HEADER.size])[2], FLOAT_KIND)
+    [decoded] = decode_rows([json.loads(document)], [payload])
+    self.assertTrue(math.isnan(decoded[field][3]))
+    self.assertEqual(decoded[field][4], stats.columns[field][4])
+
+  def test_layouts_are_mixed(self):
+    stats = make_stats()
+    json_documents, json_series = encode(stats, 'json')
+    packed_documents, packed_series = encode(stats, 'packed')
+    self.assertEqual(json_series, [None] * 3)
+
+    documents = [json.loads(json_documents[0]), json.loads(packed_documents[1]), None]
+    decoded = decode_rows(documents, [json_series[0], packed_series[1], None])
+    self.assertEqual(decoded[:2], [json.loads(document) for document in stats.to_json()[:2]])
+    self.assertIsNone(decoded[2])
+
+  def test_unknown_codec(self):
+    with self.assertRaisesRegex(ValueError, 'Unknown payload codec'):
+      encode(make_stats(), 'msgpack')
+
+
+if __name__ == "__main__":
+  unittest.main()
@@ -0,0 +1,74 @@
+import threading
+import time
+import unittest
+
+from app.pipeline import QUEUE_SIZE, run_pipeline
+
+
+class TestPipeline(unittest.TestCase):
+  def test_all_items_pass_all_stages(self):
+    results = []
+    lock = threading.Lock()
+
+    def collect(item):
+      with lock:
+        results.append(item)
+
+    run_pipeline(range(100), [
+      ('double', lambda item: item * 2, 4),
+      ('increment', lambda item: item + 1, 2),
+      ('collect', collect, 1),
+    ])
+    self.assertEqual(sorted(results), [item * 2 + 1 for item in range(100)])
+
+  def test_stages_overlap(self):
+    def slow(item):
+      time.sleep(0.05)
+      return item
+
+    started_at = time.perf_counter()
+    run_pipeline(range(10), [('first', slow, 1), ('second', slow, 1)])
+    # One after another the stages would take 1 second
+    self.assertLess(time.perf_counter() - started_at, 0.8)
+
+  def test_backpressure(self):
+    consumed = []
+    release = threading.Event()
+
+    def items():
+      for item in range(100):
+        consumed.append(item)
+        yield item
+
+    def blocked(item):
+      release.wait()
+
+    thread = threading.Thread(target=run_pipeline, args=(items(), [('blocked', blocked, 1)]))
+    thread.start()
+    time.sleep(0.3)
+    # The item being processed, the queue and the item waiting for a free slot
+    self.assertLessEqual(len(consumed), QUEUE_SIZE + 2)
+    release.set()
+    thread.join()
+    self.assertEqual(len(consumed), 100)
+
+  def test_error_stops_pipeline(self):
+    consumed = []
+
+    def items():
+      for item in range(1000):
+        consumed.append(item)
+        yield item
+
+    def fail(item):
+      if item == 3:
+        raise ValueError('Failed')
+      return item
+
+    with self.assertRaisesRegex(ValueError, 'Failed'):
+      run_pipeline(items(), [('fail', fail, 2), ('next', lambda item: item, 1)])
+    self.assertLess(len(consumed), 1000)
+
+
+if __name__ == "__main__":
+  unittest.main()
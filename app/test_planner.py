@@ -0,0 +1,60 @@
+import unittest
+from datetime import date
+
+from app.planner import endpoint_ranges, missing_ranges, plan_requests, split_range
+
+
+class TestPlanner(unittest.TestCase):
+  def test_missing_ranges(self):
+    stored = {date(2025, 1, 1), date(2025, 1, 4), date(2025, 1, 5)}
+    res = missing_ranges(date(2025, 1, 1), date(2025, 1, 8), stored)
+    self.assertEqual(res, [
+      (date(2025, 1, 2), date(2025, 1, 3)),
+      (date(2025, 1, 6), date(2025, 1, 8)),
+    ])
+
+  def test_nothing_missing(self):
+    stored = {date(2025, 1, 1), date(2025, 1, 2)}
+    self.assertEqual(missing_ranges(date(2025, 1, 1), date(2025, 1, 2), stored), [])
+
+  def test_split_range(self):
+    res = split_range(date(2025, 1, 1), date(2025, 1, 8), 3)
+    self.assertEqual(res, [
+      (date(2025, 1, 1), date(2025, 1, 3)),
+      (date(2025, 1, 4), date(2025, 1, 6)),
+      (date(2025, 1, 7), date(2025, 1, 8)),
+    ])
+    self.assertEqual(split_range(date(2025, 1, 1), date(2025, 1, 8), None), [(date(2025, 1, 1), date(2025, 1, 8))])
+
+  def test_plan_requests_groups_locations(self):
+    first, second, third = (50, 80), (51, 81), (52, 82)
+    stored = {
+      first: {date(2025, 1, 2)},
+      third: {date(2025, 1, 1), date(2025, 1, 2), date(2025, 1, 3)},
+    }
+    res = plan_requests([first, second, third], date(2025, 1, 1), date(2025, 1, 3), stored)
+    self.assertEqual(res, {
+      (date(2025, 1, 1), date(2025, 1, 1)): [first],
+      (date(2025, 1, 3), date(2025, 1, 3)): [first],
+      (date(2025, 1, 1), date(2025, 1, 3)): [second],
+    })
+
+  def test_endpoint_ranges(self):
+    res = endpoint_ranges(date(2024, 1, 1), date(2025, 1, 10), date(2024, 12, 20), 200)
+    self.assertEqual(res, [
+      ('archive', date(2024, 1, 1), date(2024, 7, 18)),
+      ('archive', date(2024, 7, 19), date(2024, 12, 19)),
+      ('forecast', date(2024, 12, 20), date(2025, 1, 10)),
+    ])
+    self.assertEqual(
+      endpoint_ranges(date(2025, 1, 1), date(2025, 1, 10), date(2024, 12, 20), None),
+      [('forecast', date(2025, 1, 1), date(2025, 1, 10))]
+    )
+    self.assertEqual(
+      endpoint_ranges(date(2020, 1, 1), date(2020, 1, 10), date(2024, 12, 20), 200),
+      [('archive', date(2020, 1, 1), date(2020, 1, 10))]
+    )
+
+
+if __name__ == "__main__":
+  unittest.main()
@@ -0,0 +1,92 @@
+import json
+import threading
+import unittest
+from datetime import date
+from decimal import Decimal
+from http.server import ThreadingHTTPServer
+from unittest.mock import patch
+from urllib.error import HTTPError
+from urllib.request import urlopen
+
+from sqlalchemy.exc import OperationalError
+
+from app.query_service import ResultCache, make_handler, to_columns
+
+LOCATION = (Decimal('83.0000'), Decimal('55.0000'))
+OTHER_LOCATION = (Decimal('84.0000'), Decimal('55.0000'))
+
+
+class TestResultCache(unittest.TestCase):
+  def test_lru_eviction(self):
+    cache = ResultCache(max_bytes=10)
+    cache.put((*LOCATION, 1), b'aaaa', 0)
+    cache.put((*LOCATION, 2), b'bbbb', 0)
+    cache.get((*LOCATION, 1))
+    cache.put((*LOCATION, 3), b'cccc', 0)
+
+    self.assertEqual(cache.get((*LOCATION, 1)), b'aaaa')
+    self.assertIsNone(cache.get((*LOCATION, 2)))
+    self.assertEqual(cache.get((*LOCATION, 3)), b'cccc')
+    self.assertEqual(cache.size, 8)
+
+  def test_invalidate(self):
+    cache = ResultCache()
+    cache.put((*LOCATION, 1), b'a', 0)
+    cache.put((*OTHER_LOCATION, 1), b'b', 0)
+    cache.invalidate(LOCATION)
+
+    self.assertIsNone(cache.get((*LOCATION, 1)))
+    self.assertEqual(cache.get((*OTHER_LOCATION, 1)), b'b')
+
+  def test_stale_result_is_not_cached(self):
+    cache = ResultCache()
+    generation = cache.generation(LOCATION)
+    cache.invalidate(LOCATION)
+    cache.put((*LOCATION, 1), b'a', generation)
+
+    self.assertIsNone(cache.get((*LOCATION, 1)))
+
+  def test_result_queried_before_clear_is_not_cached(self):
+    # a location without cached entries still drops results queried before the clear
+    cache = ResultCache()
+    generation = cache.generation(LOCATION)
+    cache.clear()
+    cache.put((*LOCATION, 1), b'a', generation)
+
+    self.assertIsNone(cache.get((*LOCATION, 1)))
+    cache.put((*LOCATION, 1), b'a', cache.generation(LOCATION))
+    self.assertEqual(cache.get((*LOCATION, 1)), b'a')
+
+
+class TestDailyHandler(unittest.TestCase):
+  def setUp(self):
+    self.server = ThreadingHTTPServer(('127.0.0.1', 0), make_handler(ResultCache()))
+    threading.Thread(target=self.server.serve_forever, daemon=True).start()
+    self.addCleanup(self.server.server_close)
+    self.addCleanup(self.server.shutdown)
+
+  @patch('app.query_service.query_daily', side_effect=OperationalError('SELECT', {}, Exception('connection refused')))
+  def test_db_error(self, query_daily):
+    url = f"http://127.0.0.1:{self.server.server_port}/daily?lon=83&lat=55&date_from=2025-01-01&date_to=2025-01-31"
+    with self.assertRaises(HTTPError) as raised, patch('builtins.print'):
+      urlopen(url)
+
+    self.assertEqual(raised.exception.code, 500)
+    self.assertEqual(json.loads(raised.exception.read()), {'error': 'Query failed'})
+    raised.exception.close()
+
+
+class TestToColumns(unittest.TestCase):
+  def test_columns(self):
+    rows = [
+      (date(2025, 1, 1), 'Asia/Novosibirsk', {'avg': 1.5, 'hours': [1, 2]}),
+      (date(2025, 1, 2), 'Asia/Novosibirsk', None),
+    ]
+    self.assertEqual(to_columns(*LOCATION, rows), {
+      'longitude': 83.0,
+      'latitude': 55.0,
+      'timezone': 'Asia/Novosibirsk',
+      'date': ['2025-01-01', '2025-01-02'],
+      'avg': [1.5, None],
+      'hours': [[1, 2], None],
+    })
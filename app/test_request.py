@@ -0,0 +1,108 @@
+import unittest
+from datetime import date
+from unittest.mock import Mock, patch
+
+import numpy as np
+import pandas as pd
+from openmeteo_sdk.Unit import Unit
+
+from app import request
+from app.open_meteo_data_transform import DailyStats, transform_dataframes
+from app.request import combine_dataframes, fetch_range, stitch_frames, transform_units
+from benchmarks.synthetic import make_response
+from app.ingest import make_params
+from app.testing import make_payload
+
+
+def fake_request(params, timeout=None, endpoint='forecast'):
+  days = (params['end_date'] - params['start_date']).days + 1
+  return [
+    make_response(params['start_date'], days, longitude, latitude)
+    for longitude, latitude in zip(params['longitude'], params['latitude'])
+  ]
+
+
+class TestTransformUnits(unittest.TestCase):
+  def test_wmo_code(self):
+    self.assertEqual(transform_units(Unit.wmo_code, np.array([0, 61], dtype=np.float32)).tolist(), [0, 61])
+    with self.assertRaises(ValueError):
+      transform_units(Unit.wmo_code, np.array([0, np.nan], dtype=np.float32))
+
+
+class TestMakeRequest(unittest.TestCase):
+  @patch('app.request.archive_payload')
+  @patch('app.request.get_session')
+  def test_payload_is_archived_as_sent(self, get_session, archive_payload):
+    locations = [(83, 55), (84.5, 53.25)]
+    params = make_params(locations, date(2025, 6, 18), date(2025, 6, 20))
+    payload = make_payload(locations)
+    get_session.return_value.get.return_value = Mock(status_code=200, content=payload)
+
+    responses = request.make_request(params)
+
+    self.assertEqual([response.Longitude() for response in responses], [83, 84.5])
+    archive_payload.assert_called_once_with(params, payload)
+    self.assertEqual(get_session.return_value.get.call_args.kwargs['params']['format'], 'flatbuffers')
+    self.assertNotIn('format', params)
+
+
+class TestCombineDataframes(unittest.TestCase):
+  def test_daily_dates_across_dst(self):
+    # Europe/Berlin moves to summer time on 2025-03-30, that day has 23 hours
+    params = make_params([(13.4, 52.5)], date(2025, 3, 29), date(2025, 3, 31))
+    response = make_response(
+      date(2025, 3, 29), 3, 13.4, 52.5, utc_offset_seconds=3600, timezone_name='Europe/Berlin')
+    daily_dataframe, hourly_dataframe, timezone_name, _, _ = combine_dataframes(response, params)
+
+    self.assertEqual(timezone_name, 'Europe/Berlin')
+    self.assertEqual(
+      list(daily_dataframe['date']),
+      list(pd.to_datetime(['2025-03-28 23:00', '2025-03-29 23:00', '2025-03-30 22:00'], utc=True))
+    )
+    stats = transform_dataframes(daily_dataframe, hourly_dataframe, response.UtcOffsetSeconds())
+    self.assertEqual([row['date'] for row in stats], ['2025-03-29', '2025-03-30', '2025-03-31'])
+    self.assertEqual([len(row['data'].rain_mm) for row in stats], [24, 23, 25])
+
+
+class TestFetchRange(unittest.TestCase):
+  @patch('app.request.make_request', side_effect=fake_request)
+  def test_parts_are_stitched(self, make_request):
+    params = make_params([(83, 55)], date(2024, 12, 1), date(2026, 3, 1))
+    with patch.object(request, 'API_CHUNK_DAYS', 200):
+      parts = fetch_range(params, today=date(2026, 3, 2))
+
+    # the last FORECAST_PAST_DAYS days come from the forecast endpoint
+    self.assertEqual(
+      [(part_params['start_date'], part_params['end_date']) for part_params, _ in parts],
+      [
+        (date(2024, 12, 1), date(2025, 6, 18)),
+        (date(2025, 6, 19), date(2025, 11, 29)),
+        (date(2025, 11, 30), date(2026, 3, 1)),
+      ]
+    )
+    self.assertEqual(
+      sorted(call.args[2] for call in make_request.call_args_list), ['archive', 'archive', 'forecast'])
+
+    frames = []
+    for part_params, responses in parts:
+      daily_dataframe, hourly_dataframe, timezone_name, _, _ = combine_dataframes(responses[0], part_params)
+      frames.append((daily_dataframe, hourly_dataframe, timezone_name, responses[0].UtcOffsetSeconds()))
+    daily_dataframe, hourly_dataframe, _, utc_offset_seconds = stitch_frames(frames)
+
+    self.assertTrue(np.all(np.diff(hourly_dataframe['date'].to_numpy()) == np.timedelta64(3600, 's')))
+    stats = transform_dataframes(daily_dataframe, hourly_dataframe, utc_offset_seconds)
+    self.assertEqual(len(stats), 456)
+    self.assertEqual(stats, DailyStats.concatenate([
+      transform_dataframes(daily.copy(), hourly.copy(), offset) for daily, hourly, _, offset in frames
+    ]))
+
+  @patch('app.request.make_request', side_effect=fake_request)
+  def test_short_range_is_one_request(self, make_request):
+    params = make_params([(83, 55)], date(2026, 2, 1), date(2026, 2, 3))
+    [(part_params, responses)] = fetch_range(params, today=date(2026, 3, 2))
+    self.assertEqual(part_params, params)
+    self.assertEqual(make_request.call_args.args[2], 'forecast')
+
+
+if __name__ == "__main__":
+  unittest.main()
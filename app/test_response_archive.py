@@ -0,0 +1,124 @@
+import os
+import tempfile
+import unittest
+from argparse import Namespace
+from datetime import date
+from unittest.mock import patch
+
+from app import response_archive
+from app.ingest import make_params
+from app.testing import make_payload, make_responses
+from main import run
+
+
+class TestResponseArchive(unittest.TestCase):
+  def setUp(self):
+    self.directory = tempfile.TemporaryDirectory()
+    patcher = patch.object(response_archive, 'RESPONSE_ARCHIVE_PATH', self.directory.name)
+    patcher.start()
+    self.addCleanup(patcher.stop)
+    response_archive._owner_pid = None
+    response_archive._mapped.clear()
+
+  def tearDown(self):
+    response_archive._connection.close()
+    response_archive._segment[1].close()
+    response_archive._owner_pid = None
+    response_archive._mapped.clear()
+    self.directory.cleanup()
+
+  def test_replay(self):
+    locations = [(83, 55), (84.5, 53.25)]
+    params = make_params(locations, date(2025, 6, 18), date(2025, 6, 20))
+    response_archive.archive_payload(params, make_payload(locations))
+
+    replayed = list(response_archive.replay(
+      [(84.5, 53.25)], date(2025, 6, 1), date(2025, 6, 30), params))
+    self.assertEqual(len(replayed), 1)
+    location, (first, last), response = replayed[0]
+    self.assertEqual(location, (84.5, 53.25))
+    self.assertEqual((first, last), (date(2025, 6, 18), date(2025, 6, 20)))
+    self.assertEqual(response.Longitude(), 84.5)
+    self.assertEqual(
+      response.Hourly().Variables(0).ValuesAsNumpy().tolist(),
+      make_responses(locations)[1].Hourly().Variables(0).ValuesAsNumpy().tolist()
+    )
+
+  def test_replay_overlapping_ranges(self):
+    params = make_params([(83, 55)], date(2025, 6, 18), date(2025, 6, 20))
+    response_archive.archive_payload(params, make_payload([(83, 55)]))
+    response_archive.archive_payload(params, make_payload([(83, 55)]))
+    later_params = make_params([(83, 55)], date(2025, 6, 19), date(2025, 6, 22))
+    response_archive.archive_payload(later_params, make_payload([(83, 55)], 4, date(2025, 6, 19)))
+
+    def replayed_days(date_from, date_to, replay_params=params):
+      return [
+        days for _, days, _ in response_archive.replay([(83, 55)], date_from, date_to, replay_params)
+      ]
+
+    # the same range archived twice is replayed once, a later range only for the days after it
+    self.assertEqual(
+      replayed_days(date(2025, 6, 1), date(2025, 6, 30)),
+      [(date(2025, 6, 18), date(2025, 6, 20)), (date(2025, 6, 21), date(2025, 6, 22))]
+    )
+    self.assertEqual(replayed_days(date(2025, 6, 19), date(2025, 6, 19)), [(date(2025, 6, 19), date(2025, 6, 19))])
+    self.assertEqual(replayed_days(date(2025, 6, 23), date(2025, 6, 30)), [])
+    other_params = {**params, 'hourly': params['hourly'][:3]}
+    self.assertEqual(replayed_days(date(2025, 6, 18), date(2025, 6, 20), other_params), [])
+
+  @patch('app.day_cache.store_days')
+  @patch('app.db_client.reserve_connections')
+  @patch('app.db_client.save_records_data')
+  def test_replay_replaces_stored_days(self, save_records_data, reserve_connections, store_days):
+    locations = [(83, 55), (84.5, 53.25)]
+    params = make_params(locations, date(2025, 6, 18), date(2025, 6, 20))
+    response_archive.archive_payload(params, make_payload(locations))
+
+    args = Namespace(
+      locations=locations, date_from=date(2025, 6, 19), date_to=date(2025, 6, 25), batch_size=10,
+      replay=True, no_db=False, workers=1, db_workers=1, checkpoint=None)
+    run(args, [])
+
+    # recomputed days overwrite the stored ones, days outside the range are left out
+    [(records,), kwargs] = save_records_data.call_args
+    self.assertEqual(kwargs, {'replace': True})
+    self.assertEqual(
+      sorted((record['longitude'], record['latitude'], record['date']) for record in records),
+      [
+        (83, 55, '2025-06-19'), (83, 55, '2025-06-20'),
+        (84.5, 53.25, '2025-06-19'), (84.5, 53.25, '2025-06-20'),
+      ]
+    )
+    self.assertTrue(all(record['facts'] for record in records))
+
+  def test_new_segment_when_full(self):
+    params = make_params([(83, 55)], date(2025, 6, 18), date(2025, 6, 20))
+    with patch.object(response_archive, 'RESPONSE_ARCHIVE_SEGMENT_BYTES', 1):
+      response_archive.archive_payload(params, make_payload([(83, 55)]))
+      first_segment = response_archive._segment[0]
+      response_archive.archive_payload(params, make_payload([(83, 55)]))
+    self.assertNotEqual(response_archive._segment[0], first_segment)
+
+  def test_oldest_segments_evicted(self):
+    params = make_params([(83, 55)], date(2025, 6, 18), date(2025, 6, 20))
+    later_params = make_params([(83, 55)], date(2025, 6, 21), date(2025, 6, 23))
+    payload = make_payload([(83, 55)])
+    with patch.object(response_archive, 'RESPONSE_ARCHIVE_SEGMENT_BYTES', 1), \
+        patch.object(response_archive, 'RESPONSE_ARCHIVE_MAX_BYTES', len(payload)):
+      response_archive.archive_payload(params, payload)
+      response_archive.archive_payload(later_params, make_payload([(83, 55)], 3, date(2025, 6, 21)))
+
+    # the first segment and its index rows are gone, the one just written is kept
+    segments = [name for name in os.listdir(self.directory.name) if name.endswith(response_archive.SEGMENT_SUFFIX)]
+    self.assertEqual(segments, [response_archive._segment[0]])
+    replayed = list(response_archive.replay([(83, 55)], date(2025, 6, 1), date(2025, 6, 30), params))
+    self.assertEqual([days for _, days, _ in replayed], [(date(2025, 6, 21), date(2025, 6, 23))])
+
+  def test_payload_of_other_locations(self):
+    params = make_params([(83, 55), (84.5, 53.25)], date(2025, 6, 18), date(2025, 6, 20))
+    with self.assertRaises(ValueError):
+      response_archive.archive_payload(params, make_payload([(83, 55)]))
+
+
+if __name__ == "__main__":
+  unittest.main()
@@ -0,0 +1,18 @@
+import unittest
+from datetime import date
+
+from app.db_models import LocationDataMonthly
+from app.rollups import AGGREGATES, _months
+
+
+class TestRollups(unittest.TestCase):
+  def test_aggregates_match_table(self):
+    columns = {column.name for column in LocationDataMonthly.__table__.columns}
+    self.assertEqual(columns - {'longitude', 'latitude', 'period_start'}, set(AGGREGATES))
+
+  def test_months(self):
+    self.assertEqual(list(_months(date(2024, 11, 15), date(2025, 1, 1))), [
+      (date(2024, 11, 1), date(2024, 12, 1)),
+      (date(2024, 12, 1), date(2025, 1, 1)),
+      (date(2025, 1, 1), date(2025, 2, 1)),
+    ])
@@ -1,27 +1,46 @@
 import unittest
 
+import numpy as np
+
 import utils
 
 class TestUtils(unittest.TestCase):
   def test_knots_to_kmh(self):
     expected = [3.148, 9.816, 0.229]
     res = utils.knots_to_kmh([1.7, 5.3, 0.1234])
-    self.assertEqual(res, expected)
+    self.assertEqual(res.tolist(), expected)
 
   def test_farhenheits_to_celcius(self):
     expected = [37.91, -20.83, 10]
     res = utils.farhenheits_to_celcius([100.234, -5.5, 50])
-    self.assertEqual(res, expected)
+    self.assertEqual(res.tolist(), expected)
 
   def test_inches_to_centimeter(self):
     expected = [1283, -94, 268]
     res = utils.inches_to_millimeter([50.5, -3.7, 10.5432])
-    self.assertEqual(res, expected)
+    self.assertEqual(res.tolist(), expected)
 
   def test_feet_to_meter(self):
     expected = [15.39, -1.13, 3.21]
     res = utils.feet_to_meter([50.5, -3.7, 10.5432])
-    self.assertEqual(res, expected)
+    self.assertEqual(res.tolist(), expected)
+
+  def test_dtype(self):
+    res = utils.farhenheits_to_celcius([100.234, -5.5, 50], dtype=np.float32)
+    self.assertEqual(res.dtype, np.float32)
+    self.assertEqual(res.tolist(), np.array([37.91, -20.83, 10], dtype=np.float32).tolist())
+
+  def test_int_input(self):
+    self.assertEqual(utils.farhenheits_to_celcius([50, 100]).tolist(), [10, 37.78])
+    self.assertEqual(utils.knots_to_kmh(np.array([1, 10], dtype=np.int32)).tolist(), [1.852, 18.52])
+    self.assertEqual(utils.inches_to_millimeter([1, 2]).tolist(), [25, 51])
+    self.assertEqual(utils.feet_to_meter([10]).tolist(), [3.05])
+
+  def test_in_place(self):
+    values = np.array([50.5, -3.7, 10.5432])
+    res = utils.feet_to_meter(values, out=values)
+    self.assertIs(res, values)
+    self.assertEqual(values.tolist(), [15.39, -1.13, 3.21])
 
 # Executing the tests in the above test case class
 if __name__ == "__main__":
@@ -0,0 +1,52 @@
+"""Fixtures shared by the app/test_*.py modules."""
+from datetime import date
+
+import numpy as np
+import pandas as pd
+from openmeteo_sdk.WeatherApiResponse import WeatherApiResponse
+
+from app.constants import HourlyParams
+from benchmarks.synthetic import make_response_bytes
+
+DAY_START = 1750179600  # 2025-06-17T17:00:00Z, local midnight in Asia/Novosibirsk
+
+
+def make_dataframes(days=2, hours_per_day=24, rows_per_hour=1, day_starts=None):
+  if day_starts is None:
+    day_starts = DAY_START + np.arange(days) * 86400
+  rows = (day_starts[-1] - day_starts[0]) // 3600 * rows_per_hour + hours_per_day * rows_per_hour
+  hourly_data = {"date": pd.date_range(
+    start=pd.to_datetime(day_starts[0], unit="s", utc=True),
+    periods=rows,
+    freq=pd.Timedelta(minutes=60 // rows_per_hour)
+  )}
+  for key in HourlyParams.to_list():
+    hourly_data[key] = np.arange(rows, dtype=np.float64) // rows_per_hour % 24
+
+  days = len(day_starts)
+  daily_data = {
+    "date": pd.to_datetime(day_starts, unit="s", utc=True),
+    "sunrise": day_starts + 6 * 3600,
+    "sunset": day_starts + 18 * 3600,
+    "daylight_duration": np.full(days, 12 * 3600, dtype=np.float32),
+  }
+  return pd.DataFrame(data=daily_data), pd.DataFrame(data=hourly_data)
+
+
+def make_payload(locations, days=3, start_date=date(2025, 6, 18)) -> bytes:
+  """API payload of a request for locations: a little-endian uint32 length before every flatbuffer."""
+  messages = [
+    make_response_bytes(start_date, days, longitude, latitude, seed=index)
+    for index, (longitude, latitude) in enumerate(locations)
+  ]
+  return b''.join(len(message).to_bytes(4, 'little') + message for message in messages)
+
+
+def make_responses(locations, days=3, start_date=date(2025, 6, 18)):
+  """Responses decoded from one payload, like app.request.make_request returns them."""
+  payload = make_payload(locations, days, start_date)
+  responses, position = [], 0
+  while position < len(payload):
+    responses.append(WeatherApiResponse.GetRootAs(payload, position + 4))
+    position += int.from_bytes(payload[position:position + 4], 'little') + 4
+  return responses
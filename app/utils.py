@@ -1,15 +1,33 @@
+import numpy as np
+
 KMH_TO_KNOT = 1.852
 MILLIMETER_TO_INCH = 25.4
 METER_TO_FEET = 0.3048
 
-def knots_to_kmh(knots: list[float]) -> list[float]:
-  return [round(v * KMH_TO_KNOT, 3) for v in knots]
+# Every conversion takes an array-like and returns a numpy array. The first ufunc allocates
+# the result (or writes into `out`), the rest of the arithmetic and rounding runs in place.
+# `dtype` sets the result type, by default it follows the input (float32 for Open-Meteo values),
+# integer input gives float64 so the in-place steps don't have to cast back to integers.
+
+def _result_dtype(values, out, dtype):
+  if dtype is not None or out is not None:
+    return dtype
+  return np.result_type(np.asarray(values), 1.0)
+
+def knots_to_kmh(knots, out: np.ndarray | None = None, dtype=None) -> np.ndarray:
+  res = np.multiply(knots, KMH_TO_KNOT, out=out, dtype=_result_dtype(knots, out, dtype))
+  return np.round(res, 3, out=res)
 
-def farhenheits_to_celcius(farhs: list[float]) -> list[float]:
-  return [round((v - 32) * 5 / 9, 2) for v in farhs]
+def farhenheits_to_celcius(farhs, out: np.ndarray | None = None, dtype=None) -> np.ndarray:
+  res = np.subtract(farhs, 32, out=out, dtype=_result_dtype(farhs, out, dtype))
+  np.multiply(res, 5, out=res)
+  np.divide(res, 9, out=res)
+  return np.round(res, 2, out=res)
 
-def inches_to_millimeter(inches: list[float]) -> list[float]:
-  return [round(v * MILLIMETER_TO_INCH) for v in inches]
+def inches_to_millimeter(inches, out: np.ndarray | None = None, dtype=None) -> np.ndarray:
+  res = np.multiply(inches, MILLIMETER_TO_INCH, out=out, dtype=_result_dtype(inches, out, dtype))
+  return np.rint(res, out=res)
 
-def feet_to_meter(feets: list[float]) -> list[float]:
-  return [round(v * METER_TO_FEET, 2) for v in feets]
+def feet_to_meter(feets, out: np.ndarray | None = None, dtype=None) -> np.ndarray:
+  res = np.multiply(feets, METER_TO_FEET, out=out, dtype=_result_dtype(feets, out, dtype))
+  return np.round(res, 2, out=res)
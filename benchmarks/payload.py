@@ -0,0 +1,108 @@
+"""Storage size and read time of the location_data payload codecs, needs Postgres.
+
+Stores the same synthetic location-days with every codec of app/payload_codec.py in a temporary
+table shaped like location_data and reports the table size, a scan of a scalar stat (what the
+rollups read) and a full read of the days decoded back to the stats:
+
+    python -m benchmarks.payload [--locations N] [--days N] [--repeat N]
+"""
+import argparse
+import io
+import time
+
+from app.db_client import _copy_bytes, _copy_text, get_engine
+from app.open_meteo_data_transform import transform_dataframes
+from app.payload_codec import CODECS, decode_rows, encode
+from app.request import combine_dataframes
+from benchmarks.run import _prepare
+
+CREATE_SQL = "CREATE TEMPORARY TABLE payload_{codec} (id integer PRIMARY KEY, data jsonb NOT NULL, series bytea)"
+SCALAR_SQL = "SELECT avg((data->>'avg_temperature_2m_24h')::float) FROM payload_{codec}"
+READ_SQL = "SELECT data, series FROM payload_{codec}"
+
+
+def _write(cursor, codec, documents, series):
+    cursor.execute(CREATE_SQL.format(codec=codec))
+    rows = io.StringIO(''.join(
+        f"{index}\t{_copy_text(document)}\t{_copy_bytes(payload)}\n"
+        for index, (document, payload) in enumerate(zip(documents, series))
+    ))
+    cursor.copy_expert(f"COPY payload_{codec} (id, data, series) FROM STDIN", rows)
+    cursor.execute(f"VACUUM ANALYZE payload_{codec}")
+    cursor.execute(f"SELECT pg_total_relation_size('payload_{codec}')")
+    return cursor.fetchone()[0]
+
+
+def _timed(repeat, function):
+    timings = []
+    for _ in range(repeat):
+        started_at = time.perf_counter()
+        function()
+        timings.append(time.perf_counter() - started_at)
+    return min(timings)
+
+
+def run_benchmarks(locations, days, repeat):
+    params, responses = _prepare(locations, days)
+    stats = []
+    for response in responses:
+        daily, hourly, _, _, _ = combine_dataframes(response, params)
+        stats.append(transform_dataframes(daily, hourly, response.UtcOffsetSeconds()))
+
+    results = {}
+    connection = get_engine().raw_connection()
+    # VACUUM cannot run inside a transaction
+    connection.rollback()
+    connection.driver_connection.autocommit = True
+    try:
+        with connection.cursor() as cursor:
+            for codec in CODECS:
+                documents, series = [], []
+                encode_seconds = _timed(repeat, lambda: [encode(day_stats, codec) for day_stats in stats])
+                for day_stats in stats:
+                    day_documents, day_series = encode(day_stats, codec)
+                    documents.extend(day_documents)
+                    series.extend(day_series)
+                size = _write(cursor, codec, documents, series)
+
+                def scalar():
+                    cursor.execute(SCALAR_SQL.format(codec=codec))
+                    cursor.fetchall()
+
+                def read():
+                    cursor.execute(READ_SQL.format(codec=codec))
+                    rows = cursor.fetchall()
+                    decode_rows([data for data, _ in rows], [payload for _, payload in rows])
+
+                results[codec] = {
+                    'bytes_per_day': size / len(documents),
+                    'encode_seconds': encode_seconds,
+                    'scalar_scan_seconds': _timed(repeat, scalar),
+                    'read_seconds': _timed(repeat, read),
+                }
+    finally:
+        connection.close()
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Storage size and read time of the payload codecs")
+    parser.add_argument("--locations", type=int, default=100, help="Synthetic locations (defaults to 100)")
+    parser.add_argument("--days", type=int, default=365, help="Days of every location (defaults to 365)")
+    parser.add_argument(
+        "--repeat", type=int, default=3,
+        help="Timed runs of every measurement, the best one is reported (defaults to 3)"
+    )
+    args = parser.parse_args()
+
+    results = run_benchmarks(args.locations, args.days, args.repeat)
+    print(f"{'codec':<10} {'bytes/day':>10} {'encode s':>10} {'scalar scan s':>14} {'read s':>10}")
+    for codec, result in results.items():
+        print(
+            f"{codec:<10} {result['bytes_per_day']:>10.0f} {result['encode_seconds']:>10.4f} "
+            f"{result['scalar_scan_seconds']:>14.4f} {result['read_seconds']:>10.4f}"
+        )
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,183 @@
+"""Offline benchmarks of the fetch-transform-store hot paths.
+
+Runs without network and Postgres on synthetic responses, reports time, throughput and peak memory
+of every stage and compares the run with benchmarks/baseline.json.
+
+    python -m benchmarks.run                  # run and compare with the baseline
+    python -m benchmarks.run --save-baseline  # run and store the result as the new baseline
+"""
+import argparse
+import json
+import os
+import sys
+import time
+import tracemalloc
+from datetime import date
+
+from app.db_client import _records_to_copy
+from app.ingest import compose_records, make_params
+from app.open_meteo_data_transform import transform_dataframes
+from app.request import combine_dataframes, transform_units
+from benchmarks.synthetic import make_response
+
+BASELINE_PATH = os.path.join(os.path.dirname(__file__), 'baseline.json')
+START_DATE = date(2015, 1, 1)
+
+# name -> (locations, days)
+SIZES = {
+    '1_day': (1, 1),
+    '1_year': (1, 365),
+    '10_years': (1, 3650),
+    '1000_locations': (1000, 7),
+}
+
+
+def _prepare(locations, days):
+    """Synthetic responses and params of one batch."""
+    coordinates = [(83 + index / 1000, 55.0) for index in range(locations)]
+    params = make_params(coordinates, START_DATE, START_DATE)
+    responses = [
+        make_response(START_DATE, days, longitude, latitude, seed=index)
+        for index, (longitude, latitude) in enumerate(coordinates)
+    ]
+    return params, responses
+
+
+def _stages(params, responses):
+    """Stage name -> callable, every stage reuses the output of the previous one."""
+    state = {}
+
+    def units():
+        for response in responses:
+            hourly = response.Hourly()
+            for index in range(hourly.VariablesLength()):
+                variable = hourly.Variables(index)
+                transform_units(variable.Unit(), variable.ValuesAsNumpy())
+
+    def combine():
+        state['frames'] = [
+            (combine_dataframes(response, params), response.UtcOffsetSeconds())
+            for response in responses
+        ]
+
+    def transform():
+        state['results'] = [
+            (transform_dataframes(daily.copy(), hourly.copy(), utc_offset_seconds), timezone_name)
+            for (daily, hourly, timezone_name, _, _), utc_offset_seconds in state['frames']
+        ]
+
+    def assembly():
+        state['records'] = []
+        for (result_list, timezone_name), (longitude, latitude) in zip(
+            state['results'], zip(params['longitude'], params['latitude'])
+        ):
+            _, records = compose_records(result_list, longitude, latitude, timezone_name)
+            state['records'].extend(records)
+
+    def serialization():
+        _records_to_copy(state['records'])
+
+    return {
+        'transform_units': units,
+        'combine_dataframes': combine,
+        'transform_dataframes': transform,
+        'row_assembly': assembly,
+        'record_serialization': serialization,
+    }
+
+
+def _measure(stage, repeat):
+    timings = []
+    for _ in range(repeat):
+        started_at = time.perf_counter()
+        stage()
+        timings.append(time.perf_counter() - started_at)
+
+    tracemalloc.start()
+    stage()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return min(timings), peak
+
+
+def run_benchmarks(sizes, repeat):
+    results = {}
+    for size in sizes:
+        locations, days = SIZES[size]
+        params, responses = _prepare(locations, days)
+        for name, stage in _stages(params, responses).items():
+            seconds, peak = _measure(stage, repeat)
+            results[f"{size}/{name}"] = {
+                'seconds': seconds,
+                'location_days_per_second': locations * days / seconds if seconds else None,
+                'peak_memory_bytes': peak,
+            }
+    return results
+
+
+def compare(results, baseline, threshold):
+    """Print every result next to the baseline, returns names of the regressed benchmarks."""
+    regressions = []
+    print(f"{'benchmark':<45} {'seconds':>10} {'days/s':>12} {'peak MB':>9} {'vs baseline':>12}")
+    for name, result in results.items():
+        line = (
+            f"{name:<45} {result['seconds']:>10.4f} "
+            f"{result['location_days_per_second'] or 0:>12.0f} "
+            f"{result['peak_memory_bytes'] / 1e6:>9.2f}"
+        )
+        if name in baseline:
+            ratio = result['seconds'] / baseline[name]['seconds']
+            line += f" {ratio:>11.2f}x"
+            if ratio > threshold:
+                regressions.append(name)
+                line += " REGRESSION"
+        print(line)
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline benchmarks of the ingestion pipeline")
+    parser.add_argument(
+        "--sizes", nargs="+", choices=list(SIZES), default=list(SIZES),
+        help="Data sizes to run (defaults to all)"
+    )
+    parser.add_argument(
+        "--repeat", type=int, default=3,
+        help="Timed runs of every stage, the best one is reported (defaults to 3)"
+    )
+    parser.add_argument(
+        "--threshold", type=float, default=1.5,
+        help="Slowdown against the baseline reported as a regression (defaults to 1.5)"
+    )
+    parser.add_argument(
+        "--save-baseline", action="store_true",
+        help="Store the results as the new baseline"
+    )
+    parser.add_argument(
+        "--output",
+        help="Also write the results as JSON to this file"
+    )
+    args = parser.parse_args()
+
+    results = run_benchmarks(args.sizes, args.repeat)
+
+    baseline = {}
+    if os.path.exists(BASELINE_PATH):
+        with open(BASELINE_PATH) as baseline_file:
+            baseline = json.load(baseline_file)
+    regressions = compare(results, baseline, args.threshold)
+
+    if args.output:
+        with open(args.output, 'w') as output_file:
+            json.dump(results, output_file, indent=2)
+    if args.save_baseline:
+        with open(BASELINE_PATH, 'w') as baseline_file:
+            json.dump({**baseline, **results}, baseline_file, indent=2)
+        print(f"Baseline saved to {BASELINE_PATH}")
+    elif regressions:
+        print(f"Regressions: {', '.join(regressions)}")
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
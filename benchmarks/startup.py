@@ -0,0 +1,88 @@
+"""Startup time of the CLI, every case runs in a fresh interpreter.
+
+    python -m benchmarks.startup                  # run and compare with the baseline
+    python -m benchmarks.startup --save-baseline  # run and store the result as the new baseline
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# name -> interpreter arguments
+CASES = {
+    'startup/help': ['main.py', '-h'],
+    'startup/invalid_args': ['main.py', '-lon', '83'],
+    'startup/import_main': ['-c', 'import main'],
+    # everything a full run loads, for comparison
+    'startup/import_pipeline': [
+        '-c', 'import main, app.request, app.db_client, app.export, app.parallel_transform, app.job_queue'
+    ],
+}
+
+
+def _run(args):
+    """Wall seconds and peak RSS bytes of one interpreter run."""
+    started_at = time.perf_counter()
+    process = subprocess.Popen(
+        [sys.executable, *args], cwd=ROOT, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    _, _, usage = os.wait4(process.pid, 0)
+    seconds = time.perf_counter() - started_at
+    # reaped by wait4 already
+    process.returncode = 0
+    return seconds, usage.ru_maxrss * 1024
+
+
+def run_benchmarks(repeat):
+    results = {}
+    for name, args in CASES.items():
+        runs = [_run(args) for _ in range(repeat)]
+        results[name] = {
+            'seconds': min(seconds for seconds, _ in runs),
+            'location_days_per_second': None,
+            'peak_memory_bytes': max(peak for _, peak in runs),
+        }
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Startup time of main.py")
+    parser.add_argument(
+        "--repeat", type=int, default=10,
+        help="Runs of every case, the fastest one is reported (defaults to 10)"
+    )
+    parser.add_argument(
+        "--threshold", type=float, default=1.5,
+        help="Slowdown against the baseline reported as a regression (defaults to 1.5)"
+    )
+    parser.add_argument(
+        "--save-baseline", action="store_true",
+        help="Store the results as the new baseline"
+    )
+    args = parser.parse_args()
+
+    results = run_benchmarks(args.repeat)
+
+    # Imported after the runs: the pipeline modules would count in the peak RSS of forked children
+    from benchmarks.run import BASELINE_PATH, compare
+
+    baseline = {}
+    if os.path.exists(BASELINE_PATH):
+        with open(BASELINE_PATH) as baseline_file:
+            baseline = json.load(baseline_file)
+    regressions = compare(results, baseline, args.threshold)
+
+    if args.save_baseline:
+        with open(BASELINE_PATH, 'w') as baseline_file:
+            json.dump({**baseline, **results}, baseline_file, indent=2)
+        print(f"Baseline saved to {BASELINE_PATH}")
+    elif regressions:
+        print(f"Regressions: {', '.join(regressions)}")
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,135 @@
+"""Synthetic Open-Meteo responses for offline benchmarks.
+
+Responses are real WeatherApiResponse flatbuffers with the variables and units main.py requests,
+so they go through the same decode path as API data.
+"""
+from datetime import date, datetime, UTC
+
+import flatbuffers
+import numpy as np
+from openmeteo_sdk.Unit import Unit
+from openmeteo_sdk.WeatherApiResponse import WeatherApiResponse
+
+from app.constants import HourlyParams
+
+HOURLY_UNITS = {
+    HourlyParams.temperature_2m: Unit.fahrenheit,
+    HourlyParams.relative_humidity_2m: Unit.percentage,
+    HourlyParams.dew_point_2m: Unit.fahrenheit,
+    HourlyParams.apparent_temperature: Unit.fahrenheit,
+    HourlyParams.temperature_80m: Unit.fahrenheit,
+    HourlyParams.temperature_120m: Unit.fahrenheit,
+    HourlyParams.wind_speed_10m: Unit.knots,
+    HourlyParams.wind_speed_80m: Unit.knots,
+    HourlyParams.wind_direction_10m: Unit.degree_direction,
+    HourlyParams.wind_direction_80m: Unit.degree_direction,
+    HourlyParams.visibility: Unit.feet,
+    HourlyParams.evapotranspiration: Unit.inch,
+    HourlyParams.weather_code: Unit.wmo_code,
+    HourlyParams.soil_temperature_0cm: Unit.fahrenheit,
+    HourlyParams.soil_temperature_6cm: Unit.fahrenheit,
+    HourlyParams.rain: Unit.inch,
+    HourlyParams.showers: Unit.inch,
+    HourlyParams.snowfall: Unit.inch,
+}
+
+# Field slots of the flatbuffers tables, see openmeteo_sdk
+RESPONSE_FIELDS = 14
+VARIABLES_WITH_TIME_FIELDS = 4
+VARIABLE_WITH_VALUES_FIELDS = 12
+
+
+def _hourly_values(unit, rng, size):
+    match unit:
+        case Unit.fahrenheit:
+            return 50 + 30 * rng.standard_normal(size)
+        case Unit.percentage:
+            return rng.uniform(20, 100, size)
+        case Unit.knots:
+            return rng.gamma(2, 5, size)
+        case Unit.degree_direction:
+            return rng.uniform(0, 360, size)
+        case Unit.feet:
+            return rng.uniform(1000, 80000, size)
+        case Unit.inch:
+            return np.maximum(rng.normal(0, 0.05, size), 0)
+        case Unit.wmo_code:
+            return rng.choice([0, 1, 2, 3, 61, 71], size)
+
+
+def _variable(builder, unit, values=None, values_int64=None):
+    values_offset = values_int64_offset = None
+    if values is not None:
+        values_offset = builder.CreateNumpyVector(values.astype(np.float32))
+    if values_int64 is not None:
+        values_int64_offset = builder.CreateNumpyVector(values_int64.astype(np.int64))
+
+    builder.StartObject(VARIABLE_WITH_VALUES_FIELDS)
+    builder.PrependUint8Slot(1, unit, 0)
+    if values_offset is not None:
+        builder.PrependUOffsetTRelativeSlot(3, values_offset, 0)
+    if values_int64_offset is not None:
+        builder.PrependUOffsetTRelativeSlot(4, values_int64_offset, 0)
+    return builder.EndObject()
+
+
+def _variables_with_time(builder, time, time_end, interval, variables):
+    builder.StartVector(4, len(variables), 4)
+    for variable in reversed(variables):
+        builder.PrependUOffsetTRelative(variable)
+    variables_offset = builder.EndVector()
+
+    builder.StartObject(VARIABLES_WITH_TIME_FIELDS)
+    builder.PrependInt64Slot(0, time, 0)
+    builder.PrependInt64Slot(1, time_end, 0)
+    builder.PrependInt32Slot(2, interval, 0)
+    builder.PrependUOffsetTRelativeSlot(3, variables_offset, 0)
+    return builder.EndObject()
+
+
+def make_response_bytes(
+    start_date: date, days: int, longitude: float = 83.0, latitude: float = 55.0,
+    utc_offset_seconds: int = 7 * 3600, timezone_name: str = 'Asia/Novosibirsk', seed: int = 0
+) -> bytes:
+    """Flatbuffer payload of one location with hourly and daily data for days starting at start_date."""
+    rng = np.random.default_rng(seed)
+    builder = flatbuffers.Builder(1024)
+
+    # Open-Meteo unixtime timestamps are local midnights expressed in UTC
+    start = int(datetime(start_date.year, start_date.month, start_date.day, tzinfo=UTC).timestamp())
+    start -= utc_offset_seconds
+    hours = days * 24
+
+    hourly_variables = [
+        _variable(builder, unit, _hourly_values(unit, rng, hours))
+        for unit in HOURLY_UNITS.values()
+    ]
+    hourly = _variables_with_time(builder, start, start + hours * 3600, 3600, hourly_variables)
+
+    day_starts = start + np.arange(days, dtype=np.int64) * 86400
+    sunrise = day_starts + rng.integers(4 * 3600, 8 * 3600, days)
+    sunset = day_starts + rng.integers(16 * 3600, 21 * 3600, days)
+    daily_variables = [
+        _variable(builder, Unit.unix_time, values_int64=sunrise),
+        _variable(builder, Unit.unix_time, values_int64=sunset),
+        _variable(builder, Unit.seconds, values=(sunset - sunrise).astype(np.float64)),
+    ]
+    daily = _variables_with_time(builder, start, start + days * 86400, 86400, daily_variables)
+
+    timezone_offset = builder.CreateString(timezone_name)
+    abbreviation_offset = builder.CreateString(f"GMT{utc_offset_seconds // 3600:+d}")
+
+    builder.StartObject(RESPONSE_FIELDS)
+    builder.PrependFloat32Slot(0, latitude, 0)
+    builder.PrependFloat32Slot(1, longitude, 0)
+    builder.PrependInt32Slot(6, utc_offset_seconds, 0)
+    builder.PrependUOffsetTRelativeSlot(7, timezone_offset, 0)
+    builder.PrependUOffsetTRelativeSlot(8, abbreviation_offset, 0)
+    builder.PrependUOffsetTRelativeSlot(10, daily, 0)
+    builder.PrependUOffsetTRelativeSlot(11, hourly, 0)
+    builder.Finish(builder.EndObject())
+    return bytes(builder.Output())
+
+
+def make_response(*args, **kwargs) -> WeatherApiResponse:
+    return WeatherApiResponse.GetRootAs(make_response_bytes(*args, **kwargs), 0)
@@ -1,80 +1,263 @@
-from pandas import DataFrame
+from collections import defaultdict
+from itertools import groupby, islice
 
+# Only light modules are imported here, so `-h` and argument errors return quickly.
+# pandas, numpy, SQLAlchemy and the Open-Meteo client are imported by the stages that use them
+from app import metrics
 from app.args_parser import parse_args
-from app.constants import HourlyParams
-from app.db_client import save_records_data
-from app.open_meteo_data_transform import WeatherStatsNamedTuple, transform_dataframes
-from app.request import make_request, combine_dataframes
+from app.ingest import make_params, process_frames, process_parts
+from app.planner import missing_ranges, plan_requests, split_range
+
+
+def plan_fetch(plan, loaded_dates):
+    """Plan of the days that were not loaded from the cache by process_cached."""
+    fetch_plan = defaultdict(list)
+    for (date_from, date_to), locations in plan.items():
+        for longitude, latitude in locations:
+            dates = loaded_dates.get((longitude, latitude), set())
+            metrics.increment('cache_hit_days', sum(date_from <= day <= date_to for day in dates))
+            for date_range in missing_ranges(date_from, date_to, dates):
+                fetch_plan[date_range].append((longitude, latitude))
+                metrics.increment('cache_miss_days', (date_range[1] - date_range[0]).days + 1)
+    return dict(fetch_plan)
+
+
+def coalesce_plan(fetch_plan):
+    """Fetch plan with one location per known grid cell in every range and (date_from, date_to) ->
+    fan_out of the range, see app/grid_cells.py."""
+    from app.grid_cells import coalesce, load_cells
+
+    cells = load_cells({location for locations in fetch_plan.values() for location in locations})
+    coalesced_plan, fan_outs = {}, {}
+    for date_range, locations in fetch_plan.items():
+        coalesced_plan[date_range], fan_outs[date_range] = coalesce(locations, cells)
+    return coalesced_plan, fan_outs
+
+
+def fetch_batch(batch, timeout, keep_cells=True):
+    """Fetch the parts of (params, fan_out) and keep the grid cells the API reported for the requested locations."""
+    from app.request import fetch_range
+
+    params, fan_out = batch
+    parts = fetch_range(params, timeout)
+    if keep_cells:
+        from app.grid_cells import learn_cells, save_cells
+
+        # Both endpoints serve the same models, so the cells of any part will do
+        save_cells(learn_cells(*parts[-1]))
+    return parts, fan_out
+
+
+def iter_batches(plan, batch_size, chunk_days):
+    """Yield (locations, date_from, date_to) in batches of locations and chunks of days."""
+    for (date_from, date_to), locations in plan.items():
+        for chunk_from, chunk_to in split_range(date_from, date_to, chunk_days):
+            for start in range(0, len(locations), batch_size):
+                yield locations[start:start + batch_size], chunk_from, chunk_to
+
+
+def process_cached(plan, batch_size, chunk_days, with_facts=True, loaded_dates=None):
+    """Yield records and frames of cached days, one batch of locations and one chunk of days at a time.
+
+    The dates loaded for every location are added to the loaded_dates defaultdict(set), only
+    they are left out of the fetch (see plan_fetch): a recent day that expires meanwhile is fetched.
+    """
+    from app.day_cache import load_days
+
+    for locations, date_from, date_to in iter_batches(plan, batch_size, chunk_days):
+        batch = []
+        for longitude, latitude in locations:
+            dates, frames = load_days(longitude, latitude, date_from, date_to)
+            if frames is not None:
+                batch.append((longitude, latitude, *frames))
+                if loaded_dates is not None:
+                    loaded_dates[(longitude, latitude)] |= dates
+
+        if batch:
+            yield process_frames(batch, with_facts)
+
+
+def replay_batches(locations, date_from, date_to, batch_size):
+    """Yield (params, responses) of archived responses within the range, batch_size responses at a time.
+
+    The range of params is the part of the range a response is replayed for, process_parts trims
+    the days outside of it."""
+    from app.response_archive import replay
+
+    archived = replay(locations, date_from, date_to, make_params([], date_from, date_to))
+    for (first, last), window in groupby(archived, key=lambda item: item[1]):
+        while batch := list(islice(window, batch_size)):
+            yield (
+                make_params([location for location, _, _ in batch], first, last),
+                [response for _, _, response in batch]
+            )
+
+
+def save_batch(batch, replace=False):
+    """Save the records of a (records, frames) batch, returns the frames for the export.
+    With replace stored days are overwritten, see app.db_client.save_records_data."""
+    from app.db_client import save_records_data
+
+    records, frames = batch
+    with metrics.stage('save'):
+        save_records_data(records, replace=replace)
+    return frames
+
+
+def write_frames(frames, writers, checkpoint=None):
+    """Export frames and list their days in the checkpoint file, see app/checkpoint.py."""
+    with metrics.stage('export'):
+        for df_data, longitude, latitude in frames:
+            for writer in writers:
+                writer.write(df_data, longitude, latitude)
+        if checkpoint:
+            from app.checkpoint import mark_frames
+
+            mark_frames(checkpoint, frames)
+
+
+def output_stages(args, writers):
+    """Pipeline stages after the transform, they get (records, frames) batches."""
+    # Writers append to shared files, so batches are exported one at a time.
+    # Days are checkpointed after their batch is saved and exported
+    if args.no_db:
+        return [('export', lambda batch: write_frames(batch[1], writers, args.checkpoint), 1)]
+    # Replayed days are reprocessed to pick up transform changes, so they replace the stored ones
+    return [
+        ('save', lambda batch: save_batch(batch, replace=args.replay), args.db_workers),
+        ('export', lambda frames: write_frames(frames, writers, args.checkpoint), 1),
+    ]
+
 
 def main():
     args = parse_args()
-    
+
     # Display the parsed arguments
-    print(f"Longitude: {args.longitude}")
-    print(f"Latitude: {args.latitude}")
+    print(f"Locations: {len(args.locations)}")
     print(f"Date from: {args.date_from}")
     print(f"Date to: {args.date_to}")
+    print(f"Batch size: {args.batch_size}")
+    print(f"Workers: {args.workers}")
+    print(f"Transform workers: {args.transform_workers}")
+    print(f"Chunk days: {args.chunk_days}")
     print(f"Output as CSV: {args.csv}")
     print(f"Output as JSON: {args.json}")
+    print(f"Output as Parquet: {args.parquet}")
+    print(f"Output as Arrow: {args.arrow}")
+    print(f"Output layout: {args.layout}")
+    print(f"Database: {'off' if args.no_db else 'on'}")
+    print(f"Replay: {'on' if args.replay else 'off'}")
+    print(f"Checkpoint: {args.checkpoint or 'off'}")
+
+    if args.enqueue:
+        from app.job_queue import enqueue_jobs
+
+        queued = enqueue_jobs(args.locations, args.date_from, args.date_to, args.chunk_days)
+        print(f"Queued {queued} jobs")
+        return
+
+    if args.verbose:
+        from app.request import enable_verbose
+
+        enable_verbose()
+    if args.profile:
+        metrics.enable_profiling()
+
+    from app.export import open_writers
+    from app.parallel_transform import shutdown_pool, start_pool
+
+    start_pool(args.transform_workers)
+    writers = open_writers(args.csv, args.json, args.parquet, args.arrow, args.layout)
+    try:
+        run(args, writers)
+    finally:
+        for writer in writers:
+            writer.close()
+        shutdown_pool()
+
+        if args.metrics:
+            metrics.write_metrics(args.metrics, args.metrics_format)
+        if args.profile:
+            metrics.dump_profile(args.profile)
+
+
+def run(args, writers):
+    from app.pipeline import run_pipeline
+
+    save = not args.no_db
+    if save:
+        from app.db_client import reserve_connections
+
+        # Fetch threads save grid cells, save threads write batches, the planner runs before both
+        reserve_connections(args.workers + args.db_workers)
+    # Transform threads share the transform pool (-tw), decoding and record assembly hold the GIL
+    process_stage = (
+        'process',
+        lambda batch: process_parts(batch[0], with_facts=save, fan_out=batch[1]),
+        1
+    )
+    if args.replay:
+        # Archived responses only, nothing is fetched
+        run_pipeline(
+            (
+                ([(params, responses)], None)
+                for params, responses in replay_batches(args.locations, args.date_from, args.date_to, args.batch_size)
+            ),
+            [process_stage, *output_stages(args, writers)]
+        )
+        return
+
+    # Days listed in the checkpoint of an interrupted run are done, whatever the other options
+    done_dates = {}
+    if args.checkpoint:
+        from app.checkpoint import load_checkpoint
+
+        done_dates = load_checkpoint(args.checkpoint, args.locations, args.date_from, args.date_to)
+        print(f"Checkpointed location-days: {sum(map(len, done_dates.values()))}")
+
+    if args.refetch:
+        fetch_plan = plan_requests(args.locations, args.date_from, args.date_to, done_dates)
+    else:
+        if args.no_db:
+            stored_dates = done_dates
+        else:
+            from app.db_client import get_stored_dates
+
+            stored_dates = get_stored_dates(args.locations, args.date_from, args.date_to)
+            for location, dates in done_dates.items():
+                stored_dates[location] |= dates
+        plan = plan_requests(args.locations, args.date_from, args.date_to, stored_dates)
+
+        # Cached batches are transformed in this thread while the previous ones are saved,
+        # then the days that were not loaded are fetched
+        loaded_dates = defaultdict(set)
+        run_pipeline(
+            process_cached(plan, args.batch_size, args.chunk_days, save, loaded_dates),
+            output_stages(args, writers)
+        )
+        fetch_plan = plan_fetch(plan, loaded_dates)
+        print(f"Date ranges to fetch: {len(fetch_plan)}")
+
+    # Grid cells are kept in the database, without it every location is requested
+    fan_outs = {}
+    if save:
+        fetch_plan, fan_outs = coalesce_plan(fetch_plan)
+
+    # Params are built lazily, so only the batches in flight are kept in memory
+    batches = (
+        (make_params(locations, date_from, date_to), fan_outs.get(date_range))
+        for date_range, range_locations in fetch_plan.items()
+        for locations, date_from, date_to in iter_batches(
+            {date_range: range_locations}, args.batch_size, args.chunk_days)
+    )
+
+    # Batches are processed in the order their responses arrive
+    run_pipeline(batches, [
+        ('fetch', lambda batch: fetch_batch(batch, args.timeout, keep_cells=save), args.workers),
+        process_stage,
+        *output_stages(args, writers),
+    ])
 
-    params = {
-        "latitude": args.latitude,
-        "longitude": args.longitude,
-        "start_date": args.date_from,
-        "end_date": args.date_to,
-        "daily": ["sunrise", "sunset", "daylight_duration"],
-        "hourly": HourlyParams.to_list(),
-        "timezone": "auto",
-        "timeformat": "unixtime",
-        "wind_speed_unit": "kn",
-        "temperature_unit": "fahrenheit",
-        "precipitation_unit": "inch"
-    }
-    response = make_request(params)
-    (
-        daily_dataframe, hourly_dataframe, timezone_name, longitude, latitude
-    ) = combine_dataframes(response, params)
-
-    result_list: list[dict[str, WeatherStatsNamedTuple]] = transform_dataframes(
-        daily_dataframe, hourly_dataframe)
-    
-    df_data = {
-        'date': []
-    }
-    result_records = []
-    
-    for row in result_list:
-        [date, data] = list(row.values())
-        
-        # composing DataFrame data
-        df_data['date'].append(date)
-        for index, field_key in enumerate(data._fields):
-            if not field_key in df_data:
-                df_data[field_key] = []
-            df_data[field_key].append(data[index])
-
-        # composing model objects for DB
-        record = {
-            'longitude':longitude,
-            'latitude':latitude,
-            'date':date,
-            'timezone':timezone_name,
-            'data':data._asdict()
-        }
-        result_records.append(record)
-    
-    save_records_data(result_records)
-
-    result_df = DataFrame(data=df_data)
-    for idx in range(len(result_df)):
-        day_df = result_df.iloc[idx]
-        
-        if args.json == True:
-            with open(f"output/{longitude}_{latitude}_{day_df.date}.json", "w") as json_file:
-                json_file.write(day_df.to_json())
-        if args.csv == True:
-            with open(f"output/{longitude}_{latitude}_{day_df.date}.csv", "w") as csv_file:
-                csv_file.write(day_df.to_csv())
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
@@ -0,0 +1,161 @@
+"""Ingestion daemon working off the ingest_jobs queue.
+
+    python main.py -lon 83 -lat 55 -df 2025-01-01 -dt 2025-12-31 -cd 30 --enqueue
+    python worker.py [-p PROCESSES] [-bs BATCH_SIZE] [--poll POLL]
+
+Every process claims up to BATCH_SIZE jobs, requests the jobs sharing a date range together and
+runs them through the same pipeline as main.py. Start more processes or more nodes against the
+same database to scale.
+"""
+import argparse
+import multiprocessing
+import os
+import signal
+import socket
+import threading
+import time
+import traceback
+from collections import defaultdict
+
+from app.config import JOB_LEASE_SECONDS
+from app.db_client import get_stored_dates, save_records_data
+from app.grid_cells import coalesce, learn_cells, load_cells, save_cells
+from app.ingest import make_params, process_parts
+from app.job_queue import claim_jobs, complete_jobs, extend_leases, fail_jobs
+from app.request import enable_verbose, fetch_range
+
+
+def _group_by_range(jobs) -> dict:
+    """(date_from, date_to) -> jobs, a group is fetched with one request."""
+    groups = defaultdict(list)
+    for job in jobs:
+        groups[(job.date_from, job.date_to)].append(job)
+    return groups
+
+
+def process_group(date_from, date_to, jobs, timeout):
+    """Fetch, transform and save the locations of jobs that are not fully stored yet."""
+    locations = [(job.longitude, job.latitude) for job in jobs]
+    days = (date_to - date_from).days + 1
+    stored_dates = get_stored_dates(locations, date_from, date_to)
+    locations = [location for location in locations if len(stored_dates.get(location, ())) < days]
+    if not locations:
+        return
+
+    # One location per known grid cell is requested, see app/grid_cells.py
+    locations, fan_out = coalesce(locations, load_cells(locations))
+    params = make_params(locations, date_from, date_to)
+    # Long ranges are requested in parts from the forecast and archive endpoints
+    parts = fetch_range(params, timeout)
+    save_cells(learn_cells(*parts[-1]))
+    batch_records, _ = process_parts(parts, fan_out=fan_out)
+    save_records_data(batch_records)
+
+
+def keep_leased(worker, ids, lease_seconds, stopped: threading.Event):
+    """Extend the leases of claimed jobs every third of the lease until stopped, so a slow group
+    isn't claimed again by another worker. Completed and failed jobs are left as they are."""
+    while not stopped.wait(lease_seconds / 3):
+        try:
+            extend_leases(worker, ids, lease_seconds)
+        except Exception as error:
+            print(f"Worker {worker} failed to extend leases: {error}")
+
+
+def run_worker(batch_size, poll_interval, lease_seconds, timeout):
+    worker = f"{socket.gethostname()}:{os.getpid()}"
+    stopping = False
+
+    def stop(signum, frame):
+        nonlocal stopping
+        stopping = True
+
+    # Finish the claimed jobs before exiting
+    signal.signal(signal.SIGTERM, stop)
+    signal.signal(signal.SIGINT, stop)
+
+    print(f"Worker {worker} started")
+    while not stopping:
+        jobs = claim_jobs(worker, batch_size, lease_seconds)
+        if not jobs:
+            time.sleep(poll_interval)
+            continue
+
+        stopped = threading.Event()
+        heartbeat = threading.Thread(
+            target=keep_leased, args=(worker, [job.id for job in jobs], lease_seconds, stopped), daemon=True)
+        heartbeat.start()
+        try:
+            for (date_from, date_to), group in _group_by_range(jobs).items():
+                ids = [job.id for job in group]
+                try:
+                    process_group(date_from, date_to, group, timeout)
+                except Exception as error:
+                    print(f"Worker {worker} failed jobs {ids}: {error}")
+                    fail_jobs(worker, ids, traceback.format_exc())
+                else:
+                    complete_jobs(worker, ids)
+        finally:
+            stopped.set()
+            heartbeat.join()
+
+    print(f"Worker {worker} stopped")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Process ingestion jobs queued with main.py --enqueue")
+    parser.add_argument(
+        "-p", "--processes", type=int, default=1,
+        help="Number of worker processes (defaults to 1)"
+    )
+    parser.add_argument(
+        "-bs", "--batch_size", type=int, default=50,
+        help="Jobs claimed at once, jobs with the same date range share an API request (defaults to 50)"
+    )
+    parser.add_argument(
+        "--poll", type=float, default=5,
+        help="Seconds to wait when the queue is empty (defaults to 5)"
+    )
+    parser.add_argument(
+        "--lease", type=int, default=JOB_LEASE_SECONDS,
+        help=f"Seconds a claimed job stays leased before other workers may take it (defaults to {JOB_LEASE_SECONDS})"
+    )
+    parser.add_argument(
+        "--timeout", type=float, default=30,
+        help="Timeout in seconds for a single API request (defaults to 30)"
+    )
+    parser.add_argument(
+        "-v", "--verbose", action="store_true",
+        help="Print coordinates, elevation and timezone of every API response"
+    )
+    args = parser.parse_args()
+
+    if args.processes < 1 or args.batch_size < 1:
+        raise argparse.ArgumentTypeError("processes and batch size must be positive")
+
+    if args.verbose:
+        # Forked worker processes inherit it
+        enable_verbose()
+
+    worker_args = (args.batch_size, args.poll, args.lease, args.timeout)
+    if args.processes == 1:
+        run_worker(*worker_args)
+        return
+
+    processes = [
+        multiprocessing.Process(target=run_worker, args=worker_args)
+        for _ in range(args.processes)
+    ]
+    for process in processes:
+        process.start()
+
+    # Forward SIGTERM to the children, they finish their claimed jobs and exit.
+    # On Ctrl+C the whole process group gets SIGINT
+    signal.signal(signal.SIGTERM, lambda signum, frame: [process.terminate() for process in processes])
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    for process in processes:
+        process.join()
+
+
+if __name__ == '__main__':
+    main()